@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark the original vs. the fast image preprocessing pipeline
+
+Generates synthetic phone-style photos (no external files needed) and reports,
+per image size and pipeline: mean / p50 / p95 latency, peak extra memory and
+the max absolute difference between the two outputs.
+
+Usage:
+    python benchmark_preprocess.py
+    python benchmark_preprocess.py --repeat 50 --json preprocess_results.json
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from image_preprocessing import preprocess_image_fast, preprocess_image_legacy
+
+PIPELINES = {
+    "legacy": preprocess_image_legacy,
+    "fast": preprocess_image_fast,
+}
+
+# (label, width, height, format)
+IMAGE_CASES = [
+    ("12MP_jpeg", 4000, 3000, "JPEG"),
+    ("8MP_jpeg", 3264, 2448, "JPEG"),
+    ("1080p_jpeg", 1920, 1080, "JPEG"),
+    ("whatsapp_jpeg", 1600, 1200, "JPEG"),
+    ("2MP_png", 1600, 1200, "PNG"),
+]
+
+
+def make_photo(width: int, height: int, fmt: str, seed: int = 0) -> bytes:
+    """Leaf-green gradient with noise, so JPEG sizes are realistic"""
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    red, green, blue = np.broadcast_arrays(60 + 80 * x * y, 120 + 100 * y, 40 + 60 * x + 0 * y)
+    base = np.stack([red, green, blue], axis=-1)
+    noisy = base + rng.normal(0, 18, size=base.shape).astype(np.float32)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8)).save(buffer, fmt, quality=90)
+    return buffer.getvalue()
+
+
+def time_pipeline(fn, image_bytes: bytes, repeat: int):
+    fn(image_bytes)  # warm up
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(image_bytes)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+    }
+
+
+def _vm_hwm_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return -1
+
+
+def _peak_memory_child(pipeline: str, image_bytes: bytes, queue):
+    try:
+        # Reset the peak RSS mark so earlier allocations don't hide this call (Linux)
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        before = _vm_hwm_kb()
+        PIPELINES[pipeline](image_bytes)
+        queue.put(_vm_hwm_kb() - before)
+    except OSError:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        PIPELINES[pipeline](image_bytes)
+        queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before)
+
+
+def peak_memory_kb(pipeline: str, image_bytes: bytes) -> int:
+    """Peak RSS growth for one call in KiB, measured in a fresh process"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_peak_memory_child, args=(pipeline, image_bytes, queue))
+    process.start()
+    process.join()
+    return queue.get() if not queue.empty() else -1
+
+
+def run(repeat: int, measure_memory: bool = True):
+    results = []
+    for label, width, height, fmt in IMAGE_CASES:
+        image_bytes = make_photo(width, height, fmt)
+        legacy_out = preprocess_image_legacy(image_bytes)
+        fast_out = preprocess_image_fast(image_bytes)
+        case = {
+            "image": label,
+            "size": f"{width}x{height}",
+            "bytes": len(image_bytes),
+            "max_abs_diff": round(float(np.abs(legacy_out - fast_out).max()), 4),
+            "output_dtype": {"legacy": str(legacy_out.dtype), "fast": str(fast_out.dtype)},
+        }
+        for name, fn in PIPELINES.items():
+            case[name] = time_pipeline(fn, image_bytes, repeat)
+            if measure_memory:
+                case[name]["peak_rss_kb"] = peak_memory_kb(name, image_bytes)
+        case["speedup"] = round(case["legacy"]["mean_ms"] / case["fast"]["mean_ms"], 2)
+        results.append(case)
+    return results
+
+
+def print_table(results):
+    print(f"{'image':<15}{'legacy ms':>11}{'fast ms':>10}{'speedup':>9}{'legacy KiB':>12}{'fast KiB':>10}{'max diff':>10}")
+    for case in results:
+        print(f"{case['image']:<15}{case['legacy']['mean_ms']:>11.2f}{case['fast']['mean_ms']:>10.2f}"
+              f"{case['speedup']:>8.1f}x{case['legacy'].get('peak_rss_kb', 0):>12}"
+              f"{case['fast'].get('peak_rss_kb', 0):>10}{case['max_abs_diff']:>10.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark image preprocessing pipelines")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per image and pipeline")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the per-process peak memory measurement")
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, measure_memory=not args.no_memory)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
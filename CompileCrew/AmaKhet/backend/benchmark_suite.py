@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the backend hot paths
+
+Runs offline on generated fixtures:
+  - preprocess/*        preprocess_image (fast and legacy pipelines) on phone-photo sizes
+  - endpoint/*          the encode + np.hstack + predict sequence of each single-row endpoint
+  - predict/*           single-row vs. batched predict for each joblib model (TabularModelSpec.predict)
+  - soil_rules/*        the rule evaluation of analyze_soil_health_simple and evaluate_soil_health
+
+The stub model files are trained on synthetic rows with the same model types
+as the notebooks (OneHotEncoder + RandomForestRegressor for yield,
+RandomForestClassifier for crop recommendation, DecisionTreeClassifier for
+fertilizer; the soil / crop encoders are one-hot so they take the 2-D input the
+endpoints pass). They are dumped with joblib and loaded through ModelRegistry,
+memory-mapped like in production.
+
+Every benchmark reports per-call mean / p50 / p95 / min in microseconds (and
+per row for batches). Results are written as JSON; `compare` flags benchmarks
+that got slower than the baseline by more than a threshold and exits with 1.
+
+Usage:
+    python benchmark_suite.py run --json results/bench_main.json
+    python benchmark_suite.py run --filter predict/ --quick
+    python benchmark_suite.py compare results/bench_main.json results/bench_branch.json --threshold 0.1
+    python benchmark_suite.py run --json results/bench_branch.json --compare results/bench_main.json
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmark_preprocess import make_photo
+
+RESULTS_VERSION = 1
+
+# (label, width, height, format); the sizes farmers' phones and WhatsApp send
+PHOTO_CASES = [
+    ("12MP_jpeg", 4000, 3000, "JPEG"),
+    ("1080p_jpeg", 1920, 1080, "JPEG"),
+    ("whatsapp_jpeg", 1600, 1200, "JPEG"),
+    ("2MP_png", 1600, 1200, "PNG"),
+]
+
+STATES = ["Odisha", "West Bengal", "Andhra Pradesh", "Chhattisgarh", "Jharkhand"]
+DISTRICTS = [f"District_{index}" for index in range(40)]
+SEASONS = ["Kharif", "Rabi", "Summer", "Autumn", "Winter", "Whole Year"]
+CROPS = [f"Crop_{index}" for index in range(50)]
+RECOMMENDED_CROPS = ["rice", "maize", "chickpea", "kidneybeans", "pigeonpeas", "mothbeans", "mungbean",
+                     "blackgram", "lentil", "pomegranate", "banana", "mango", "grapes", "watermelon",
+                     "muskmelon", "apple", "orange", "papaya", "coconut", "cotton", "jute", "coffee"]
+SOIL_TYPES = ["Sandy", "Loamy", "Black", "Red", "Clayey"]
+FERTILIZER_CROPS = ["Maize", "Sugarcane", "Cotton", "Tobacco", "Paddy", "Barley", "Wheat", "Millets",
+                    "Oil seeds", "Pulses", "Ground Nuts"]
+FERTILIZERS = ["Urea", "DAP", "14-35-14", "28-28", "17-17-17", "20-20", "10-26-26"]
+
+
+class Benchmark:
+    def __init__(self, name: str, fn: Callable[[], Any], rows: int = 1):
+        self.name = name
+        self.fn = fn
+        self.rows = rows
+
+
+# --------- Fixtures ----------
+def build_fixture_models(directory: str, training_rows: int = 2000, seed: int = 0) -> Dict[str, str]:
+    """Train and joblib-dump stub models under directory; returns tabular_models.MODEL_FILES"""
+    import joblib
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    from sklearn.preprocessing import OneHotEncoder
+    from sklearn.tree import DecisionTreeClassifier
+    from tabular_models import MODEL_FILES
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    # Crop yield: one-hot (state, district, season, crop) + area
+    categorical = np.column_stack([rng.choice(STATES, training_rows), rng.choice(DISTRICTS, training_rows),
+                                   rng.choice(SEASONS, training_rows), rng.choice(CROPS, training_rows)])
+    area = rng.uniform(0.5, 500, (training_rows, 1))
+    encoder = OneHotEncoder(handle_unknown="ignore", sparse_output=False).fit(categorical)
+    production = area[:, 0] * rng.uniform(1, 4, training_rows)
+    yield_model = RandomForestRegressor(n_estimators=100, random_state=seed, n_jobs=1).fit(
+        np.hstack([encoder.transform(categorical), area]), production)
+
+    # Crop recommendation: N, P, K, temperature, humidity, pH, rainfall
+    numeric = np.column_stack([rng.uniform(0, 140, training_rows), rng.uniform(5, 145, training_rows),
+                               rng.uniform(5, 205, training_rows), rng.uniform(8, 44, training_rows),
+                               rng.uniform(14, 100, training_rows), rng.uniform(3.5, 9.9, training_rows),
+                               rng.uniform(20, 300, training_rows)])
+    crop_model = RandomForestClassifier(n_estimators=10, random_state=seed, n_jobs=1).fit(
+        numeric, rng.choice(RECOMMENDED_CROPS, training_rows))
+
+    # Fertilizer: soil type, crop type + temperature, humidity, moisture, N, K, P
+    soils = rng.choice(SOIL_TYPES, (training_rows, 1))
+    crops = rng.choice(FERTILIZER_CROPS, (training_rows, 1))
+    soil_encoder = OneHotEncoder(handle_unknown="ignore", sparse_output=False).fit(soils)
+    crop_encoder = OneHotEncoder(handle_unknown="ignore", sparse_output=False).fit(crops)
+    fertilizer_numeric = np.column_stack([rng.uniform(25, 38, training_rows), rng.uniform(50, 72, training_rows),
+                                          rng.uniform(25, 65, training_rows), rng.uniform(4, 42, training_rows),
+                                          rng.uniform(0, 19, training_rows), rng.uniform(0, 42, training_rows)])
+    fertilizer_model = DecisionTreeClassifier(random_state=seed).fit(
+        np.hstack([soil_encoder.transform(soils), crop_encoder.transform(crops), fertilizer_numeric]),
+        rng.choice(FERTILIZERS, training_rows))
+
+    objects = {
+        "encoder": encoder,
+        "yield_model": yield_model,
+        "crop_recommendation_model": crop_model,
+        "fertilizer_model": fertilizer_model,
+        "soil_encoder": soil_encoder,
+    }
+    for name, obj in objects.items():
+        joblib.dump(obj, os.path.join(directory, MODEL_FILES[name]))
+    # crop_encoder shares encoder_yield.joblib in MODEL_FILES; the fertilizer crop encoder gets its own file
+    files = dict(MODEL_FILES, crop_encoder="fertilizer_crop_encoder.joblib")
+    joblib.dump(crop_encoder, os.path.join(directory, files["crop_encoder"]))
+    return files
+
+
+def fixture_rows(count: int, seed: int = 1) -> Dict[str, List[Dict[str, Any]]]:
+    """Input rows per endpoint, drawn like real requests"""
+    rng = np.random.default_rng(seed)
+    return {
+        "crop_yield": [{"Jstate": str(rng.choice(STATES)), "Jdistrict": str(rng.choice(DISTRICTS)),
+                        "Jseason": str(rng.choice(SEASONS)), "Jcrops": str(rng.choice(CROPS)),
+                        "Jarea": float(rng.uniform(0.5, 50))} for _ in range(count)],
+        "crop_recommendation": [{"n_params": float(rng.uniform(0, 140)), "p_params": float(rng.uniform(5, 145)),
+                                 "k_params": float(rng.uniform(5, 205)), "t_params": float(rng.uniform(8, 44)),
+                                 "h_params": float(rng.uniform(14, 100)), "ph_params": float(rng.uniform(3.5, 9.9)),
+                                 "r_params": float(rng.uniform(20, 300))} for _ in range(count)],
+        "fertilizer_recommendation": [{"temp": float(rng.uniform(25, 38)), "humidity": float(rng.uniform(50, 72)),
+                                       "moisture": float(rng.uniform(25, 65)), "soil_type": str(rng.choice(SOIL_TYPES)),
+                                       "crop_type": str(rng.choice(FERTILIZER_CROPS)),
+                                       "nitrogen": float(rng.uniform(4, 42)), "potassium": float(rng.uniform(0, 19)),
+                                       "phosphorous": float(rng.uniform(0, 42))} for _ in range(count)],
+    }
+
+
+# --------- Benchmarks ----------
+def preprocess_benchmarks() -> List[Benchmark]:
+    from image_preprocessing import preprocess_image_fast, preprocess_image_legacy
+
+    benchmarks = []
+    for label, width, height, fmt in PHOTO_CASES:
+        photo = make_photo(width, height, fmt)
+        benchmarks.append(Benchmark(f"preprocess/{label}/fast", lambda photo=photo: preprocess_image_fast(photo)))
+        benchmarks.append(Benchmark(f"preprocess/{label}/legacy", lambda photo=photo: preprocess_image_legacy(photo)))
+    return benchmarks
+
+
+def model_benchmarks(models_dir: str, batch_size: int) -> List[Benchmark]:
+    from model_registry import ModelRegistry
+    import tabular_models
+
+    files = build_fixture_models(models_dir)
+    registry = ModelRegistry(models_dir, files, mmap_mode="r")
+    rows = fixture_rows(max(batch_size, 256))
+    benchmarks = []
+
+    # The exact call sequences of the single-row endpoints in main.py
+    yield_rows = itertools.cycle(rows["crop_yield"])
+
+    def crop_yield_endpoint():
+        row = next(yield_rows)
+        encoded_features = registry.get("encoder").transform([[row["Jstate"], row["Jdistrict"], row["Jseason"], row["Jcrops"]]])
+        final_features = np.hstack([encoded_features, [[row["Jarea"]]]])
+        return registry.get("yield_model").predict(final_features)[0]
+
+    recommendation_rows = itertools.cycle(rows["crop_recommendation"])
+
+    def crop_recommendation_endpoint():
+        row = next(recommendation_rows)
+        model_input = np.array([[row["n_params"], row["p_params"], row["k_params"], row["t_params"],
+                                 row["h_params"], row["ph_params"], row["r_params"]]])
+        return registry.get("crop_recommendation_model").predict(model_input)[0]
+
+    fertilizer_rows = itertools.cycle(rows["fertilizer_recommendation"])
+
+    def fertilizer_endpoint():
+        row = next(fertilizer_rows)
+        soil_encoded = registry.get("soil_encoder").transform([[row["soil_type"]]])
+        crop_encoded = registry.get("crop_encoder").transform([[row["crop_type"]]])
+        model_input = np.hstack([soil_encoded, crop_encoded, [[row["temp"], row["humidity"], row["moisture"],
+                                                               row["nitrogen"], row["potassium"], row["phosphorous"]]]])
+        return registry.get("fertilizer_model").predict(model_input)[0]
+
+    benchmarks += [
+        Benchmark("endpoint/crop_yield", crop_yield_endpoint),
+        Benchmark("endpoint/crop_recommendation", crop_recommendation_endpoint),
+        Benchmark("endpoint/fertilizer_recommendation", fertilizer_endpoint),
+    ]
+
+    # Single row vs. one batched call through the same featurize + predict
+    for name, spec in tabular_models.SPECS.items():
+        models = {key: registry.get(key) for key in spec.requires}
+        parsed = [tabular_models.parse_row(spec, row) for row in rows[name]]
+        categorical = [row[0] for row in parsed]
+        numeric = np.asarray([row[1] for row in parsed], dtype=np.float64)
+        singles = itertools.cycle(range(len(parsed)))
+
+        def single(spec=spec, models=models, categorical=categorical, numeric=numeric, singles=singles):
+            index = next(singles)
+            return spec.predict(models, categorical[index:index + 1], numeric[index:index + 1])
+
+        def batch(spec=spec, models=models, categorical=categorical[:batch_size], numeric=numeric[:batch_size]):
+            return spec.predict(models, categorical, numeric)
+
+        benchmarks.append(Benchmark(f"predict/{name}/single", single))
+        benchmarks.append(Benchmark(f"predict/{name}/batch_{batch_size}", batch, rows=batch_size))
+    return benchmarks
+
+
+def soil_rule_benchmarks() -> List[Benchmark]:
+    # The real module needs Earth Engine at import; point it at the local stand-in with no caches
+    os.environ.setdefault("EARTH_ENGINE_FAKE", "1")
+    os.environ.setdefault("SOIL_CACHE_PATH", "")
+    os.environ.setdefault("SOIL_SERIES_PATH", "")
+    from soil_analysis_api import evaluate_soil_health
+    from soil_analysis_api_simple import analyze_soil_health_simple
+
+    rng = np.random.default_rng(2)
+    points = itertools.cycle([(float(rng.uniform(17.8, 22.6)), float(rng.uniform(81.3, 87.5))) for _ in range(64)])
+    values = itertools.cycle([{
+        "NDVI": float(rng.uniform(0.1, 0.9)), "SM_surface": float(rng.uniform(0.05, 0.4)),
+        "SM_rootzone": float(rng.uniform(0.1, 0.4)), "pH_top30cm": float(rng.uniform(4.5, 8.5)),
+        "SOC_gkg_top30cm": float(rng.uniform(5, 50)), "SOC_pct_top30cm": float(rng.uniform(0.5, 5)),
+        "WC33_vpct_top30cm": float(rng.uniform(20, 50)),
+    } for _ in range(64)])
+
+    def simple():
+        lat, lon = next(points)
+        return analyze_soil_health_simple(lat, lon, 50, "2025-01-01", "2025-03-31")
+
+    return [
+        Benchmark("soil_rules/analyze_soil_health_simple", simple),
+        Benchmark("soil_rules/evaluate_soil_health", lambda: evaluate_soil_health(next(values))),
+    ]
+
+
+# --------- Measurement ----------
+def measure(fn: Callable[[], Any], rounds: int, min_round_seconds: float) -> Dict[str, Any]:
+    """Per-call timings: calls are grouped so one round lasts at least min_round_seconds"""
+    fn()  # warm up (first-call imports, caches, page faults of mmapped models)
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_round_seconds or number >= 1_000_000:
+            break
+        number = min(1_000_000, max(number * 2, math.ceil(number * min_round_seconds / max(elapsed, 1e-9))))
+
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number * 1e6)
+    samples.sort()
+    return {
+        "mean_us": round(statistics.fmean(samples), 3),
+        "p50_us": round(statistics.median(samples), 3),
+        "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_us": round(samples[0], 3),
+        "stdev_us": round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "calls_per_round": number,
+    }
+
+
+def collect_benchmarks(args, workdir: str) -> List[Benchmark]:
+    groups = {
+        "preprocess": preprocess_benchmarks,
+        "model": lambda: model_benchmarks(os.path.join(workdir, "models"), args.batch_size),
+        "soil_rules": soil_rule_benchmarks,
+    }
+    benchmarks = []
+    for group, build in groups.items():
+        try:
+            benchmarks += build()
+        except ImportError as e:
+            print(f"⚠️  Skipping {group} benchmarks: {e}")
+    if args.filter:
+        benchmarks = [b for b in benchmarks if any(f in b.name for f in args.filter)]
+    return benchmarks
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> Dict[str, Any]:
+    versions = {}
+    for module in ("numpy", "sklearn", "PIL", "joblib"):
+        try:
+            versions[module] = getattr(__import__(module), "__version__", None)
+        except ImportError:
+            versions[module] = None
+    return {"python": sys.version.split()[0], "platform": platform.platform(), "cpus": os.cpu_count(),
+            "git_commit": git_commit(), "packages": versions}
+
+
+def run(args) -> Dict[str, Any]:
+    rounds = 5 if args.quick else args.rounds
+    min_round = 0.01 if args.quick else args.min_round_ms / 1000
+    with tempfile.TemporaryDirectory(prefix="amakhet_bench_") as workdir:
+        benchmarks = collect_benchmarks(args, workdir)
+        results = {}
+        for benchmark in benchmarks:
+            result = measure(benchmark.fn, rounds, min_round)
+            result["rows"] = benchmark.rows
+            if benchmark.rows > 1:
+                result["per_row_us"] = round(result["p50_us"] / benchmark.rows, 3)
+            results[benchmark.name] = result
+            per_row = f"  ({result['per_row_us']:.2f} µs/row)" if benchmark.rows > 1 else ""
+            print(f"  {benchmark.name:<48} p50 {result['p50_us']:>12.2f} µs  p95 {result['p95_us']:>12.2f} µs{per_row}")
+    return {
+        "tool": "benchmark_suite",
+        "version": RESULTS_VERSION,
+        "label": args.label,
+        "created_at": datetime.now().isoformat(),
+        "environment": environment(),
+        "config": {"rounds": rounds, "min_round_ms": min_round * 1000, "batch_size": args.batch_size,
+                   "filter": args.filter},
+        "results": results,
+    }
+
+
+# --------- Comparison ----------
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float,
+            metric: str = "p50_us") -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Per-benchmark change of `metric`; returns (rows, names that regressed beyond threshold)"""
+    rows, regressions = [], []
+    for name in sorted(set(baseline["results"]) | set(current["results"])):
+        before = baseline["results"].get(name, {}).get(metric)
+        after = current["results"].get(name, {}).get(metric)
+        if after is None and current.get("config", {}).get("filter"):
+            continue  # not selected in a filtered run
+        if before is None or after is None:
+            rows.append({"name": name, "baseline": before, "current": after, "change": None,
+                         "status": "only in baseline" if after is None else "new"})
+            continue
+        change = (after - before) / before if before else 0.0
+        status = "regression" if change > threshold else "faster" if change < -threshold else "ok"
+        if status == "regression":
+            regressions.append(name)
+        rows.append({"name": name, "baseline": before, "current": after, "change": round(change, 4), "status": status})
+    return rows, regressions
+
+
+def print_comparison(rows: List[Dict[str, Any]], threshold: float, metric: str):
+    print(f"\n{'benchmark':<48}{'baseline':>14}{'current':>14}{'change':>10}  ({metric}, threshold {threshold:.0%})")
+    for row in rows:
+        fmt = lambda value: f"{value:>14.2f}" if value is not None else f"{'-':>14}"
+        change = f"{row['change']:>+10.1%}" if row["change"] is not None else f"{'':>10}"
+        mark = {"regression": "❌ regression", "faster": "✅ faster"}.get(row["status"], row["status"] if row["status"] != "ok" else "")
+        print(f"{row['name']:<48}{fmt(row['baseline'])}{fmt(row['current'])}{change}  {mark}")
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        results = json.load(f)
+    if results.get("tool") != "benchmark_suite":
+        raise ValueError(f"{path} is not a benchmark_suite result file")
+    return results
+
+
+def report_comparison(baseline: Dict[str, Any], current: Dict[str, Any], args) -> int:
+    rows, regressions = compare(baseline, current, args.threshold, args.metric)
+    print_comparison(rows, args.threshold, args.metric)
+    if baseline.get("environment", {}).get("platform") != current.get("environment", {}).get("platform"):
+        print("⚠️  Results come from different platforms; differences may not be regressions")
+    if regressions:
+        print(f"❌ {len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+        return 1
+    print("✅ No regressions")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the backend hot paths")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def comparison_options(command):
+        command.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before flagging (0.10 = 10%%)")
+        command.add_argument("--metric", default="p50_us", choices=["p50_us", "mean_us", "min_us", "p95_us"])
+
+    run_parser = sub.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--json", help="Write the results to this file")
+    run_parser.add_argument("--label", help="Free-form label stored with the results")
+    run_parser.add_argument("--filter", action="append", help="Only benchmarks whose name contains this (repeatable)")
+    run_parser.add_argument("--rounds", type=int, default=15)
+    run_parser.add_argument("--min-round-ms", type=float, default=50, help="Minimum duration of one timing round")
+    run_parser.add_argument("--batch-size", type=int, default=1024, help="Rows per batched predict")
+    run_parser.add_argument("--quick", action="store_true", help="5 short rounds, for a smoke run")
+    run_parser.add_argument("--compare", metavar="BASELINE", help="Compare against this result file afterwards")
+    comparison_options(run_parser)
+
+    compare_parser = sub.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    comparison_options(compare_parser)
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        return report_comparison(load_results(args.baseline), load_results(args.current), args)
+
+    if args.rounds < 2 or args.batch_size < 1:
+        parser.error("--rounds must be at least 2 and --batch-size at least 1")
+    print("⏱️  Running benchmarks...")
+    results = run(args)
+    if not results["results"]:
+        print("❌ No benchmarks matched")
+        return 1
+    if args.json:
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+    if args.compare:
+        return report_comparison(load_results(args.compare), results, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Size-limited thread pool for blocking work called from async endpoints
+
+Work submitted beyond `max_workers + max_queue` outstanding jobs is rejected
+immediately with QueueFullError, so endpoints can answer with a fast 503
+instead of piling up latency, and the event loop stays free for other routes.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a bounded pool or queue cannot accept more work"""
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, max_workers: int = 2, max_queue: int = 32):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._rejected = 0
+        self._completed = 0
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Schedule fn(*args, **kwargs), or raise QueueFullError if the pool is saturated"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(f"{self.name} is saturated ({self.max_workers} running, {self.max_queue} queued)")
+        with self._lock:
+            self._outstanding += 1
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await fn(*args, **kwargs) on the pool without blocking the event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _release(self):
+        with self._lock:
+            self._outstanding -= 1
+            self._completed += 1
+        self._slots.release()
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a free worker"""
+        return max(0, self._outstanding - self.max_workers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(self._outstanding, self.max_workers),
+            "queued": self.queue_depth,
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Offline bulk scoring for the joblib models (no HTTP server needed)
+
+Streams a CSV or Parquet file in chunks, scores the chunks across a process
+pool (each worker loads the models once) and streams the results to the
+output file in input order. Only a few chunks are held in memory at a time,
+so memory use does not grow with the input size.
+
+Usage:
+    python bulk_score.py --model crop_yield --input farms.csv --output scored.csv
+    python bulk_score.py --model fertilizer_recommendation --input farms.parquet \\
+        --output scored.parquet --chunk-size 50000 --workers 8
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List
+
+import tabular_models
+from model_registry import ModelRegistry
+
+PREDICTION_COLUMN = "prediction"
+ERROR_COLUMN = "error"
+NUMERIC_PREDICTIONS = {"crop_yield"}
+
+# Per-worker state, filled in by _init_worker
+_worker_spec = None
+_worker_models = None
+
+
+def load_models(spec: tabular_models.TabularModelSpec, models_dir: str) -> Dict[str, Any]:
+    """Load only the models/encoders a spec needs; memory-mapped, so worker processes share the arrays"""
+    registry = ModelRegistry(models_dir, tabular_models.MODEL_FILES)
+    return {key: registry.get(key) for key in spec.requires}
+
+
+def _init_worker(model_name: str, models_dir: str):
+    global _worker_spec, _worker_models
+    _worker_spec = tabular_models.SPECS[model_name]
+    _worker_models = load_models(_worker_spec, models_dir)
+
+
+def _score_chunk(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    outcomes = tabular_models.predict_rows(_worker_spec, _worker_models, rows, chunk_size=len(rows) or 1)
+    for row, (ok, value) in zip(rows, outcomes):
+        if ok:
+            row[PREDICTION_COLUMN] = float(value) if _worker_spec.name in NUMERIC_PREDICTIONS else str(value)
+            row[ERROR_COLUMN] = ""
+        else:
+            row[PREDICTION_COLUMN] = None
+            row[ERROR_COLUMN] = value
+    return rows
+
+
+# --------- Streaming input ----------
+def _file_format(path: str, explicit: str = None) -> str:
+    if explicit:
+        return explicit
+    return "parquet" if path.lower().endswith((".parquet", ".pq")) else "csv"
+
+
+def read_chunks(path: str, chunk_size: int, file_format: str) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the input file as lists of row dicts, chunk_size rows at a time"""
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            chunk = []
+            for row in reader:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+
+def read_schema(path: str, file_format: str):
+    """Arrow schema of the input rows: the Parquet file's own, or one text column per CSV header field"""
+    import pyarrow as pa
+
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).schema_arrow
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), [])
+    return pa.schema([pa.field(name, pa.string()) for name in header])
+
+
+# --------- Streaming output ----------
+class CsvResultWriter:
+    def __init__(self, path: str):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = None
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(rows[0].keys()), extrasaction="ignore")
+            self._writer.writeheader()
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    def __init__(self, path: str, model_name: str, input_schema):
+        import pyarrow.parquet as pq
+
+        self._model_name = model_name
+        self._schema = self._build_schema(input_schema)
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def _build_schema(self, input_schema):
+        """The input columns as read, then the prediction and error columns"""
+        import pyarrow as pa
+
+        fields = [field for field in input_schema if field.name not in (PREDICTION_COLUMN, ERROR_COLUMN)]
+        # Yield is a number, the recommenders return labels
+        fields.append(pa.field(PREDICTION_COLUMN, pa.float64() if self._model_name in NUMERIC_PREDICTIONS else pa.string()))
+        fields.append(pa.field(ERROR_COLUMN, pa.string()))
+        return pa.schema(fields)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        import pyarrow as pa
+
+        if not rows:
+            return
+        self._writer.write_table(pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_writer(path: str, file_format: str, model_name: str, input_path: str, input_format: str):
+    if file_format == "parquet":
+        return ParquetResultWriter(path, model_name, read_schema(input_path, input_format))
+    return CsvResultWriter(path)
+
+
+# --------- Driver ----------
+def run(model_name: str, input_path: str, output_path: str, chunk_size: int, workers: int,
+        models_dir: str, input_format: str = None, output_format: str = None) -> Dict[str, int]:
+    """Score input_path into output_path and return row counts"""
+    in_format = _file_format(input_path, input_format)
+    out_format = _file_format(output_path, output_format)
+    max_in_flight = workers * 2  # keeps memory bounded to a few chunks
+
+    totals = {"rows": 0, "failed": 0}
+    started = time.perf_counter()
+    writer = open_writer(output_path, out_format, model_name, input_path, in_format)
+    pending = deque()
+
+    def drain_one():
+        rows = pending.popleft().result()
+        writer.write(rows)
+        totals["rows"] += len(rows)
+        totals["failed"] += sum(1 for row in rows if row[ERROR_COLUMN])
+        elapsed = time.perf_counter() - started
+        print(f"  scored {totals['rows']:,} rows ({totals['rows'] / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_name, models_dir)) as pool:
+            for chunk in read_chunks(input_path, chunk_size, in_format):
+                if len(pending) >= max_in_flight:
+                    drain_one()
+                pending.append(pool.submit(_score_chunk, chunk))
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-score farm data with the AmaKhet joblib models")
+    parser.add_argument("--model", required=True, choices=sorted(tabular_models.SPECS),
+                        help="Which model to run")
+    parser.add_argument("--input", required=True, help="Input .csv or .parquet file")
+    parser.add_argument("--output", required=True, help="Output .csv or .parquet file")
+    parser.add_argument("--input-format", choices=["csv", "parquet"], help="Override input format detection")
+    parser.add_argument("--output-format", choices=["csv", "parquet"], help="Override output format detection")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="Rows per chunk (default: 20000)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--models-dir", default="models", help="Directory with the .joblib files")
+    args = parser.parse_args(argv)
+
+    spec = tabular_models.SPECS[args.model]
+    print(f"Scoring {args.input} with {args.model} ({args.workers} workers, {args.chunk_size} rows/chunk)",
+          file=sys.stderr)
+    print(f"Required columns: {', '.join(spec.columns)}", file=sys.stderr)
+
+    started = time.perf_counter()
+    totals = run(args.model, args.input, args.output, max(1, args.chunk_size), max(1, args.workers),
+                 args.models_dir, args.input_format, args.output_format)
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ Wrote {totals['rows']:,} rows to {args.output} in {elapsed:.1f}s "
+          f"({totals['failed']:,} failed)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Convert the Keras plant disease model to TFLite / ONNX and check agreement
+
+Conversion needs full TensorFlow (plus tf2onnx for ONNX, onnxruntime for the
+int8 ONNX variant). int8 variants use post-training static quantization,
+calibrated on a folder of real leaf photos.
+
+Usage:
+    # float and int8 TFLite, int8 calibrated on 200 photos
+    python convert_disease_model.py convert --to tflite
+    python convert_disease_model.py convert --to tflite-int8 --images samples/ --calibration-size 200
+
+    # ONNX (float / int8)
+    python convert_disease_model.py convert --to onnx
+    python convert_disease_model.py convert --to onnx-int8 --images samples/
+
+    # Top-1 agreement with the Keras model (exit code 1 below the threshold)
+    python convert_disease_model.py check --backend tflite \\
+        --model ML/ML/plant_disease_recog_model_pwp_int8.tflite --images samples/ --min-agreement 0.97
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Iterator, List
+
+import numpy as np
+
+import disease_backends
+from image_preprocessing import TARGET_SIZE, preprocess_image_fast
+
+TARGETS = {
+    "tflite": "{base}.tflite",
+    "tflite-int8": "{base}_int8.tflite",
+    "onnx": "{base}.onnx",
+    "onnx-int8": "{base}_int8.onnx",
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def list_images(directory: str, limit: int = None) -> List[str]:
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    paths.sort()
+    return paths[:limit] if limit else paths
+
+
+def load_images(paths: List[str]) -> Iterator[np.ndarray]:
+    """Yield (1, 160, 160, 3) float32 inputs, preprocessed exactly like the API"""
+    for path in paths:
+        with open(path, "rb") as f:
+            yield preprocess_image_fast(f.read())
+
+
+def _require_images(args, purpose: str) -> List[str]:
+    if not args.images:
+        sys.exit(f"❌ --images is required for {purpose}")
+    paths = list_images(args.images, args.calibration_size if purpose == "calibration" else args.limit)
+    if not paths:
+        sys.exit(f"❌ No images found in {args.images}")
+    return paths
+
+
+# --------- Conversion ----------
+def convert_tflite(keras_model, output_path: str, calibration_paths: List[str] = None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if calibration_paths:
+        # Full-integer quantization: conversion fails rather than leaving an op in
+        # float. Input/output stay float32 so the backend can feed the same
+        # arrays as the Keras model
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([image] for image in load_images(calibration_paths))
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def convert_onnx(keras_model, output_path: str, calibration_paths: List[str] = None):
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = (tf.TensorSpec((None, TARGET_SIZE[1], TARGET_SIZE[0], 3), tf.float32, name="input"),)
+    float_path = output_path if not calibration_paths else output_path + ".float.onnx"
+    tf2onnx.convert.from_keras(keras_model, input_signature=signature, opset=13, output_path=float_path)
+
+    if calibration_paths:
+        from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_static
+
+        class LeafImageReader(CalibrationDataReader):
+            def __init__(self):
+                self._images = load_images(calibration_paths)
+
+            def get_next(self):
+                image = next(self._images, None)
+                return None if image is None else {"input": image}
+
+        quantize_static(float_path, output_path, LeafImageReader(),
+                        activation_type=QuantType.QInt8, weight_type=QuantType.QInt8)
+        os.remove(float_path)
+
+
+def cmd_convert(args):
+    import tensorflow as tf
+
+    keras_path = args.keras_model or disease_backends.find_model_file("keras")
+    if not keras_path:
+        sys.exit("❌ Keras model not found; pass --keras-model")
+    base = os.path.splitext(keras_path)[0]
+    output_path = args.output or TARGETS[args.to].format(base=base)
+    calibration_paths = _require_images(args, "calibration") if args.to.endswith("-int8") else None
+
+    print(f"Converting {keras_path} -> {output_path}")
+    keras_model = tf.keras.models.load_model(keras_path)
+    started = time.perf_counter()
+    if args.to.startswith("tflite"):
+        convert_tflite(keras_model, output_path, calibration_paths)
+    else:
+        convert_onnx(keras_model, output_path, calibration_paths)
+    print(f"✅ Wrote {output_path} ({os.path.getsize(output_path) / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+
+    if args.images:
+        args.backend = args.to.split("-")[0]
+        args.model = output_path
+        return cmd_check(args)
+    return 0
+
+
+# --------- Agreement check ----------
+def cmd_check(args):
+    paths = _require_images(args, "the agreement check")
+    reference = disease_backends.load_backend("keras", args.keras_model)
+    candidate = disease_backends.load_backend(args.backend, args.model)
+
+    agree = 0
+    reference_seconds = candidate_seconds = 0.0
+    max_prob_diff = 0.0
+    for image in load_images(paths):
+        started = time.perf_counter()
+        expected = reference.predict(image)
+        reference_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        actual = candidate.predict(image)
+        candidate_seconds += time.perf_counter() - started
+
+        agree += int(np.argmax(expected[0]) == np.argmax(actual[0]))
+        max_prob_diff = max(max_prob_diff, float(np.abs(expected[0] - actual[0]).max()))
+
+    agreement = agree / len(paths)
+    print(f"Images checked:      {len(paths)}")
+    print(f"Top-1 agreement:     {agreement:.2%} (threshold {args.min_agreement:.2%})")
+    print(f"Max prob difference: {max_prob_diff:.4f}")
+    print(f"Keras latency:       {1000 * reference_seconds / len(paths):.1f} ms/image")
+    print(f"{args.backend} latency: {1000 * candidate_seconds / len(paths):.1f} ms/image")
+    print(f"Model size:          {os.path.getsize(candidate.path) / 1e6:.1f} MB")
+
+    if agreement < args.min_agreement:
+        print("❌ Agreement below threshold")
+        return 1
+    print("✅ Agreement check passed")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert and validate the plant disease model")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("--keras-model", help="Reference .keras file (default: the one the API loads)")
+        p.add_argument("--images", help="Folder of leaf photos for calibration / agreement checks")
+        p.add_argument("--limit", type=int, default=500, help="Max images for the agreement check")
+        p.add_argument("--min-agreement", type=float, default=0.97, help="Required top-1 agreement (0-1)")
+
+    convert = sub.add_parser("convert", help="Convert the Keras model")
+    convert.add_argument("--to", required=True, choices=sorted(TARGETS))
+    convert.add_argument("--output", help="Output file (default: next to the Keras model)")
+    convert.add_argument("--calibration-size", type=int, default=200, help="Images used for int8 calibration")
+    add_common(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    check = sub.add_parser("check", help="Compare a converted model with the Keras model")
+    check.add_argument("--backend", required=True, choices=["tflite", "onnx"])
+    check.add_argument("--model", help="Converted model file (default: the one the API would load)")
+    check.set_defaults(func=cmd_check, calibration_size=None)
+    add_common(check)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""
+Inference backends for the plant disease model
+
+All backends take a float32 batch of shape (N, 160, 160, 3) in [0, 1] and
+return (N, num_classes) class probabilities, so the endpoint does not care
+which runtime is behind it:
+
+  keras   full TensorFlow, the original .keras model
+  tflite  TensorFlow Lite (tflite_runtime or tf.lite), float or int8 model
+  onnx    ONNX Runtime, float or int8 model
+
+Pick one with DISEASE_BACKEND; convert_disease_model.py produces the
+.tflite / .onnx files and checks their agreement with the Keras model.
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+MODEL_BASENAME = "plant_disease_recog_model_pwp"
+INPUT_SHAPE = (160, 160, 3)
+MODEL_DIRS = ["ML/ML", "../ML/ML"]
+
+# Default file names per backend, looked up in MODEL_DIRS
+MODEL_FILES = {
+    "keras": [f"{MODEL_BASENAME}.keras"],
+    "tflite": [f"{MODEL_BASENAME}_int8.tflite", f"{MODEL_BASENAME}.tflite"],
+    "onnx": [f"{MODEL_BASENAME}_int8.onnx", f"{MODEL_BASENAME}.onnx"],
+}
+
+
+class DiseaseModelBackend:
+    name = "base"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def warmup(self, batch_sizes: Sequence[int]) -> Dict[int, float]:
+        """Run one prediction per batch size so graphs/buffers are built before traffic; returns ms per size"""
+        timings = {}
+        for batch_size in sorted(set(batch_sizes)):
+            started = time.perf_counter()
+            self.predict(np.zeros((batch_size,) + INPUT_SHAPE, dtype=np.float32))
+            timings[batch_size] = round((time.perf_counter() - started) * 1000, 1)
+        return timings
+
+    def describe(self) -> dict:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else None,
+        }
+
+
+class KerasBackend(DiseaseModelBackend):
+    name = "keras"
+
+    def __init__(self, path: str, compiled: bool = True, xla: bool = False, batch_buckets: Sequence[int] = ()):
+        """
+        compiled: call the model through a tf.function with a fixed input
+            signature instead of Model.predict, which has heavy per-call overhead
+        xla: compile that function with XLA (jit_compile)
+        batch_buckets: with XLA every batch shape is compiled separately, so
+            batches are zero-padded up to the nearest of these sizes
+        """
+        super().__init__(path)
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model = tf.keras.models.load_model(path)
+        self.compiled = compiled
+        self.xla = xla and compiled
+        self.batch_buckets = sorted(set(batch_buckets)) if self.xla else []
+        self._fn = None
+        if compiled:
+            self._fn = tf.function(
+                lambda images: self.model(images, training=False),
+                input_signature=[tf.TensorSpec((None,) + INPUT_SHAPE, tf.float32)],
+                jit_compile=self.xla,
+            )
+
+    def _bucket(self, batch_size: int) -> int:
+        for bucket in self.batch_buckets:
+            if bucket >= batch_size:
+                return bucket
+        return batch_size
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        if self._fn is None:
+            return self.model.predict(images, batch_size=len(images), verbose=0)
+
+        images = images.astype(np.float32, copy=False)
+        if self.batch_buckets and len(images) > self.batch_buckets[-1]:
+            # Larger than any warmed shape: run in chunks of the biggest bucket
+            largest = self.batch_buckets[-1]
+            return np.concatenate([self.predict(images[i:i + largest]) for i in range(0, len(images), largest)])
+
+        batch_size = len(images)
+        padded_size = self._bucket(batch_size)
+        if padded_size != batch_size:
+            padding = np.zeros((padded_size - batch_size,) + images.shape[1:], dtype=np.float32)
+            images = np.concatenate([images, padding])
+        return self._fn(self._tf.constant(images)).numpy()[:batch_size]
+
+    def describe(self) -> dict:
+        info = super().describe()
+        info.update({"compiled": self.compiled, "xla": self.xla, "batch_buckets": self.batch_buckets})
+        return info
+
+
+class TFLiteBackend(DiseaseModelBackend):
+    name = "tflite"
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        super().__init__(path)
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # The interpreter keeps per-call state, so only one predict at a time
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size: int):
+        if batch_size != self._batch_size:
+            shape = list(self._input["shape"])
+            shape[0] = batch_size
+            self.interpreter.resize_tensor_input(self._input["index"], shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        with self._lock:
+            self._resize(len(images))
+            input_dtype = self._input["dtype"]
+            if input_dtype in (np.int8, np.uint8):
+                # Fully-quantized model: map [0, 1] floats to the int8/uint8 input range
+                scale, zero_point = self._input["quantization"]
+                info = np.iinfo(input_dtype)
+                images = np.clip(np.round(images / scale + zero_point), info.min, info.max).astype(input_dtype)
+            else:
+                images = images.astype(input_dtype, copy=False)
+            self.interpreter.set_tensor(self._input["index"], images)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output["index"])
+            if self._output["dtype"] in (np.int8, np.uint8):
+                scale, zero_point = self._output["quantization"]
+                output = (output.astype(np.float32) - zero_point) * scale
+            return output
+
+
+class OnnxBackend(DiseaseModelBackend):
+    name = "onnx"
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        super().__init__(path)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self._input_name: images.astype(np.float32, copy=False)})[0]
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def candidate_paths(kind: str) -> List[str]:
+    return [os.path.join(directory, name) for name in MODEL_FILES[kind] for directory in MODEL_DIRS]
+
+
+def find_model_file(kind: str) -> Optional[str]:
+    for path in candidate_paths(kind):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_backend(kind: str, path: Optional[str] = None, num_threads: Optional[int] = None,
+                 **keras_options) -> DiseaseModelBackend:
+    """
+    Load the disease model with the given backend.
+
+    Raises ValueError for an unknown backend, FileNotFoundError when no model
+    file is found and ImportError when the backend's runtime is not installed.
+    keras_options (compiled, xla, batch_buckets) are passed to KerasBackend.
+    """
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown disease model backend '{kind}' (choose from {', '.join(BACKENDS)})")
+    path = path or find_model_file(kind)
+    if path is None or not os.path.exists(path):
+        raise FileNotFoundError(f"No {kind} model file found (looked for {path or ', '.join(candidate_paths(kind))})")
+    if kind == "keras":
+        return KerasBackend(path, **keras_options)
+    return BACKENDS[kind](path, num_threads=num_threads)
@@ -0,0 +1,158 @@
+"""
+On-disk, content-addressed cache of plant disease predictions
+
+Farmers (and WhatsApp retries through the Node bridge) re-send the same photo,
+so the upload's sha256 is looked up here before the image is decoded. A hit
+returns the stored class probabilities, and the endpoint builds the same
+response it would build for a fresh prediction.
+
+Entries are small JSON files under `directory/<2 hex chars>/<key>.json` and
+survive restarts. The key mixes the image hash with a model fingerprint, so a
+new model file (or backend / preprocessing change) never serves old results;
+stale entries simply age out. When the directory grows beyond `max_bytes` the
+least recently used files are deleted. Several worker processes may share the
+directory: writes are atomic renames and eviction tolerates missing files.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class DiseaseResultCache:
+    def __init__(self, directory: str, max_bytes: int = 100 * 1024 * 1024,
+                 fingerprint: Optional[Callable[[], str]] = None):
+        """
+        max_bytes: 0 disables the cache
+        fingerprint: returns a string that changes whenever predictions would change
+        """
+        self.directory = directory
+        self.max_bytes = max(0, int(max_bytes))
+        self.fingerprint = fingerprint
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> file size, oldest first
+        self._total_bytes = 0
+        self._scanned = False
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key_for(self, image_bytes: bytes) -> str:
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        namespace = self.fingerprint() if self.fingerprint else ""
+        return hashlib.sha256(f"{namespace}:{digest}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _scan(self):
+        """Rebuild the LRU index from the files on disk (oldest modification first)"""
+        entries = []
+        if os.path.isdir(self.directory):
+            for sub in os.scandir(self.directory):
+                if not sub.is_dir():
+                    continue
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith(".json"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._index.values())
+        self._scanned = True
+
+    def get(self, image_bytes: bytes) -> Tuple[str, Optional[List[float]]]:
+        """(key, stored probabilities or None). Call from a worker thread: hashing large uploads takes a while."""
+        key = self.key_for(image_bytes)
+        if not self.enabled:
+            return key, None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                prediction = json.load(f)["prediction"]
+        except FileNotFoundError:
+            with self._lock:
+                self._counts["misses"] += 1
+            return key, None
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._counts["errors"] += 1
+                self._counts["misses"] += 1
+            return key, None
+
+        try:
+            os.utime(path)  # mark as recently used for other processes too
+        except OSError:
+            pass
+        with self._lock:
+            self._counts["hits"] += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return key, prediction
+
+    def put(self, key: str, prediction: List[float]):
+        """Store probabilities for a key returned by get(), then evict down to max_bytes"""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        data = json.dumps({"prediction": [float(p) for p in prediction], "created": time.time()})
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            with self._lock:
+                self._counts["errors"] += 1
+            print(f"⚠️  Could not write disease cache entry: {e}")
+            return
+
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            self._total_bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._counts["writes"] += 1
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self._counts["evictions"] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.enabled and not self._scanned:
+                self._scan()
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                "enabled": self.enabled,
+                "directory": self.directory,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round(self._counts["hits"] / lookups, 4) if lookups else None,
+                **self._counts,
+            }
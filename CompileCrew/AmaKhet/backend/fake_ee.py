@@ -0,0 +1,568 @@
+"""
+Deterministic local stand-in for the Earth Engine API used by the soil code
+
+soil_analysis_api_simple.py only imitates the health rules, so the real
+analyze_soil_health (its layer building, caches, time series, batching and
+thread pool) could only be measured against live Earth Engine. This module
+implements the part of the `ee` API that soil_analysis_api and
+soil_raster_store call, with the same lazy semantics: images, collections and
+reductions only describe work, and nothing is computed until getInfo() (or
+ee.data.computePixels) is called. Each of those calls sleeps for a configurable
+latency, as one Earth Engine round trip would.
+
+The datasets are synthetic but deterministic and spatially coherent: values
+are smooth functions of longitude / latitude (nearby farms get similar
+values) with a monsoon season cycle over time.
+
+  - COPERNICUS/S2_SR_HARMONIZED   B4, B8, SCL; a scene every 5 days, cloudier in the monsoon
+  - NASA/SMAP/SPL4SMGP/007        sm_surface, sm_rootzone; a granule every 3 hours
+  - OpenLandMap pH / organic carbon / water content images, bands b0, b10, b30
+
+Use it with the real API:
+    EARTH_ENGINE_FAKE=1 FAKE_EE_LATENCY_MS=1500 python start_soil_api.py
+or from a script, before importing soil_analysis_api:
+    import fake_ee
+    fake_ee.install(latency_ms=800, jitter_ms=200)
+
+Latency of one round trip is latency_ms + per_reduction_ms * (reductions in
+the request) + a uniform jitter in [0, jitter_ms), drawn from a seeded RNG.
+stats() reports the number of round trips and reductions. Only the API surface
+the soil code uses is implemented, and only the mean reducer. An empty
+collection reduces to masked (None) values instead of raising.
+"""
+import math
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+METERS_PER_DEGREE = 111320.0
+MAX_SAMPLES_PER_AXIS = 5  # reductions sample at most 5 x 5 points of a region
+
+_config = {
+    "latency_ms": float(os.getenv("FAKE_EE_LATENCY_MS", "0")),
+    "per_reduction_ms": float(os.getenv("FAKE_EE_PER_REDUCTION_MS", "0")),
+    "jitter_ms": float(os.getenv("FAKE_EE_JITTER_MS", "0")),
+    "seed": int(os.getenv("FAKE_EE_SEED", "0")),
+}
+_rng = random.Random(_config["seed"])
+_lock = threading.Lock()
+_stats = {"round_trips": 0, "reductions": 0, "sleep_seconds": 0.0}
+_local = threading.local()
+
+
+class EEException(Exception):
+    pass
+
+
+def configure(latency_ms: Optional[float] = None, per_reduction_ms: Optional[float] = None,
+              jitter_ms: Optional[float] = None, seed: Optional[int] = None):
+    """Change the injected latency; None leaves a setting as it is"""
+    global _rng
+    for name, value in (("latency_ms", latency_ms), ("per_reduction_ms", per_reduction_ms),
+                        ("jitter_ms", jitter_ms), ("seed", seed)):
+        if value is not None:
+            _config[name] = value
+    if seed is not None:
+        _rng = random.Random(seed)
+
+
+def install(**settings) -> Any:
+    """Make `import ee` return this module (call before importing soil_analysis_api)"""
+    configure(**settings)
+    sys.modules["ee"] = sys.modules[__name__]
+    return sys.modules[__name__]
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {**_config, **_stats}
+
+
+def reset_stats():
+    with _lock:
+        _stats.update(round_trips=0, reductions=0, sleep_seconds=0.0)
+
+
+def Initialize(*args, **kwargs):
+    pass
+
+
+def Authenticate(*args, **kwargs):
+    pass
+
+
+def _round_trip(evaluate: Callable[[], Any]) -> Any:
+    """Run one request: evaluate the graph, then sleep for the simulated latency"""
+    _local.reductions = 0
+    result = evaluate()
+    reductions = _local.reductions
+    with _lock:
+        jitter = _rng.random() * _config["jitter_ms"] if _config["jitter_ms"] else 0.0
+        delay = (_config["latency_ms"] + _config["per_reduction_ms"] * reductions + jitter) / 1000.0
+        _stats["round_trips"] += 1
+        _stats["reductions"] += reductions
+        _stats["sleep_seconds"] += delay
+    if delay > 0:
+        time.sleep(delay)
+    return result
+
+
+def _count_reduction():
+    _local.reductions = getattr(_local, "reductions", 0) + 1
+
+
+def _resolve(value: Any) -> Any:
+    if isinstance(value, ComputedObject):
+        return value._evaluate()
+    if isinstance(value, dict):
+        return {key: _resolve(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_resolve(item) for item in value]
+    return value
+
+
+class ComputedObject:
+    """A lazily evaluated value; getInfo() is one round trip"""
+
+    def _evaluate(self) -> Any:
+        raise NotImplementedError
+
+    def getInfo(self) -> Any:
+        return _round_trip(self._evaluate)
+
+
+class Number(ComputedObject):
+    def __init__(self, value: Any):
+        self._value = value
+
+    def _evaluate(self) -> Any:
+        return self._value() if callable(self._value) else _resolve(self._value)
+
+    def gt(self, other: Any) -> "Number":
+        return Number(lambda: self._evaluate() > _resolve(other))
+
+
+class EEList(ComputedObject):
+    def __init__(self, items: Any):
+        self._items = items
+
+    def _evaluate(self) -> Any:
+        return _resolve(self._items() if callable(self._items) else self._items)
+
+
+class Dictionary(ComputedObject):
+    def __init__(self, items: Any = None):
+        self._items = items if items is not None else {}
+
+    def _evaluate(self) -> Any:
+        return _resolve(self._items() if callable(self._items) else self._items)
+
+
+class Algorithms:
+    @staticmethod
+    def If(condition: Any, true_case: Any, false_case: Any) -> ComputedObject:
+        """Only the chosen branch is evaluated, as in Earth Engine"""
+        return Dictionary(lambda: _resolve(true_case) if _resolve(condition) else _resolve(false_case))
+
+
+# --------- Geometry ----------
+class Geometry(ComputedObject):
+    """Kept as a bounding box (west, south, east, north); buffers are squares"""
+
+    def __init__(self, box: Tuple[float, float, float, float]):
+        self.box = box
+
+    @staticmethod
+    def Point(coords: Sequence[float]) -> "Geometry":
+        lon, lat = coords
+        return Geometry((lon, lat, lon, lat))
+
+    @staticmethod
+    def Rectangle(coords: Sequence[float]) -> "Geometry":
+        west, south, east, north = coords
+        return Geometry((west, south, east, north))
+
+    def buffer(self, distance: float) -> "Geometry":
+        west, south, east, north = self.box
+        dlat = distance / METERS_PER_DEGREE
+        dlon = distance / (METERS_PER_DEGREE * max(math.cos(math.radians((south + north) / 2)), 1e-6))
+        return Geometry((west - dlon, south - dlat, east + dlon, north + dlat))
+
+    def bounds(self) -> "Geometry":
+        return Geometry(self.box)
+
+    def _evaluate(self) -> Any:
+        west, south, east, north = self.box
+        return {"type": "Polygon", "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]]}
+
+    def samples(self, scale: float) -> List[Tuple[float, float]]:
+        """Pixel-centre sample points covering the box at roughly `scale` metres"""
+        west, south, east, north = self.box
+        lat = (south + north) / 2
+        width_m = (east - west) * METERS_PER_DEGREE * math.cos(math.radians(lat))
+        height_m = (north - south) * METERS_PER_DEGREE
+        columns = min(max(int(round(width_m / scale)), 1), MAX_SAMPLES_PER_AXIS)
+        rows = min(max(int(round(height_m / scale)), 1), MAX_SAMPLES_PER_AXIS)
+        return [(west + (east - west) * (col + 0.5) / columns, south + (north - south) * (row + 0.5) / rows)
+                for row in range(rows) for col in range(columns)]
+
+
+# --------- Reducers ----------
+class Reducer:
+    def __init__(self, outputs: Optional[List[str]] = None):
+        self.outputs = outputs
+
+    @staticmethod
+    def mean() -> "Reducer":
+        return Reducer()
+
+    def setOutputs(self, outputs: List[str]) -> "Reducer":
+        return Reducer(list(outputs))
+
+    @staticmethod
+    def combine(values: List[Optional[float]]) -> Optional[float]:
+        valid = [value for value in values if value is not None]
+        return sum(valid) / len(valid) if valid else None
+
+
+# --------- Images ----------
+PixelFn = Callable[[float, float], Dict[str, Optional[float]]]
+
+
+class Image(ComputedObject):
+    def __init__(self, source: Any = None, bands: Optional[List[str]] = None, fn: Optional[PixelFn] = None):
+        if isinstance(source, str):
+            if source not in _STATIC_IMAGES:
+                raise EEException(f"Image.load: Image asset '{source}' not found.")
+            bands, fn = ["b0", "b10", "b30"], _STATIC_IMAGES[source]
+        elif isinstance(source, (int, float)):
+            constant = float(source)
+            bands, fn = ["constant"], lambda lon, lat: {"constant": constant}
+        self.bands = list(bands or [])
+        self._fn = fn or (lambda lon, lat: {})
+
+    def pixel(self, lon: float, lat: float) -> Dict[str, Optional[float]]:
+        return self._fn(lon, lat)
+
+    def _evaluate(self) -> Any:
+        return {"type": "Image", "bands": [{"id": band} for band in self.bands]}
+
+    def _check(self, names: Sequence[str], operation: str):
+        for name in names:
+            if name not in self.bands:
+                raise EEException(f"Image.{operation}: Pattern '{name}' did not match any bands.")
+
+    def bandNames(self) -> EEList:
+        return EEList(list(self.bands))
+
+    def select(self, *selectors: Any) -> "Image":
+        names = list(selectors[0]) if len(selectors) == 1 and isinstance(selectors[0], (list, tuple)) else list(selectors)
+        self._check(names, "select")
+        return Image(bands=names, fn=lambda lon, lat: {name: self.pixel(lon, lat).get(name) for name in names})
+
+    def rename(self, *names: Any) -> "Image":
+        names = list(names[0]) if len(names) == 1 and isinstance(names[0], (list, tuple)) else list(names)
+        if len(names) != len(self.bands):
+            raise EEException(f"Image.rename: Can't rename {len(self.bands)} bands to {len(names)} names.")
+        old = list(self.bands)
+        return Image(bands=names, fn=lambda lon, lat: dict(zip(names, (self.pixel(lon, lat).get(band) for band in old))))
+
+    def addBands(self, srcImg: Any) -> "Image":
+        others = list(srcImg) if isinstance(srcImg, (list, tuple)) else [srcImg]
+        images = [self] + others
+        bands = [band for image in images for band in image.bands]
+
+        def fn(lon, lat):
+            values = {}
+            for image in images:
+                values.update(image.pixel(lon, lat))
+            return values
+        return Image(bands=bands, fn=fn)
+
+    def _map_values(self, operation: Callable[[float], float]) -> "Image":
+        def fn(lon, lat):
+            return {band: None if value is None else operation(value) for band, value in self.pixel(lon, lat).items()}
+        return Image(bands=self.bands, fn=fn)
+
+    def multiply(self, value: float) -> "Image":
+        return self._map_values(lambda v: v * value)
+
+    def divide(self, value: float) -> "Image":
+        return self._map_values(lambda v: v / value)
+
+    def unmask(self, value: float = 0) -> "Image":
+        def fn(lon, lat):
+            return {band: value if v is None else v for band, v in self.pixel(lon, lat).items()}
+        return Image(bands=self.bands, fn=fn)
+
+    def reduce(self, reducer: Reducer) -> "Image":
+        name = (reducer.outputs or ["mean"])[0]
+        return Image(bands=[name], fn=lambda lon, lat: {name: reducer.combine(list(self.pixel(lon, lat).values()))})
+
+    def normalizedDifference(self, bandNames: Sequence[str]) -> "Image":
+        first, second = bandNames
+        self._check([first, second], "normalizedDifference")
+
+        def fn(lon, lat):
+            values = self.pixel(lon, lat)
+            a, b = values.get(first), values.get(second)
+            return {"nd": None if a is None or b is None or a + b == 0 else (a - b) / (a + b)}
+        return Image(bands=["nd"], fn=fn)
+
+    def remap(self, from_values: Sequence[float], to_values: Sequence[float], defaultValue: Optional[float] = None) -> "Image":
+        mapping = dict(zip(from_values, to_values))
+        source = self.bands[0]
+
+        def fn(lon, lat):
+            value = self.pixel(lon, lat).get(source)
+            return {"remapped": None if value is None else mapping.get(value, defaultValue)}
+        return Image(bands=["remapped"], fn=fn)
+
+    def updateMask(self, mask: "Image") -> "Image":
+        def fn(lon, lat):
+            mask_values = list(mask.pixel(lon, lat).values())
+            values = self.pixel(lon, lat)
+            if len(mask_values) == 1:
+                mask_values = mask_values * len(values)
+            return {band: value if keep else None for (band, value), keep in zip(values.items(), mask_values)}
+        return Image(bands=self.bands, fn=fn)
+
+    def _reduce_box(self, reducer: Reducer, geometry: Geometry, scale: float) -> Dict[str, Optional[float]]:
+        _count_reduction()
+        samples = [self.pixel(lon, lat) for lon, lat in geometry.samples(scale)]
+        names = reducer.outputs if reducer.outputs and len(reducer.outputs) == len(self.bands) else self.bands
+        return {name: reducer.combine([sample.get(band) for sample in samples]) for name, band in zip(names, self.bands)}
+
+    def reduceRegion(self, reducer: Reducer, geometry: Geometry, scale: float = 1000, maxPixels: float = 1e7, **kwargs) -> Dictionary:
+        return Dictionary(lambda: self._reduce_box(reducer, _resolve_geometry(geometry), scale))
+
+    def reduceRegions(self, collection: "FeatureCollection", reducer: Reducer, scale: float = 1000, **kwargs) -> "FeatureCollection":
+        def reduce_all():
+            features = []
+            for feature in collection.features():
+                values = self._reduce_box(reducer, feature.geometry, scale)
+                if len(self.bands) == 1 and not reducer.outputs:
+                    values = {"mean": values[self.bands[0]]}
+                features.append(Feature(feature.geometry, {**feature.properties, **values}))
+            return features
+        return FeatureCollection(reduce_all)
+
+
+def _resolve_geometry(geometry: Any) -> Geometry:
+    if isinstance(geometry, FeatureCollection):
+        return geometry.geometry()
+    if isinstance(geometry, Feature):
+        return geometry.geometry
+    return geometry
+
+
+class ImageCollection(ComputedObject):
+    def __init__(self, source: str, start: Optional[float] = None, end: Optional[float] = None,
+                 operations: Tuple[Callable[[Image], Image], ...] = ()):
+        if source not in _COLLECTIONS:
+            raise EEException(f"ImageCollection.load: ImageCollection asset '{source}' not found.")
+        self.source = source
+        self.start, self.end = start, end
+        self.operations = operations
+
+    def _derive(self, **changes) -> "ImageCollection":
+        settings = {"start": self.start, "end": self.end, "operations": self.operations}
+        settings.update(changes)
+        return ImageCollection(self.source, **settings)
+
+    def filterBounds(self, geometry: Any) -> "ImageCollection":
+        return self._derive()  # the synthetic datasets cover the whole globe
+
+    def filterDate(self, start: Any, end: Any = None) -> "ImageCollection":
+        start_day = _day(start)
+        return self._derive(start=start_day, end=_day(end) if end is not None else start_day + 1)
+
+    def map(self, algorithm: Callable[[Image], Image]) -> "ImageCollection":
+        return self._derive(operations=self.operations + (algorithm,))
+
+    def select(self, *selectors: Any) -> "ImageCollection":
+        return self._derive(operations=self.operations + (lambda image: image.select(*selectors),))
+
+    def _times(self) -> List[float]:
+        if self.start is None:
+            raise EEException("ImageCollection: unbounded collections are not supported by fake_ee; use filterDate.")
+        step = _COLLECTIONS[self.source]["step_days"]
+        first = math.ceil(self.start / step) * step
+        return [first + index * step for index in range(max(0, math.ceil((self.end - first) / step)))]
+
+    def _scene(self, t: float) -> Image:
+        dataset = _COLLECTIONS[self.source]
+        image = Image(bands=dataset["bands"], fn=lambda lon, lat: dataset["pixel"](lon, lat, t))
+        for operation in self.operations:
+            image = operation(image)
+        return image
+
+    def size(self) -> Number:
+        return Number(lambda: len(self._times()))
+
+    def _composite(self, combine: Callable[[List[float]], float]) -> Image:
+        bands = self._scene(self.start if self.start is not None else 0).bands
+
+        def fn(lon, lat):
+            scenes = [self._scene(t).pixel(lon, lat) for t in self._times()]
+            composite = {}
+            for band in bands:
+                valid = [scene.get(band) for scene in scenes if scene.get(band) is not None]
+                composite[band] = combine(valid) if valid else None
+            return composite
+        return Image(bands=bands, fn=fn)
+
+    def median(self) -> Image:
+        def median(values):
+            values = sorted(values)
+            middle = len(values) // 2
+            return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+        return self._composite(median)
+
+    def mean(self) -> Image:
+        return self._composite(lambda values: sum(values) / len(values))
+
+    def _evaluate(self) -> Any:
+        return {"type": "ImageCollection", "id": self.source, "size": len(self._times())}
+
+
+# --------- Features ----------
+class Feature(ComputedObject):
+    def __init__(self, geometry: Any, properties: Optional[Dict[str, Any]] = None):
+        self.geometry = geometry
+        self.properties = dict(properties or {})
+
+    def _evaluate(self) -> Any:
+        return {
+            "type": "Feature",
+            "geometry": self.geometry._evaluate() if self.geometry is not None else None,
+            "properties": _resolve(self.properties),
+        }
+
+
+class FeatureCollection(ComputedObject):
+    def __init__(self, features: Any):
+        self._features = features
+
+    def features(self) -> List[Feature]:
+        return list(self._features() if callable(self._features) else self._features)
+
+    def geometry(self) -> Geometry:
+        boxes = [feature.geometry.box for feature in self.features()]
+        return Geometry((min(b[0] for b in boxes), min(b[1] for b in boxes),
+                         max(b[2] for b in boxes), max(b[3] for b in boxes)))
+
+    def select(self, propertySelectors: Sequence[str], newProperties: Optional[Sequence[str]] = None,
+               retainGeometry: bool = True) -> "FeatureCollection":
+        names = list(newProperties or propertySelectors)
+
+        def selected():
+            return [Feature(feature.geometry if retainGeometry else None,
+                            {new: feature.properties.get(old) for old, new in zip(propertySelectors, names)
+                             if old in feature.properties})
+                    for feature in self.features()]
+        return FeatureCollection(selected)
+
+    def _evaluate(self) -> Any:
+        return {"type": "FeatureCollection", "features": [feature._evaluate() for feature in self.features()]}
+
+
+# --------- ee.data ----------
+class _Data:
+    @staticmethod
+    def computePixels(params: Dict[str, Any]) -> Any:
+        """NUMPY_NDARRAY result of an image on an EPSG:4326 grid (one round trip)"""
+        import numpy as np
+
+        image: Image = params["expression"]
+        if params.get("fileFormat", "NUMPY_NDARRAY") != "NUMPY_NDARRAY":
+            raise EEException("fake_ee.computePixels only supports NUMPY_NDARRAY")
+        grid = params["grid"]
+        width, height = grid["dimensions"]["width"], grid["dimensions"]["height"]
+        transform = grid["affineTransform"]
+
+        def evaluate():
+            _count_reduction()
+            pixels = np.zeros((height, width), dtype=[(band, np.float64) for band in image.bands])
+            for row in range(height):
+                lat = transform["translateY"] + (row + 0.5) * transform["scaleY"]
+                for col in range(width):
+                    lon = transform["translateX"] + (col + 0.5) * transform["scaleX"]
+                    values = image.pixel(lon, lat)
+                    for band in image.bands:
+                        value = values.get(band)
+                        pixels[band][row, col] = np.nan if value is None else value
+            return pixels
+        return _round_trip(evaluate)
+
+
+data = _Data()
+
+
+# --------- Synthetic datasets ----------
+def _day(value: Any) -> float:
+    """Days since 1970-01-01 of an ee date argument (YYYY-MM-DD, ISO string, date or datetime)"""
+    if isinstance(value, datetime):
+        return (value - datetime(1970, 1, 1)).total_seconds() / 86400
+    if isinstance(value, date):
+        return float((value - date(1970, 1, 1)).days)
+    return _day(datetime.fromisoformat(str(value)))
+
+
+def _field(lon: float, lat: float, seed: float) -> float:
+    """Smooth, deterministic field in [-1, 1]; varies over tens of km, with a little field-scale texture"""
+    broad = math.sin(lon * 1.7 + seed) * math.cos(lat * 2.3 + 0.5 * seed)
+    regional = math.sin((lon + lat) * 7.1 + 1.3 * seed)
+    local = math.sin(lon * 900 + seed) * math.cos(lat * 900 - seed)
+    return (broad + 0.4 * regional + 0.1 * local) / 1.5
+
+
+def _season(t: float, lag_days: float = 0) -> float:
+    """0 in the dry season, 1 at the monsoon peak (mid August)"""
+    day_of_year = (t + 0.25) % 365.25
+    return 0.5 * (1 + math.cos(2 * math.pi * (day_of_year - 225 - lag_days) / 365.25))
+
+
+def _hash01(*values: float) -> float:
+    x = math.sin(sum(value * weight for value, weight in zip(values, (12.9898, 78.233, 37.719)))) * 43758.5453
+    return x - math.floor(x)
+
+
+def _sentinel2(lon: float, lat: float, t: float) -> Dict[str, Optional[float]]:
+    season = _season(t)
+    ndvi = 0.25 + 0.1 * (_field(lon, lat, 1) + 1) + 0.35 * season * (0.7 + 0.3 * _field(lon, lat, 2))
+    nir = 0.28 + 0.04 * _field(lon, lat, 3)
+    red = nir * (1 - ndvi) / (1 + ndvi)
+    cloudy = _hash01(t, math.floor(lon * 20), math.floor(lat * 20)) < 0.2 + 0.5 * season
+    return {"B4": red * 10000, "B8": nir * 10000, "SCL": 8.0 if cloudy else 4.0}
+
+
+def _smap(lon: float, lat: float, t: float) -> Dict[str, Optional[float]]:
+    wetness = 0.7 + 0.3 * _field(lon, lat, 4)
+    surface = 0.08 + 0.3 * _season(t) * wetness + 0.02 * math.sin(t * 2 * math.pi / 6.0 + lon)
+    rootzone = 0.12 + 0.22 * _season(t, lag_days=20) * wetness
+    return {"sm_surface": surface, "sm_rootzone": rootzone}
+
+
+def _openlandmap(base: float, spread: float, seed: float, depth_step: float) -> PixelFn:
+    def fn(lon, lat):
+        value = base + spread * _field(lon, lat, seed)
+        return {"b0": value, "b10": value + depth_step, "b30": value + 2 * depth_step}
+    return fn
+
+
+_COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    "COPERNICUS/S2_SR_HARMONIZED": {"bands": ["B4", "B8", "SCL"], "step_days": 5, "pixel": _sentinel2},
+    "NASA/SMAP/SPL4SMGP/007": {"bands": ["sm_surface", "sm_rootzone"], "step_days": 0.125, "pixel": _smap},
+}
+
+# Raw values in the assets' own units: pH x10, organic carbon in 5 g/kg, water content in %
+_STATIC_IMAGES: Dict[str, PixelFn] = {
+    "OpenLandMap/SOL/SOL_PH-H2O_USDA-4C1A2A_M/v02": _openlandmap(65, 12, 11, 1),
+    "OpenLandMap/SOL/SOL_ORGANIC-CARBON_USDA-6A1C_M/v02": _openlandmap(3.5, 2, 12, -0.5),
+    "OpenLandMap/SOL/SOL_WATERCONTENT-33KPA_USDA-4B1C_M/v01": _openlandmap(32, 9, 13, 1),
+}
@@ -0,0 +1,308 @@
+"""
+Persistent farmer store (SQLite, R-tree spatial index)
+
+Farmers used to live in a dict in main.py: lost on restart, separate per
+worker and only reachable by ID. Here each farmer is one row with typed
+columns (location, state, current crop, season dates, buffer and every soil
+characteristic), so filters such as "wheat farms in Karnataka with pH below
+6" run on indexes. Fertilizers are a separate (farmer, fertilizer) table.
+An R-tree over the farm locations answers bounding-box and nearest-farm
+queries without scanning the table. When the SQLite build has no R-tree
+module, a (lat, lon) index is used instead.
+
+Farmers go in and come out in the same shape as the old dict:
+
+    {"lat", "log", "fertilizers", "start_date", "end_date", "buffer",
+     "soil_characteristics": {"NDVI_mean", "SM_surface", ...}, "current_crop", "state"}
+
+("lon" is accepted as well as "log" on input.)
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# soil_characteristics key -> column
+SOIL_COLUMNS = {
+    "NDVI_mean": "ndvi_mean",
+    "SM_surface": "sm_surface",
+    "SM_rootzone": "sm_rootzone",
+    "pH_top30cm": "ph_top30cm",
+    "SOC_gkg_top30cm": "soc_gkg_top30cm",
+    "SOC_pct_top30cm": "soc_pct_top30cm",
+    "WC33_vpct_top30cm": "wc33_vpct_top30cm",
+}
+FARMER_COLUMNS = ["id", "lat", "lon", "state", "current_crop", "start_date", "end_date", "buffer_m"] + list(SOIL_COLUMNS.values())
+EARTH_RADIUS_KM = 6371.0
+# (min_lat, min_lon, max_lat, max_lon); min_lon > max_lon means the box crosses ±180°
+Box = Tuple[float, float, float, float]
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distances from one point to arrays of points"""
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def bbox_around(lat: float, lon: float, radius_km: float) -> Box:
+    """Smallest lat / lon box containing every point within radius_km (may cross ±180°)"""
+    angle = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angle)
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if min_lat <= -90.0 or max_lat >= 90.0 or math.sin(angle) >= math.cos(math.radians(lat)):
+        # The circle reaches a pole, so every longitude is within the radius
+        return min_lat, -180.0, max_lat, 180.0
+    dlon = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+    if dlon >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def split_antimeridian(bbox: Box) -> List[Box]:
+    """One box, or the two halves either side of ±180° when it crosses it"""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    if min_lon <= max_lon:
+        return [bbox]
+    return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+
+
+def farmer_row(farmer_id: int, farmer: Dict[str, Any]) -> Tuple:
+    lon = farmer.get("lon", farmer.get("log"))
+    if farmer.get("lat") is None or lon is None:
+        raise ValueError(f"Farmer {farmer_id} needs lat and lon")
+    soil = farmer.get("soil_characteristics") or {}
+    return (int(farmer_id), float(farmer["lat"]), float(lon), farmer.get("state"), farmer.get("current_crop"),
+            farmer.get("start_date"), farmer.get("end_date"), farmer.get("buffer"),
+            *[soil.get(key) for key in SOIL_COLUMNS])
+
+
+class FarmerStore:
+    def __init__(self, path: str):
+        """path: SQLite file shared by all workers (":memory:" for a throwaway store)"""
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Bulk loads update four indexes per farmer; a larger page cache keeps them in memory
+        self._conn.execute("PRAGMA cache_size=-65536")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS farmers ("
+            " id INTEGER PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL,"
+            " state TEXT COLLATE NOCASE, current_crop TEXT COLLATE NOCASE, start_date TEXT, end_date TEXT, buffer_m INTEGER,"
+            + "".join(f" {column} REAL," for column in SOIL_COLUMNS.values()) +
+            " updated REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS farmers_by_crop ON farmers (current_crop, state);"
+            "CREATE INDEX IF NOT EXISTS farmers_by_state ON farmers (state);"
+            "CREATE INDEX IF NOT EXISTS farmers_by_ph ON farmers (ph_top30cm);"
+            "CREATE TABLE IF NOT EXISTS farmer_fertilizers ("
+            " farmer_id INTEGER NOT NULL, fertilizer TEXT NOT NULL COLLATE NOCASE,"
+            " PRIMARY KEY (farmer_id, fertilizer)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS fertilizers_by_name ON farmer_fertilizers (fertilizer, farmer_id);"
+        )
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS farmer_locations USING rtree(id, min_lat, max_lat, min_lon, max_lon)"
+            )
+            self.rtree = True
+        except sqlite3.OperationalError:
+            print("⚠️  SQLite has no R-tree module, farm location queries use a (lat, lon) index")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS farmers_by_location ON farmers (lat, lon)")
+            self.rtree = False
+        self._conn.commit()
+
+    # --------- Writes ----------
+    def upsert_many(self, farmers: Iterable[Tuple[int, Dict[str, Any]]]) -> int:
+        """Insert or replace (farmer_id, farmer) pairs in one transaction; returns how many"""
+        rows, fertilizer_rows = [], []
+        for farmer_id, farmer in farmers:
+            rows.append(farmer_row(farmer_id, farmer))
+            fertilizer_rows += [(int(farmer_id), name) for name in farmer.get("fertilizers") or []]
+        if not rows:
+            return 0
+        now = time.time()
+        ids = [(row[0],) for row in rows]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO farmers ({', '.join(FARMER_COLUMNS)}, updated)"
+                f" VALUES ({', '.join('?' * (len(FARMER_COLUMNS) + 1))})",
+                [row + (now,) for row in rows]
+            )
+            self._conn.executemany("DELETE FROM farmer_fertilizers WHERE farmer_id = ?", ids)
+            self._conn.executemany("INSERT OR IGNORE INTO farmer_fertilizers (farmer_id, fertilizer) VALUES (?, ?)",
+                                   fertilizer_rows)
+            if self.rtree:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO farmer_locations (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+                    [(row[0], row[1], row[1], row[2], row[2]) for row in rows]
+                )
+        return len(rows)
+
+    def upsert(self, farmer_id: int, farmer: Dict[str, Any]):
+        self.upsert_many([(farmer_id, farmer)])
+
+    def delete(self, farmer_id: int) -> bool:
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM farmers WHERE id = ?", (farmer_id,)).rowcount
+            self._conn.execute("DELETE FROM farmer_fertilizers WHERE farmer_id = ?", (farmer_id,))
+            if self.rtree:
+                self._conn.execute("DELETE FROM farmer_locations WHERE id = ?", (farmer_id,))
+        return deleted > 0
+
+    # --------- Reads ----------
+    def _fetch(self, sql: str, params: Sequence[Any]) -> List[Dict[str, Any]]:
+        """Run a SELECT of FARMER_COLUMNS and attach each farmer's fertilizers"""
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            fertilizers: Dict[int, List[str]] = {}
+            ids = [row[0] for row in rows]
+            # Chunked to stay under SQLite's bound-parameter limit
+            for offset in range(0, len(ids), 900):
+                chunk = ids[offset:offset + 900]
+                for farmer_id, name in self._conn.execute(
+                    f"SELECT farmer_id, fertilizer FROM farmer_fertilizers WHERE farmer_id IN ({','.join('?' * len(chunk))})"
+                    " ORDER BY farmer_id, fertilizer", chunk
+                ):
+                    fertilizers.setdefault(farmer_id, []).append(name)
+        return [self._to_farmer(dict(zip(FARMER_COLUMNS, row)), fertilizers.get(row[0], [])) for row in rows]
+
+    @staticmethod
+    def _to_farmer(row: Dict[str, Any], fertilizers: List[str]) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "lat": row["lat"],
+            "log": row["lon"],
+            "fertilizers": fertilizers,
+            "start_date": row["start_date"],
+            "end_date": row["end_date"],
+            "buffer": row["buffer_m"],
+            "soil_characteristics": {key: row[column] for key, column in SOIL_COLUMNS.items()},
+            "current_crop": row["current_crop"],
+            "state": row["state"],
+        }
+
+    def get(self, farmer_id: int) -> Optional[Dict[str, Any]]:
+        found = self._fetch(f"SELECT {', '.join(FARMER_COLUMNS)} FROM farmers WHERE id = ?", (farmer_id,))
+        return found[0] if found else None
+
+    def get_many(self, farmer_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        found: Dict[int, Dict[str, Any]] = {}
+        for offset in range(0, len(farmer_ids), 900):
+            chunk = list(farmer_ids[offset:offset + 900])
+            for farmer in self._fetch(
+                f"SELECT {', '.join(FARMER_COLUMNS)} FROM farmers WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                found[farmer["id"]] = farmer
+        return found
+
+    def _where(self, crop: Optional[str] = None, state: Optional[str] = None, fertilizer: Optional[str] = None,
+               bbox: Optional[Box] = None,
+               ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None) -> Tuple[str, List[Any]]:
+        """(WHERE clause, params) for the search filters; ranges are keyed like soil_characteristics"""
+        clauses, params = [], []
+        if bbox is not None:
+            boxes = split_antimeridian(bbox)
+            if self.rtree:
+                # A subquery, so the R-tree is searched once rather than probed per farmer. The
+                # R-tree stores float32 boxes rounded outward, so it is asked for overlaps and
+                # the exact test on farmers.lat / lon below decides boxes on the edge.
+                clauses.append("farmers.id IN (" + " UNION ALL ".join(
+                    "SELECT id FROM farmer_locations WHERE max_lat >= ? AND min_lat <= ? AND max_lon >= ? AND min_lon <= ?"
+                    for _ in boxes) + ")")
+                for min_lat, min_lon, max_lat, max_lon in boxes:
+                    params += [min_lat, max_lat, min_lon, max_lon]
+            clauses.append("(" + " OR ".join(
+                "(farmers.lat BETWEEN ? AND ? AND farmers.lon BETWEEN ? AND ?)" for _ in boxes) + ")")
+            for min_lat, min_lon, max_lat, max_lon in boxes:
+                params += [min_lat, max_lat, min_lon, max_lon]
+        if crop is not None:
+            clauses.append("farmers.current_crop = ?")
+            params.append(crop)
+        if state is not None:
+            clauses.append("farmers.state = ?")
+            params.append(state)
+        if fertilizer is not None:
+            # Correlated so it stops early under LIMIT and only probes rows the other filters kept
+            clauses.append("EXISTS (SELECT 1 FROM farmer_fertilizers WHERE farmer_id = farmers.id AND fertilizer = ?)")
+            params.append(fertilizer)
+        for key, (low, high) in (ranges or {}).items():
+            if key not in SOIL_COLUMNS:
+                raise ValueError(f"Unknown soil characteristic: {key}")
+            if low is not None:
+                clauses.append(f"farmers.{SOIL_COLUMNS[key]} >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append(f"farmers.{SOIL_COLUMNS[key]} <= ?")
+                params.append(high)
+        return " AND ".join(clauses) or "1", params
+
+    def search(self, limit: int = 100, offset: int = 0, **filters) -> List[Dict[str, Any]]:
+        """Farmers matching crop / state / fertilizer / bbox / soil ranges, by ID"""
+        where, params = self._where(**filters)
+        return self._fetch(f"SELECT {', '.join(FARMER_COLUMNS)} FROM farmers WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+                           params + [limit, offset])
+
+    def count(self, **filters) -> int:
+        if [name for name, value in filters.items() if value] == ["fertilizer"]:
+            # Answered from the fertilizer index alone instead of probing every farmer
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM farmer_fertilizers WHERE fertilizer = ?",
+                                          (filters["fertilizer"],)).fetchone()[0]
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM farmers WHERE {where}", params).fetchone()[0]
+
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                    limit: int = 1000) -> List[Dict[str, Any]]:
+        """Farms inside the box, edges included; min_lon > max_lon selects a box across ±180°"""
+        return self.search(bbox=(min_lat, min_lon, max_lat, max_lon), limit=limit)
+
+    def nearest(self, lat: float, lon: float, k: int = 5, max_km: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        The k farms closest to a point, each with "distance_km". The search
+        radius doubles from 1 km until k farms lie within it; its box wraps
+        around ±180° and, at half the Earth's circumference, covers the globe.
+        """
+        radius = 1.0
+        limit_km = max_km if max_km is not None else math.pi * EARTH_RADIUS_KM
+        while True:
+            radius = min(radius, limit_km)
+            bbox = bbox_around(lat, lon, radius)
+            # A box spanning the globe holds every farm: scan the table instead of the R-tree,
+            # and stop there, since a wider radius finds no more
+            whole_globe = bbox == (-90.0, -180.0, 90.0, 180.0)
+            where, params = self._where(bbox=None if whole_globe else bbox)
+            with self._lock:
+                candidates = self._conn.execute(f"SELECT id, lat, lon FROM farmers WHERE {where}", params).fetchall()
+            ids = np.array([row[0] for row in candidates], dtype=np.int64)
+            distances = haversine_km(lat, lon, np.array([row[1] for row in candidates], dtype=np.float64),
+                                     np.array([row[2] for row in candidates], dtype=np.float64))
+            inside = distances <= (limit_km if whole_globe else radius)
+            if inside.sum() >= k or radius >= limit_km or whole_globe:
+                break
+            radius *= 2
+        ids, distances = ids[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")[:k]
+        within = [(float(distances[index]), int(ids[index])) for index in order]
+        farmers = self.get_many([farmer_id for _, farmer_id in within])
+        return [{**farmers[farmer_id], "distance_km": round(distance, 4)} for distance, farmer_id in within]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            farmers = self._conn.execute("SELECT COUNT(*) FROM farmers").fetchone()[0]
+        return {"path": self.path, "farmers": farmers, "spatial_index": "rtree" if self.rtree else "btree"}
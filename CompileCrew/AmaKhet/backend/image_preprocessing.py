@@ -0,0 +1,45 @@
+"""
+Image preprocessing for the plant disease model
+
+`preprocess_image_fast` is the serving path. Compared to the original
+pipeline (`preprocess_image_legacy`) it:
+  - asks the JPEG decoder for a reduced-scale decode (DCT scaling via
+    Image.draft), so a 12 MP photo is decoded at ~1/8 size instead of fully
+  - resizes non-JPEG images with a reducing gap (cheap box reduce first)
+  - produces float32 directly and normalizes in place, instead of building
+    a uint8 copy and then a float64 array that TensorFlow converts again
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+TARGET_SIZE = (160, 160)
+_SCALE = np.float32(1.0 / 255.0)
+
+
+def preprocess_image_legacy(image_bytes: bytes, size=TARGET_SIZE) -> np.ndarray:
+    """Original pipeline: full decode, resize, float64 normalize. Kept for comparison."""
+    image = Image.open(io.BytesIO(image_bytes))
+    image = image.convert('RGB')
+    image = image.resize(size)
+    image_array = np.array(image) / 255.0
+    return np.expand_dims(image_array, axis=0)
+
+
+def preprocess_image_fast(image_bytes: bytes, size=TARGET_SIZE) -> np.ndarray:
+    """Decode to a (1, H, W, 3) float32 array in [0, 1] with as little work as possible"""
+    image = Image.open(io.BytesIO(image_bytes))
+
+    if image.format == "JPEG":
+        # Picks the largest 1/1, 1/2, 1/4 or 1/8 scale that is still >= size
+        image.draft('RGB', size)
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if image.size != size:
+        image = image.resize(size, reducing_gap=3.0)
+
+    image_array = np.asarray(image, dtype=np.float32)
+    image_array *= _SCALE
+    return image_array[np.newaxis]
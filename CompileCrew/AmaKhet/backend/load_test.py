@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the backend APIs
+
+Drives /crop_yield, /crop_recommendation, /fertilizer_recommendation,
+/plant_disease_detection (main.py) and /api/soil-analysis
+(soil_analysis_api.py) with a fixed number of concurrent clients and a
+weighted request mix, then reports throughput and p50/p95/p99 latency per
+endpoint. Results can be saved as JSON to compare runs across changes.
+
+By default everything runs offline in this process: both apps are served by
+uvicorn on free localhost ports, the joblib models and the disease model are
+replaced with stub models (with configurable inference time), and the soil API
+runs its real code path against fake_ee.py. Caches live in a temporary
+directory, so every run starts cold; --no-cache disables them entirely. Pass
+--main-url / --soil-url to load-test servers that are already running.
+
+Usage:
+    python load_test.py --concurrency 16 --duration 30 --json results/load.json
+    python load_test.py --mix crop_yield=3,plant_disease_detection=1 --distinct 10
+    python load_test.py --main-url http://localhost:8000 --soil-url http://localhost:8001
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+ENDPOINTS = ["crop_yield", "crop_recommendation", "fertilizer_recommendation", "plant_disease_detection", "soil_analysis"]
+SOIL_ENDPOINTS = {"soil_analysis"}
+# Odisha, where most of our farmers are
+SOIL_BBOX = (81.3, 17.8, 87.5, 22.6)
+
+STATES = ["Odisha", "West Bengal", "Andhra Pradesh", "Chhattisgarh"]
+DISTRICTS = ["Khordha", "Cuttack", "Puri", "Ganjam", "Balasore", "Sambalpur"]
+SEASONS = ["Kharif", "Rabi", "Summer", "Whole Year"]
+CROPS = ["Rice", "Maize", "Groundnut", "Moong(Green Gram)", "Sugarcane", "Potato"]
+SOIL_TYPES = ["Sandy", "Loamy", "Black", "Red", "Clayey"]
+FERTILIZER_CROPS = ["Maize", "Sugarcane", "Cotton", "Tobacco", "Paddy", "Barley", "Wheat"]
+RECOMMENDED_CROPS = ["rice", "maize", "chickpea", "kidneybeans", "pigeonpeas", "mungbean", "jute", "cotton"]
+FERTILIZERS = ["Urea", "DAP", "14-35-14", "28-28", "17-17-17", "20-20", "10-26-26"]
+
+
+# --------- Stub models ----------
+class StubEncoder:
+    """Stands in for the fitted encoders: one deterministic column per categorical value"""
+
+    def transform(self, rows):
+        return np.array([[zlib.crc32(str(value).encode()) % 1000 / 1000 for value in row] for row in rows])
+
+
+class StubModel:
+    """Regressor (labels=None) or classifier with a simulated inference time"""
+
+    def __init__(self, labels: Optional[List[str]] = None, latency_ms: float = 0.0):
+        self.labels = labels
+        self.latency_ms = latency_ms
+
+    def predict(self, features):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        scores = np.asarray(features, dtype=np.float64).sum(axis=1)
+        if self.labels is None:
+            return scores * 10 + 100
+        return np.array([self.labels[int(abs(score) * 1000) % len(self.labels)] for score in scores])
+
+
+def stub_disease_backend(path: str, num_classes: int, latency_ms: float, per_image_ms: float):
+    import disease_backends
+
+    class StubDiseaseBackend(disease_backends.DiseaseModelBackend):
+        """Softmax over a deterministic function of the image; sleeps like a real forward pass"""
+        name = "stub"
+
+        def predict(self, images: np.ndarray) -> np.ndarray:
+            time.sleep((latency_ms + per_image_ms * len(images)) / 1000)
+            means = images.reshape(len(images), -1).mean(axis=1, keepdims=True)
+            logits = np.sin(means * 50 + np.arange(num_classes)) * 4
+            exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+            return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+    return StubDiseaseBackend(path)
+
+
+# --------- Offline servers ----------
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(app, name: str) -> str:
+    """Run an ASGI app with uvicorn in a daemon thread; returns its base URL"""
+    import uvicorn
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    threading.Thread(target=server.run, name=f"{name}-server", daemon=True).start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError(f"{name} server did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def start_offline_servers(args, workdir: str, need_main: bool, need_soil: bool) -> Tuple[Optional[str], Optional[str]]:
+    """Configure stubs and fake Earth Engine through the apps' own settings, then serve them"""
+    stub_model_path = os.path.join(workdir, "stub_disease_model.bin")
+    with open(stub_model_path, "wb") as f:
+        f.write(b"stub")
+    os.environ.update({
+        "EARTH_ENGINE_FAKE": "1",
+        "FAKE_EE_LATENCY_MS": str(args.ee_latency_ms),
+        "FAKE_EE_JITTER_MS": str(args.ee_jitter_ms),
+        "FAKE_EE_SEED": str(args.seed),
+        "SOIL_CACHE_PATH": "" if args.no_cache else os.path.join(workdir, "soil_cache.sqlite3"),
+        "SOIL_SERIES_PATH": "" if args.no_cache else os.path.join(workdir, "soil_series.sqlite3"),
+        "SOIL_RASTER_DIR": os.path.join(workdir, "soil_rasters"),
+        "DISEASE_MODEL_PATH": stub_model_path,
+        "DISEASE_CACHE_DIR": os.path.join(workdir, "disease_cache"),
+        "FARMER_DB_PATH": os.path.join(workdir, "farmers.sqlite3"),
+        "DISEASE_CACHE_MAX_BYTES": "0" if args.no_cache else os.getenv("DISEASE_CACHE_MAX_BYTES", str(100 * 1024 * 1024)),
+        "PREDICTION_CACHE_SIZE": "0" if args.no_cache else os.getenv("PREDICTION_CACHE_SIZE", "10000"),
+    })
+
+    main_url = soil_url = None
+    if need_main:
+        import main
+
+        registry = main.model_registry
+        registry.register("encoder", StubEncoder)
+        registry.register("crop_encoder", StubEncoder)
+        registry.register("soil_encoder", StubEncoder)
+        registry.register("yield_model", lambda: StubModel(latency_ms=args.model_latency_ms))
+        registry.register("crop_recommendation_model", lambda: StubModel(RECOMMENDED_CROPS, args.model_latency_ms))
+        registry.register("fertilizer_model", lambda: StubModel(FERTILIZERS, args.model_latency_ms))
+        registry.register("plant_disease_model", lambda: stub_disease_backend(
+            stub_model_path, len(main.disease_labels), args.disease_latency_ms, args.disease_per_image_ms))
+        registry.reset()
+        # The stubs have no model files, so the caches' fingerprint changed; it is not a model update
+        for cache in main.prediction_caches.values():
+            cache.reset_fingerprint()
+        main_url = serve(main.app, "main")
+    if need_soil:
+        import soil_analysis_api
+        soil_url = serve(soil_analysis_api.app, "soil")
+    return main_url, soil_url
+
+
+def wait_ready(main_url: Optional[str], timeout: float = 120):
+    """Wait for /ready so model warmup is not measured"""
+    if not main_url:
+        return
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{main_url}/ready", timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    print("⚠️  Main API did not report ready; measuring anyway")
+
+
+# --------- Request inputs ----------
+def make_jpeg(rng: random.Random, width: int = 640, height: int = 480) -> bytes:
+    """A leaf-coloured photo-like JPEG (smooth gradient plus noise)"""
+    from PIL import Image
+
+    noise = np.random.default_rng(rng.randrange(2 ** 32))
+    base = np.array([rng.randint(40, 120), rng.randint(100, 200), rng.randint(30, 90)], dtype=np.float32)
+    gradient = np.linspace(0.7, 1.2, width, dtype=np.float32)[None, :, None]
+    pixels = base * gradient + noise.normal(0, 18, (height, width, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def build_inputs(endpoint: str, rng: random.Random) -> Dict[str, Any]:
+    """One request for an endpoint: method, path and params / json / files"""
+    if endpoint == "crop_yield":
+        # GET with a JSON body, as the endpoint is declared
+        return {"method": "GET", "path": "/crop_yield", "json": {
+            "Jstate": rng.choice(STATES), "Jdistrict": rng.choice(DISTRICTS), "Jseason": rng.choice(SEASONS),
+            "Jcrops": rng.choice(CROPS), "Jarea": round(rng.uniform(0.5, 20), 2)}}
+    if endpoint == "crop_recommendation":
+        return {"method": "GET", "path": "/crop_recommendation", "params": {
+            "n_params": rng.randint(0, 140), "p_params": rng.randint(5, 145), "k_params": rng.randint(5, 205),
+            "t_params": round(rng.uniform(10, 40), 1), "h_params": round(rng.uniform(15, 99), 1),
+            "ph_params": round(rng.uniform(4, 9), 2), "r_params": round(rng.uniform(20, 300), 1)}}
+    if endpoint == "fertilizer_recommendation":
+        return {"method": "GET", "path": "/fertilizer_recommendation", "params": {
+            "temp": rng.randint(20, 40), "humidity": rng.randint(40, 75), "moisture": rng.randint(25, 65),
+            "soil_type": rng.choice(SOIL_TYPES), "crop_type": rng.choice(FERTILIZER_CROPS),
+            "nitrogen": rng.randint(0, 45), "potassium": rng.randint(0, 20), "phosphorous": rng.randint(0, 45)}}
+    if endpoint == "plant_disease_detection":
+        return {"method": "POST", "path": "/plant_disease_detection",
+                "files": {"file": ("leaf.jpg", make_jpeg(rng), "image/jpeg")}}
+    if endpoint == "soil_analysis":
+        west, south, east, north = SOIL_BBOX
+        lat, lon = round(rng.uniform(south, north), 5), round(rng.uniform(west, east), 5)
+        return {"method": "GET", "path": f"/api/soil-analysis/{lat}/{lon}"}
+    raise ValueError(f"Unknown endpoint '{endpoint}'")
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """"crop_yield=3,soil_analysis=1" -> weights; "all" weighs every endpoint equally"""
+    if text.strip() == "all":
+        return {endpoint: 1.0 for endpoint in ENDPOINTS}
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+        if mix[name] < 0:
+            raise ValueError(f"Weight of '{name}' must not be negative")
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+    if not mix:
+        raise ValueError("The mix needs at least one endpoint with a positive weight")
+    return mix
+
+
+# --------- Load generation ----------
+def run_load(urls: Dict[str, str], mix: Dict[str, float], inputs: Dict[str, List[Dict[str, Any]]],
+             concurrency: int, duration: float, max_requests: int, warmup: float, seed: int,
+             timeout: float) -> Tuple[List[Tuple[str, float, int, Optional[str]]], float]:
+    """
+    Closed loop: each of `concurrency` clients sends its next request as soon as
+    the previous one finished. Returns (endpoint, latency s, status, error) per
+    measured request and the measured wall time.
+    """
+    names, weights = list(mix), list(mix.values())
+    samples: List[Tuple[str, float, int, Optional[str]]] = []
+    lock = threading.Lock()
+    issued = [0]
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+
+    def client(number: int):
+        rng = random.Random(seed * 1000 + number)
+        session = requests.Session()
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            with lock:
+                if max_requests and issued[0] >= max_requests:
+                    return
+                if now >= measure_from:
+                    issued[0] += 1
+            endpoint = rng.choices(names, weights)[0]
+            request = rng.choice(inputs[endpoint])
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    request["method"], urls[endpoint] + request["path"], params=request.get("params"),
+                    json=request.get("json"), files=request.get("files"), timeout=timeout
+                )
+                status, error = response.status_code, None if response.ok else response.text[:200]
+            except requests.RequestException as e:
+                status, error = 0, str(e)[:200]
+            finished = time.perf_counter()
+            if started >= measure_from:
+                with lock:
+                    samples.append((endpoint, finished - started, status, error))
+
+    threads = [threading.Thread(target=client, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, max(time.perf_counter() - measure_from, 1e-9)
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, Optional[float]]:
+    if not latencies:
+        return {key: None for key in ("min", "mean", "p50", "p90", "p95", "p99", "max")}
+    ms = np.asarray(latencies) * 1000
+    p50, p90, p95, p99 = np.percentile(ms, [50, 90, 95, 99])
+    return {
+        "min": round(float(ms.min()), 2), "mean": round(float(ms.mean()), 2),
+        "p50": round(float(p50), 2), "p90": round(float(p90), 2), "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2), "max": round(float(ms.max()), 2),
+    }
+
+
+def summarize(samples: List[Tuple[str, float, int, Optional[str]]], elapsed: float) -> Dict[str, Any]:
+    def summary(rows):
+        statuses: Dict[str, int] = {}
+        for _, _, status, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        errors = [row for row in rows if not 200 <= row[2] < 300]
+        return {
+            "requests": len(rows),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(rows), 4) if rows else None,
+            "status_codes": statuses,
+            "throughput_rps": round(len(rows) / elapsed, 2),
+            "latency_ms": latency_summary([row[1] for row in rows]),
+            "sample_errors": sorted({row[3] for row in errors if row[3]})[:3],
+        }
+
+    endpoints = sorted({row[0] for row in samples})
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "overall": summary(samples),
+        "endpoints": {endpoint: summary([row for row in samples if row[0] == endpoint]) for endpoint in endpoints},
+    }
+
+
+def server_stats(main_url: Optional[str], soil_url: Optional[str]) -> Dict[str, Any]:
+    """Cache, batching and pool counters reported by the servers after the run"""
+    paths = []
+    if main_url:
+        paths += [("prediction_cache", main_url + "/prediction_cache/stats"),
+                  ("plant_disease_detection", main_url + "/plant_disease_detection/stats")]
+    if soil_url:
+        paths += [("soil_analysis", soil_url + "/api/soil-analysis/stats"),
+                  ("soil_cache", soil_url + "/api/soil-cache/stats"),
+                  ("soil_series", soil_url + "/api/soil-series/stats")]
+    stats = {}
+    for name, url in paths:
+        try:
+            response = requests.get(url, timeout=5)
+            stats[name] = response.json() if response.ok else {"status_code": response.status_code}
+        except (requests.RequestException, ValueError) as e:
+            stats[name] = {"error": str(e)}
+    return stats
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(results: Dict[str, Any]):
+    print(f"\n{'endpoint':<28}{'reqs':>7}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(results["endpoints"].items()) + [("overall", results["overall"])]
+    for name, summary in rows:
+        latency = summary["latency_ms"]
+        fmt = lambda value: f"{value:>10.1f}" if value is not None else f"{'-':>10}"
+        print(f"{name:<28}{summary['requests']:>7}{summary['errors']:>8}{summary['throughput_rps']:>9.1f}"
+              f"{fmt(latency['p50'])}{fmt(latency['p95'])}{fmt(latency['p99'])}")
+    for name, summary in results["endpoints"].items():
+        for error in summary["sample_errors"]:
+            print(f"⚠️  {name}: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the backend APIs")
+    parser.add_argument("--mix", default="all", help="Weighted endpoints, e.g. crop_yield=3,soil_analysis=1 (default: all equally)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many measured requests (0: no limit)")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds of load before measuring")
+    parser.add_argument("--distinct", type=int, default=50, help="Distinct inputs per endpoint; fewer means more cache hits")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=60, help="Per-request timeout in seconds")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--label", help="Free-form label stored with the results")
+    parser.add_argument("--main-url", help="Use a running main API instead of the offline one")
+    parser.add_argument("--soil-url", help="Use a running soil API instead of the offline one")
+    offline = parser.add_argument_group("offline mode")
+    offline.add_argument("--no-cache", action="store_true", help="Disable prediction, disease and soil caches")
+    offline.add_argument("--model-latency-ms", type=float, default=1.0, help="Stub tabular model predict time")
+    offline.add_argument("--disease-latency-ms", type=float, default=20.0, help="Stub disease model time per batch")
+    offline.add_argument("--disease-per-image-ms", type=float, default=5.0, help="Stub disease model time per image")
+    offline.add_argument("--ee-latency-ms", type=float, default=800.0, help="fake_ee latency per Earth Engine round trip")
+    offline.add_argument("--ee-jitter-ms", type=float, default=200.0, help="fake_ee random extra latency")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.concurrency < 1 or args.distinct < 1:
+        parser.error("--concurrency and --distinct must be at least 1")
+
+    started_at = datetime.now().isoformat()
+    need_main = any(endpoint not in SOIL_ENDPOINTS for endpoint in mix)
+    need_soil = any(endpoint in SOIL_ENDPOINTS for endpoint in mix)
+    workdir = tempfile.mkdtemp(prefix="amakhet_load_")
+    try:
+        main_url, soil_url = args.main_url, args.soil_url
+        if (need_main and not main_url) or (need_soil and not soil_url):
+            print("🔧 Starting offline servers with stub models and fake Earth Engine...")
+            offline_main, offline_soil = start_offline_servers(
+                args, workdir, need_main and not main_url, need_soil and not soil_url)
+            main_url, soil_url = main_url or offline_main, soil_url or offline_soil
+        wait_ready(main_url if need_main else None)
+
+        rng = random.Random(args.seed)
+        inputs = {endpoint: [build_inputs(endpoint, rng) for _ in range(args.distinct)] for endpoint in mix}
+        urls = {endpoint: soil_url if endpoint in SOIL_ENDPOINTS else main_url for endpoint in mix}
+
+        print(f"🚀 {args.concurrency} clients for {args.duration:.0f}s (+{args.warmup:.0f}s warmup), mix: "
+              + ", ".join(f"{name}={weight:g}" for name, weight in mix.items()))
+        samples, elapsed = run_load(urls, mix, inputs, args.concurrency, args.duration, args.requests,
+                                    args.warmup, args.seed, args.timeout)
+        results = summarize(samples, elapsed)
+        print_report(results)
+
+        report = {
+            "tool": "load_test",
+            "label": args.label,
+            "started_at": started_at,
+            "config": {key: value for key, value in vars(args).items() if key not in ("json", "label")},
+            "mode": {"main": "url" if args.main_url else "offline", "soil": "url" if args.soil_url else "offline"},
+            "environment": {"python": sys.version.split()[0], "platform": platform.platform(),
+                            "cpus": os.cpu_count(), "git_commit": git_commit()},
+            "results": results,
+            "server_stats": server_stats(main_url if need_main else None, soil_url if need_soil else None),
+        }
+        if args.json:
+            directory = os.path.dirname(args.json)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ Results written to {args.json}")
+        return 1 if results["overall"]["requests"] == 0 else 0
+    finally:
+        # The offline servers' caches, series and farmer store live here
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,142 +1,231 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi_mcp import FastApiMCP
-from fastapi.responses import JSONResponse
+import startup_profile
+from startup_profile import timed
+
+# TensorFlow and the agent stack (crewai, langchain) are not imported here:
+# the disease model loads through the model registry and the agent stack on
+# the first /query (or in the background with AGENT_WARMUP=1). GET /startup
+# shows the time spent per import and per model load.
+with timed("import", "fastapi"):
+    from fastapi import FastAPI, File, UploadFile, HTTPException, Body, Query
+    from fastapi.responses import JSONResponse, StreamingResponse
+with timed("import", "fastapi_mcp"):
+    from fastapi_mcp import FastApiMCP
+import asyncio
+import functools
+import hashlib
 import json
 import os
-import uuid
-try:
-    import tensorflow as tf
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
-    print("⚠️  TensorFlow not available. Plant disease detection will be disabled.")
-
-from PIL import Image
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+
 import io
 
+from upload_limits import MaxBodySizeMiddleware, read_upload_capped
+import metrics
+import request_profiler
+
 app = FastAPI()
 
+# Upload size caps, enforced while the request body is still streaming in
+DISEASE_MAX_IMAGE_BYTES = int(os.getenv("DISEASE_MAX_IMAGE_BYTES", str(15 * 1024 * 1024)))
+DISEASE_BULK_MAX_UPLOAD_BYTES = int(os.getenv("DISEASE_BULK_MAX_UPLOAD_BYTES", str(500 * 1024 * 1024)))
+app.add_middleware(MaxBodySizeMiddleware, limits={
+    # Allow for multipart framing around the image itself
+    "/plant_disease_detection": DISEASE_MAX_IMAGE_BYTES + 64 * 1024,
+    "/plant_disease_detection/bulk": DISEASE_BULK_MAX_UPLOAD_BYTES,
+})
+# Request latency per route and GET /metrics (Prometheus text format)
+metrics.instrument(app, "main")
+# Opt-in profiling of single requests (X-Profile header or PROFILE_SAMPLE_RATE)
+request_profiler.instrument(app, "main", request_profiler.profiler_from_env())
+
 from pydantic import BaseModel, Field, PositiveFloat
-from typing import Dict
+from typing import Dict, List, Any, Optional
 
-import joblib
-import numpy as np
+import csv
+with timed("import", "numpy"):
+    import numpy as np
 
+with timed("import", "local modules"):
+    import tabular_models
+    from micro_batcher import MicroBatcher
+    from bounded_executor import BoundedExecutor, QueueFullError
+    from image_preprocessing import preprocess_image_fast, preprocess_image_legacy
+    import disease_backends
+    from model_registry import ModelRegistry, parse_preload
+    from prediction_cache import PredictionCache
+    from disease_cache import DiseaseResultCache
+    from farmer_store import FarmerStore
+    from mcp_session import MCPConnectError, MCPSession
 
-encoder = joblib.load("models/encoder_yield.joblib")
-yield_model = joblib.load("models/crop_yield_model.joblib")
+
+# Models are loaded on first use (see model_registry); MODEL_PRELOAD lists the
+# ones to load at startup instead ("all", "none" or comma-separated names)
+MODELS_DIR = os.getenv("MODELS_DIR", "models")
+MODEL_MMAP_MODE = os.getenv("MODEL_MMAP_MODE", "r") or None
+model_registry = ModelRegistry(
+    MODELS_DIR, tabular_models.MODEL_FILES, mmap_mode=MODEL_MMAP_MODE,
+    on_load=lambda name, ms, error: startup_profile.record("model", name, ms, error)
+)
 
 # Load plant disease model and data
-plant_disease_model = None
+# DISEASE_BACKEND picks the runtime: keras (full TensorFlow), tflite or onnx
+DISEASE_BACKEND = os.getenv("DISEASE_BACKEND", "keras")
+DISEASE_MODEL_PATH = os.getenv("DISEASE_MODEL_PATH") or None
+DISEASE_NUM_THREADS = int(os.getenv("DISEASE_NUM_THREADS", "0")) or None
+DISEASE_MAX_BATCH_SIZE = int(os.getenv("DISEASE_MAX_BATCH_SIZE", "16"))
+# Keras only: run through a compiled tf.function (DISEASE_COMPILE), optionally with XLA
+DISEASE_COMPILE = os.getenv("DISEASE_COMPILE", "1") != "0"
+DISEASE_XLA = os.getenv("DISEASE_XLA", "0") == "1"
+
+
+def parse_warmup_batch_sizes(value: str, max_batch_size: int) -> List[int]:
+    """Comma-separated sizes, or powers of two up to the max micro-batch size by default"""
+    if value:
+        return sorted({int(size) for size in value.split(",") if size.strip()})
+    sizes = [1]
+    while sizes[-1] * 2 <= max_batch_size:
+        sizes.append(sizes[-1] * 2)
+    if sizes[-1] != max_batch_size:
+        sizes.append(max_batch_size)
+    return sizes
+
+
+DISEASE_WARMUP_BATCH_SIZES = parse_warmup_batch_sizes(os.getenv("DISEASE_WARMUP_BATCH_SIZES", ""), DISEASE_MAX_BATCH_SIZE)
+
 plant_disease_data = None
 
-if TENSORFLOW_AVAILABLE:
+
+def load_disease_model() -> disease_backends.DiseaseModelBackend:
     try:
-        # Try to load from backend/ML/ML first, then fallback to project root
-        model_paths = [
-            "ML/ML/plant_disease_recog_model_pwp.keras",
-            "../ML/ML/plant_disease_recog_model_pwp.keras"
-        ]
-        
-        json_paths = [
-            "ML/ML/plant_disease.json",
-            "../ML/ML/plant_disease.json"
-        ]
-        
-        for model_path in model_paths:
-            if os.path.exists(model_path):
-                plant_disease_model = tf.keras.models.load_model(model_path)
-                print(f"✅ Loaded model from: {model_path}")
-                break
-        
-        for json_path in json_paths:
-            if os.path.exists(json_path):
-                with open(json_path, 'r') as file:
-                    plant_disease_data = json.load(file)
-                print(f"✅ Loaded disease data from: {json_path}")
-                break
-        
-        if plant_disease_model is None or plant_disease_data is None:
-            print("⚠️  Could not find ML model or disease data files")
-            plant_disease_model = None
-            plant_disease_data = None
-    except Exception as e:
-        print(f"⚠️  Error loading plant disease model: {e}")
-        plant_disease_model = None
-        plant_disease_data = None
-else:
-    print("⚠️  TensorFlow not available, skipping plant disease model loading")
-    
-    # Create a mapping from model indices to disease data
-    disease_labels = ['Apple___Apple_scab',
-     'Apple___Black_rot',
-     'Apple___Cedar_apple_rust',
-     'Apple___healthy',
-     'Background_without_leaves',
-     'Blueberry___healthy',
-     'Cherry___Powdery_mildew',
-     'Cherry___healthy',
-     'Corn___Cercospora_leaf_spot Gray_leaf_spot',
-     'Corn___Common_rust',
-     'Corn___Northern_Leaf_Blight',
-     'Corn___healthy',
-     'Grape___Black_rot',
-     'Grape__Esca(Black_Measles)',
-     'Grape__Leaf_blight(Isariopsis_Leaf_Spot)',
-     'Grape___healthy',
-     'Orange__Haunglongbing(Citrus_greening)',
-     'Peach___Bacterial_spot',
-     'Peach___healthy',
-     'Pepper,bell__Bacterial_spot',
-     'Pepper,bell__healthy',
-     'Potato___Early_blight',
-     'Potato___Late_blight',
-     'Potato___healthy',
-     'Raspberry___healthy',
-     'Soybean___healthy',
-     'Squash___Powdery_mildew',
-     'Strawberry___Leaf_scorch',
-     'Strawberry___healthy',
-     'Tomato___Bacterial_spot',
-     'Tomato___Early_blight',
-     'Tomato___Late_blight',
-     'Tomato___Leaf_Mold',
-     'Tomato___Septoria_leaf_spot',
-     'Tomato___Spider_mites Two-spotted_spider_mite',
-     'Tomato___Target_Spot',
-     'Tomato___Tomato_Yellow_Leaf_Curl_Virus',
-     'Tomato___Tomato_mosaic_virus',
-     'Tomato___healthy']
-    
-    # Create disease mapping
-    disease_mapping = {}
-    if plant_disease_data:
-        for disease in plant_disease_data:
-            disease_mapping[disease['name']] = disease
-        print("Plant disease model and data loaded successfully!")
-    else:
-        print("⚠️  Plant disease data not available")
-        disease_mapping = {}
+        model = disease_backends.load_backend(
+            DISEASE_BACKEND, DISEASE_MODEL_PATH, DISEASE_NUM_THREADS,
+            **({"compiled": DISEASE_COMPILE, "xla": DISEASE_XLA, "batch_buckets": DISEASE_WARMUP_BATCH_SIZES}
+               if DISEASE_BACKEND == "keras" else {})
+        )
+    except ImportError as e:
+        raise ImportError(f"The {DISEASE_BACKEND} runtime is not installed ({e})")
+    print(f"✅ Loaded {DISEASE_BACKEND} model from: {model.path}")
+    return model
+
+
+model_registry.register("plant_disease_model", load_disease_model)
+# The disease model is preloaded (and warmed up) by default so the first upload is not slow
+MODEL_PRELOAD = parse_preload(os.getenv("MODEL_PRELOAD", "plant_disease_model"), model_registry.names)
+
+
+# --------- Prediction caches for the single-row tabular endpoints ----------
+# Keyed on the inputs with numbers rounded to PREDICTION_CACHE_ROUND digits;
+# PREDICTION_CACHE_SIZE=0 turns caching off. A cache is dropped (and its models
+# reloaded) when one of its model files changes on disk.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+PREDICTION_CACHE_ROUND = int(os.getenv("PREDICTION_CACHE_ROUND", "3"))
+
+
+def make_prediction_cache(spec: tabular_models.TabularModelSpec) -> PredictionCache:
+    def reload_models():
+        for name in spec.requires:
+            model_registry.reset(name)
+
+    return PredictionCache(
+        spec.name,
+        max_entries=PREDICTION_CACHE_SIZE,
+        ttl_seconds=PREDICTION_CACHE_TTL,
+        round_digits=PREDICTION_CACHE_ROUND,
+        fingerprint=lambda: model_registry.fingerprint(spec.requires),
+        on_invalidate=reload_models
+    )
+
+
+prediction_caches = {name: make_prediction_cache(spec) for name, spec in tabular_models.SPECS.items()}
+
+# Try to load from backend/ML/ML first, then fallback to project root
+json_paths = [
+    "ML/ML/plant_disease.json",
+    "../ML/ML/plant_disease.json"
+]
+
+for json_path in json_paths:
+    if os.path.exists(json_path):
+        with open(json_path, 'r') as file:
+            plant_disease_data = json.load(file)
+        print(f"✅ Loaded disease data from: {json_path}")
+        break
+
+# Create a mapping from model indices to disease data
+disease_labels = ['Apple___Apple_scab',
+ 'Apple___Black_rot',
+ 'Apple___Cedar_apple_rust',
+ 'Apple___healthy',
+ 'Background_without_leaves',
+ 'Blueberry___healthy',
+ 'Cherry___Powdery_mildew',
+ 'Cherry___healthy',
+ 'Corn___Cercospora_leaf_spot Gray_leaf_spot',
+ 'Corn___Common_rust',
+ 'Corn___Northern_Leaf_Blight',
+ 'Corn___healthy',
+ 'Grape___Black_rot',
+ 'Grape__Esca(Black_Measles)',
+ 'Grape__Leaf_blight(Isariopsis_Leaf_Spot)',
+ 'Grape___healthy',
+ 'Orange__Haunglongbing(Citrus_greening)',
+ 'Peach___Bacterial_spot',
+ 'Peach___healthy',
+ 'Pepper,bell__Bacterial_spot',
+ 'Pepper,bell__healthy',
+ 'Potato___Early_blight',
+ 'Potato___Late_blight',
+ 'Potato___healthy',
+ 'Raspberry___healthy',
+ 'Soybean___healthy',
+ 'Squash___Powdery_mildew',
+ 'Strawberry___Leaf_scorch',
+ 'Strawberry___healthy',
+ 'Tomato___Bacterial_spot',
+ 'Tomato___Early_blight',
+ 'Tomato___Late_blight',
+ 'Tomato___Leaf_Mold',
+ 'Tomato___Septoria_leaf_spot',
+ 'Tomato___Spider_mites Two-spotted_spider_mite',
+ 'Tomato___Target_Spot',
+ 'Tomato___Tomato_Yellow_Leaf_Curl_Virus',
+ 'Tomato___Tomato_mosaic_virus',
+ 'Tomato___healthy']
+
+# Create disease mapping
+disease_mapping = {}
+if plant_disease_data:
+    for disease in plant_disease_data:
+        disease_mapping[disease['name']] = disease
+    print("Plant disease data loaded successfully!")
 else:
-    # Create empty disease mapping when TensorFlow is not available
-    disease_mapping = {}
+    print("⚠️  Plant disease data not available")
 
 
-curr_farmer_id = 1
-farmers = {
-    1 : {
-          "lat": 17.924612,
-          "log" : 73.712006,
-          "fertilizers" : ["DAV"],
-          "start_date" : "12-01-2025",
-          "end_date" : "12-02-2025",
-          "buffer" : 100,
-          "soil_characteristics" : {'NDVI_mean': 0.46127950124962236, 'SM_surface': None,           'SM_rootzone': None, 'pH_top30cm': 5.6000000000000005, 'SOC_gkg_top30cm': 36.666666666666664, 'SOC_pct_top30cm': 3.6666666666666665, 'WC33_vpct_top30cm': 41.666666666666664},
-          "current_crop" : "wheat",
-          "state" : "karnataka",                    
-        }
+# Farmers live in a SQLite store shared by all workers (see farmer_store.py).
+# The demo farmer is only inserted into an empty store.
+FARMER_DB_PATH = os.getenv("FARMER_DB_PATH", "data/farmers.sqlite3")
+farmer_store = FarmerStore(FARMER_DB_PATH)
 
+curr_farmer_id = 1
+DEMO_FARMER = {
+    "lat": 17.924612,
+    "log": 73.712006,
+    "fertilizers": ["DAV"],
+    "start_date": "12-01-2025",
+    "end_date": "12-02-2025",
+    "buffer": 100,
+    "soil_characteristics": {'NDVI_mean': 0.46127950124962236, 'SM_surface': None, 'SM_rootzone': None, 'pH_top30cm': 5.6000000000000005, 'SOC_gkg_top30cm': 36.666666666666664, 'SOC_pct_top30cm': 3.6666666666666665, 'WC33_vpct_top30cm': 41.666666666666664},
+    "current_crop": "wheat",
+    "state": "karnataka",
 }
+if farmer_store.stats()["farmers"] == 0:
+    farmer_store.upsert(curr_farmer_id, DEMO_FARMER)
 
 fertilizers = {
     "DAV" : {
@@ -193,25 +282,25 @@ def predict_crop_yield(input: CropYieldInput) -> Dict[str, str]:
     """
     Predicts crop yield based on input parameters using encoder and ML model.
     """
+    row = input.model_dump()
 
-    # Encode categorical values (state, district, season, crop)
-    encoded_features = encoder.transform([[input.Jstate, input.Jdistrict, input.Jseason, input.Jcrops]])
-    
-    # Combine encoded categorical with numerical (area)
-    final_features = np.hstack([encoded_features, [[input.Jarea]]])
+    def predict():
+        # Encode categorical values (state, district, season, crop)
+        encoder = model_registry.get("encoder")
+        encoded_features = encoder.transform([[input.Jstate, input.Jdistrict, input.Jseason, input.Jcrops]])
 
-    # Predict production
-    prediction = yield_model.predict(final_features)[0]
+        # Combine encoded categorical with numerical (area)
+        final_features = np.hstack([encoded_features, [[input.Jarea]]])
 
-    return {
-        "Predicted Production": f"{prediction:.2f}",
-        "message": f"Predicted production for {input.Jcrops} in {input.Jdistrict}, {input.Jstate} ({input.Jseason}) on {input.Jarea} hectares is {prediction:.2f}."
-    }
+        # Predict production
+        yield_model = model_registry.get("yield_model")
+        with metrics.inference("yield_model"):
+            return yield_model.predict(final_features)[0]
 
+    prediction = prediction_caches["crop_yield"].get_or_compute(row, predict)
+    return tabular_models.format_crop_yield(row, prediction)
 
 
-# Load your trained crop recommendation model
-crop_recommendation_model = joblib.load("models/crop_recommendation_model.joblib")
 
 # --------- Input model for Crop Recommendation ----------
 @app.get(
@@ -231,28 +320,21 @@ def recommend_crop(
     """
     Predicts the best crop to cultivate based on input soil and environmental parameters.
     """
+    inputs = {"n": n_params, "p": p_params, "k": k_params, "t": t_params, "h": h_params, "ph": ph_params, "r": r_params}
 
-    # Prepare input for model as 2D array (1 sample)
-    model_input = np.array([[n_params, p_params, k_params, t_params, h_params, ph_params, r_params]])
-    
-    # Debug print to verify input
-    print("Model Input:", model_input)
-    
-    # Predict crop
-    predicted_crop = crop_recommendation_model.predict(model_input)[0]
-
-    return {
-        "Predicted Crop": predicted_crop,
-        "message": f"Based on the given parameters, the recommended crop is {predicted_crop}."
-    }
+    def predict():
+        # Prepare input for model as 2D array (1 sample)
+        model_input = np.array([[n_params, p_params, k_params, t_params, h_params, ph_params, r_params]])
 
+        # Predict crop
+        crop_model = model_registry.get("crop_recommendation_model")
+        with metrics.inference("crop_recommendation_model"):
+            return crop_model.predict(model_input)[0]
 
+    predicted_crop = prediction_caches["crop_recommendation"].get_or_compute(inputs, predict)
+    return tabular_models.format_crop_recommendation({}, predicted_crop)
 
 
-# Load models and encoders
-fertilizer_model = joblib.load("models/fertilizer_model.joblib")
-soil_encoder = joblib.load("models/soil_encoder.joblib")
-crop_encoder = joblib.load("models/encoder_yield.joblib")  # same encoder used in crop yield
 
 # --------- Endpoint for Fertilizer Recommendation ----------
 @app.get(
@@ -273,135 +355,664 @@ def recommend_fertilizer(
     """
     Predicts the best fertilizer to use based on input environmental and soil parameters.
     """
+    inputs = {"temp": temp, "humidity": humidity, "moisture": moisture, "soil_type": soil_type,
+              "crop_type": crop_type, "nitrogen": nitrogen, "potassium": potassium, "phosphorous": phosphorous}
 
-    # Encode categorical variables
-    soil_encoded = soil_encoder.transform([[soil_type]])
-    crop_encoded = crop_encoder.transform([[crop_type]])
+    def predict():
+        # Encode categorical variables
+        soil_encoded = model_registry.get("soil_encoder").transform([[soil_type]])
+        crop_encoded = model_registry.get("crop_encoder").transform([[crop_type]])
 
-    # Combine all inputs
-    model_input = np.hstack([
-        soil_encoded,
-        crop_encoded,
-        [[temp, humidity, moisture, nitrogen, potassium, phosphorous]]
-    ])
+        # Combine all inputs
+        model_input = np.hstack([
+            soil_encoded,
+            crop_encoded,
+            [[temp, humidity, moisture, nitrogen, potassium, phosphorous]]
+        ])
 
-    # Debug print to verify input
-    print("Fertilizer Model Input:", model_input)
+        # Predict fertilizer
+        fertilizer_model = model_registry.get("fertilizer_model")
+        with metrics.inference("fertilizer_model"):
+            return fertilizer_model.predict(model_input)[0]
 
-    # Predict fertilizer
-    predicted_fertilizer = fertilizer_model.predict(model_input)[0]
+    predicted_fertilizer = prediction_caches["fertilizer_recommendation"].get_or_compute(inputs, predict)
+    return tabular_models.format_fertilizer_recommendation({}, predicted_fertilizer)
 
-    return {
-        "Predicted Fertilizer": predicted_fertilizer,
-        "message": f"Based on the given parameters, the recommended fertilizer is {predicted_fertilizer}."
+
+# --------- Batch endpoints for the tabular models ----------
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "50000"))
+
+
+def tabular_model_objects(spec: tabular_models.TabularModelSpec) -> Dict[str, Any]:
+    """Models and encoders a spec's vectorized scorer needs, loaded on demand"""
+    return {name: model_registry.get(name) for name in spec.requires}
+
+
+def run_batch(spec: tabular_models.TabularModelSpec, rows: List[Dict[str, Any]], chunk_size: int) -> Dict[str, Any]:
+    if len(rows) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(rows)} rows (max {MAX_BATCH_ROWS})")
+    models = tabular_model_objects(spec)
+    with metrics.stage(f"{spec.name}_batch"):
+        results = tabular_models.score_rows(spec, models, rows, chunk_size=chunk_size)
+    return tabular_models.summarize(spec, results)
+
+
+def read_csv_rows(file: UploadFile) -> List[Dict[str, Any]]:
+    """Read an uploaded CSV (header row = field names) into a list of row dicts"""
+    try:
+        content = file.file.read().decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
+    return list(csv.DictReader(io.StringIO(content)))
+
+
+@app.post(
+    "/crop_yield/batch",
+    operation_id="predict_crop_yield_batch",
+    summary="Predict crop yield for many rows in one vectorized call",
+    tags=["batch"]
+)
+def predict_crop_yield_batch(
+    rows: List[Dict[str, Any]] = Body(..., description="Rows with Jstate, Jdistrict, Jseason, Jcrops and Jarea"),
+    chunk_size: int = tabular_models.DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Batch variant of /crop_yield. Invalid rows are reported individually
+    in "results" and do not fail the rest of the batch.
+    """
+    return run_batch(tabular_models.CROP_YIELD, rows, chunk_size)
+
+
+@app.post(
+    "/crop_yield/batch/csv",
+    operation_id="predict_crop_yield_batch_csv",
+    summary="Predict crop yield for every row of an uploaded CSV",
+    tags=["batch"]
+)
+def predict_crop_yield_batch_csv(
+    file: UploadFile = File(...),
+    chunk_size: int = tabular_models.DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    rows = read_csv_rows(file)
+    return run_batch(tabular_models.CROP_YIELD, rows, chunk_size)
+
+
+@app.post(
+    "/crop_recommendation/batch",
+    operation_id="recommend_crop_batch",
+    summary="Recommend crops for many rows in one vectorized call",
+    tags=["batch"]
+)
+def recommend_crop_batch(
+    rows: List[Dict[str, Any]] = Body(..., description="Rows with n_params, p_params, k_params, t_params, h_params, ph_params and r_params"),
+    chunk_size: int = tabular_models.DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Batch variant of /crop_recommendation with per-row error reporting.
+    """
+    return run_batch(tabular_models.CROP_RECOMMENDATION, rows, chunk_size)
+
+
+@app.post(
+    "/crop_recommendation/batch/csv",
+    operation_id="recommend_crop_batch_csv",
+    summary="Recommend crops for every row of an uploaded CSV",
+    tags=["batch"]
+)
+def recommend_crop_batch_csv(
+    file: UploadFile = File(...),
+    chunk_size: int = tabular_models.DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    rows = read_csv_rows(file)
+    return run_batch(tabular_models.CROP_RECOMMENDATION, rows, chunk_size)
+
+
+@app.post(
+    "/fertilizer_recommendation/batch",
+    operation_id="recommend_fertilizer_batch",
+    summary="Recommend fertilizers for many rows in one vectorized call",
+    tags=["batch"]
+)
+def recommend_fertilizer_batch(
+    rows: List[Dict[str, Any]] = Body(..., description="Rows with temp, humidity, moisture, soil_type, crop_type, nitrogen, potassium and phosphorous"),
+    chunk_size: int = tabular_models.DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Batch variant of /fertilizer_recommendation with per-row error reporting.
+    """
+    return run_batch(tabular_models.FERTILIZER_RECOMMENDATION, rows, chunk_size)
+
+
+@app.post(
+    "/fertilizer_recommendation/batch/csv",
+    operation_id="recommend_fertilizer_batch_csv",
+    summary="Recommend fertilizers for every row of an uploaded CSV",
+    tags=["batch"]
+)
+def recommend_fertilizer_batch_csv(
+    file: UploadFile = File(...),
+    chunk_size: int = tabular_models.DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    rows = read_csv_rows(file)
+    return run_batch(tabular_models.FERTILIZER_RECOMMENDATION, rows, chunk_size)
+
+
+# --------- Farmer store endpoints ----------
+# Tagged "farmers" and kept out of the MCP tools; the agent gets its farmer in the prompt.
+def parse_soil_ranges(ranges: Optional[List[str]]) -> Dict[str, Any]:
+    """"pH_top30cm:5.5:7" -> {"pH_top30cm": (5.5, 7.0)}; either bound may be empty"""
+    parsed = {}
+    for item in ranges or []:
+        try:
+            key, low, high = item.split(":")
+            parsed[key] = (float(low) if low else None, float(high) if high else None)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid range {item!r}, expected name:min:max")
+    return parsed
+
+
+@app.get("/farmers/nearby", tags=["farmers"], summary="Farms closest to a point")
+def nearby_farmers(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=1000),
+    max_km: Optional[float] = Query(None, gt=0)
+) -> Dict[str, Any]:
+    """
+    The k nearest farms, closest first, each with its distance_km
+    """
+    return {"farmers": farmer_store.nearest(lat, lon, k=k, max_km=max_km)}
+
+
+@app.get("/farmers/search", tags=["farmers"], summary="Farms by crop, state, fertilizer, area and soil values")
+def search_farmers(
+    crop: Optional[str] = None,
+    state: Optional[str] = None,
+    fertilizer: Optional[str] = None,
+    min_lat: Optional[float] = None,
+    min_lon: Optional[float] = None,
+    max_lat: Optional[float] = None,
+    max_lon: Optional[float] = None,
+    soil_range: Optional[List[str]] = Query(None, description="Repeatable name:min:max, e.g. pH_top30cm:5.5:7"),
+    limit: int = Query(100, ge=1, le=10000),
+    offset: int = Query(0, ge=0)
+) -> Dict[str, Any]:
+    """
+    Farms matching every given filter, by ID, with the total number of matches
+    """
+    corners = [min_lat, min_lon, max_lat, max_lon]
+    if any(value is not None for value in corners) and None in corners:
+        raise HTTPException(status_code=400, detail="A bounding box needs min_lat, min_lon, max_lat and max_lon")
+    filters = {
+        "crop": crop, "state": state, "fertilizer": fertilizer,
+        "bbox": tuple(corners) if min_lat is not None else None,
+        "ranges": parse_soil_ranges(soil_range),
     }
+    try:
+        return {"total": farmer_store.count(**filters),
+                "farmers": farmer_store.search(limit=limit, offset=offset, **filters)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/farmers/stats", tags=["farmers"])
+def farmer_store_stats() -> Dict[str, Any]:
+    return farmer_store.stats()
+
+
+@app.get("/farmers/{farmer_id}", tags=["farmers"], summary="One farmer by ID")
+def get_farmer(farmer_id: int) -> Dict[str, Any]:
+    farmer = farmer_store.get(farmer_id)
+    if farmer is None:
+        raise HTTPException(status_code=404, detail=f"Farmer not found: {farmer_id}")
+    return farmer
+
+
+@app.post("/farmers/bulk", tags=["farmers", "batch"], summary="Insert or update many farmers")
+def upsert_farmers(
+    farmers: List[Dict[str, Any]] = Body(..., description="Farmers with id, lat, lon (or log) and the other farmer fields")
+) -> Dict[str, Any]:
+    """
+    Farmers whose id exists are replaced. One transaction: if a farmer is
+    invalid, nothing is written.
+    """
+    if len(farmers) > MAX_BATCH_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(farmers)} farmers (max {MAX_BATCH_ROWS})")
+    try:
+        written = farmer_store.upsert_many((farmer["id"], farmer) for farmer in farmers)
+    except KeyError:
+        raise HTTPException(status_code=400, detail="Every farmer needs an id")
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"written": written}
 
 
 # --------- Plant Disease Detection Endpoint ----------
+# Reduced-scale JPEG decode + float32 output; set FAST_IMAGE_DECODE=0 for the original path
+FAST_IMAGE_DECODE = os.getenv("FAST_IMAGE_DECODE", "1") != "0"
+
+
 def preprocess_image(image_bytes):
     """Preprocess image for the model"""
     try:
-        # Load and resize image
-        image = Image.open(io.BytesIO(image_bytes))
-        image = image.convert('RGB')
-        image = image.resize((160, 160))
-        
-        # Convert to array and normalize
-        image_array = np.array(image) / 255.0
-        image_array = np.expand_dims(image_array, axis=0)
-        
-        return image_array
+        if FAST_IMAGE_DECODE:
+            return preprocess_image_fast(image_bytes)
+        return preprocess_image_legacy(image_bytes)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error preprocessing image: {str(e)}")
 
+# Concurrent uploads are grouped into one batched predict call
+DISEASE_BATCH_WINDOW_MS = float(os.getenv("DISEASE_BATCH_WINDOW_MS", "5"))
+
+
+# Image decode and TensorFlow inference run on dedicated, size-limited pools so
+# the event loop stays free for the light endpoints. When they are saturated
+# the endpoint answers 503 right away instead of queueing without bound.
+DISEASE_DECODE_WORKERS = int(os.getenv("DISEASE_DECODE_WORKERS", "2"))
+DISEASE_QUEUE_SIZE = int(os.getenv("DISEASE_QUEUE_SIZE", "32"))
+
+disease_decode_pool = BoundedExecutor("disease-decode", max_workers=DISEASE_DECODE_WORKERS, max_queue=DISEASE_QUEUE_SIZE)
+# The batcher keeps at most one predict call in flight
+disease_inference_pool = BoundedExecutor("disease-inference", max_workers=1, max_queue=1)
+
+
+def predict_disease_batch(images: np.ndarray) -> np.ndarray:
+    model = model_registry.get("plant_disease_model")
+    with metrics.inference("plant_disease_model"):
+        return model.predict(images)
+
+
+disease_batcher = MicroBatcher(
+    predict_disease_batch,
+    max_batch_size=DISEASE_MAX_BATCH_SIZE,
+    window_ms=DISEASE_BATCH_WINDOW_MS,
+    run_in_executor=disease_inference_pool.run,
+    max_queue=DISEASE_QUEUE_SIZE
+)
+
+
+# --------- Result cache for re-uploaded images ----------
+# Keyed by the sha256 of the upload plus the model file, backend and decode
+# path, so a cache hit skips both decoding and inference.
+DISEASE_CACHE_DIR = os.getenv("DISEASE_CACHE_DIR", "cache/disease_predictions")
+DISEASE_CACHE_MAX_BYTES = int(os.getenv("DISEASE_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+
+
+def disease_model_fingerprint() -> str:
+    path = DISEASE_MODEL_PATH or disease_backends.find_model_file(DISEASE_BACKEND)
+    try:
+        stat = os.stat(path)
+        file_id = f"{os.path.realpath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+    except (OSError, TypeError):
+        file_id = "missing"
+    return f"{DISEASE_BACKEND}:{file_id}:fast={FAST_IMAGE_DECODE}"
+
+
+disease_cache = DiseaseResultCache(DISEASE_CACHE_DIR, DISEASE_CACHE_MAX_BYTES, fingerprint=disease_model_fingerprint)
+
+# Queue depths and cache counters, read when /metrics is scraped
+metrics.track_pool("disease-decode", disease_decode_pool)
+metrics.track_pool("disease-inference", disease_inference_pool)
+metrics.track_pool("disease-batcher", disease_batcher)
+metrics.track_cache("disease", disease_cache.stats)
+for name, cache in prediction_caches.items():
+    metrics.track_cache(name, cache.stats)
+
+
+def lookup_or_preprocess(image_bytes: bytes):
+    """On the decode pool: (cache key, cached probabilities, None) on a hit, (key, None, model input) on a miss"""
+    with metrics.stage("disease_cache_lookup"):
+        key, cached = disease_cache.get(image_bytes)
+    if cached is not None:
+        return key, np.asarray(cached, dtype=np.float32), None
+    with metrics.stage("image_decode"):
+        return key, None, preprocess_image(image_bytes)
+
+
+async def classify_image_bytes(load_bytes) -> np.ndarray:
+    """Class probabilities for one image, from the cache or through decode + the batcher"""
+    key, cached, processed_image = await disease_decode_pool.run(lambda: lookup_or_preprocess(load_bytes()))
+    if cached is not None:
+        return cached
+    prediction = await disease_batcher.submit(processed_image)
+    if disease_cache.enabled:
+        await asyncio.to_thread(disease_cache.put, key, prediction)
+    return prediction
+
+
+# --------- Preload, warmup and readiness ----------
+# The first predict on a fresh model traces/builds the graph and can take
+# seconds, so when the disease model is preloaded every served batch size is
+# run once at startup. /ready stays 503 until that is done so the load
+# balancer only routes to warm workers. A node without the disease model file
+# or its runtime is "unavailable" and still ready (the other endpoints serve);
+# a model that is present but fails to load or warm up stays 503 unless
+# READY_ON_WARMUP_FAILURE=1.
+READY_ON_WARMUP_FAILURE = os.getenv("READY_ON_WARMUP_FAILURE", "0") == "1"
+disease_warmup = {"state": "pending", "timings_ms": {}, "seconds": None, "error": None}
+
+
+def warm_up_disease_model():
+    started = time.perf_counter()
+    try:
+        model = model_registry.get("plant_disease_model")
+        with timed("warmup", "plant_disease_model"):
+            disease_warmup["timings_ms"] = model.warmup(DISEASE_WARMUP_BATCH_SIZES)
+        disease_warmup["state"] = "done"
+        print(f"✅ Disease model warmed up for batch sizes {DISEASE_WARMUP_BATCH_SIZES}")
+    except (FileNotFoundError, ImportError) as e:
+        # load_backend's errors for a missing model file / runtime
+        disease_warmup["state"] = "unavailable"
+        disease_warmup["error"] = str(e)
+        print(f"⚠️  Disease model unavailable, serving without it: {e}")
+    except Exception as e:
+        disease_warmup["state"] = "failed"
+        disease_warmup["error"] = str(e)
+        print(f"⚠️  Disease model warmup failed: {e}")
+    disease_warmup["seconds"] = round(time.perf_counter() - started, 2)
+    startup_profile.mark("ready")
+
+
+@app.on_event("startup")
+def preload_models():
+    model_registry.preload(name for name in MODEL_PRELOAD if name != "plant_disease_model")
+    startup_profile.mark("app_started")
+    if AGENT_WARMUP:
+        threading.Thread(target=load_agent_stack, name="agent-warmup", daemon=True).start()
+    if "plant_disease_model" not in MODEL_PRELOAD:
+        disease_warmup["state"] = "skipped"
+        startup_profile.mark("ready")
+        return
+    # Loading and warmup run on the inference pool so they never overlap a real predict call
+    disease_warmup["state"] = "running"
+    disease_inference_pool.submit(warm_up_disease_model)
+
+
+@app.get("/health", tags=["ops"])
+def health() -> Dict[str, Any]:
+    """Liveness: the process is up"""
+    return {"status": "ok"}
+
+
+@app.get("/ready", tags=["ops"])
+def ready():
+    """Readiness: 200 once the preloaded disease model is warmed up (or it is not preloaded or not installed)"""
+    ready_states = ("done", "skipped", "unavailable") + (("failed",) if READY_ON_WARMUP_FAILURE else ())
+    is_ready = disease_warmup["state"] in ready_states
+    body = {"ready": is_ready, "disease_model_warmup": disease_warmup}
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+
+def disease_busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Plant disease detection is busy. Please retry shortly.",
+        headers={"Retry-After": "1"}
+    )
+
+
+@app.get("/prediction_cache/stats", tags=["ops"])
+def prediction_cache_stats() -> Dict[str, Any]:
+    """
+    Hit/miss counters, size and settings of the tabular prediction caches
+    """
+    return {name: cache.stats() for name, cache in prediction_caches.items()}
+
+
+@app.get("/startup", tags=["ops"])
+def startup_report() -> Dict[str, Any]:
+    """
+    Time spent per import, model load and warmup since the process started
+    """
+    return startup_profile.report()
+
+
+@app.get("/models", tags=["ops"])
+def model_status() -> Dict[str, Any]:
+    """
+    Which models are loaded, and the load time and memory each one cost
+    """
+    return model_registry.status()
+
+
+@app.get("/plant_disease_detection/stats")
+def plant_disease_batching_stats() -> Dict[str, Any]:
+    """
+    Micro-batching settings, achieved batch sizes, worker pool usage and result cache counters
+    """
+    return {
+        "model": model_registry.get("plant_disease_model").describe() if model_registry.is_loaded("plant_disease_model") else None,
+        "warmup": disease_warmup,
+        "cache": disease_cache.stats(),
+        "batching": disease_batcher.stats(),
+        "decode_pool": disease_decode_pool.stats(),
+        "inference_pool": disease_inference_pool.stats(),
+    }
+
+
+async def check_disease_model_available():
+    """Load the disease model on first use (off the event loop), or answer 503 if it cannot be loaded"""
+    if model_registry.is_loaded("plant_disease_model"):
+        return
+    try:
+        await disease_inference_pool.run(model_registry.get, "plant_disease_model")
+    except QueueFullError:
+        raise disease_busy_error()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Plant disease model not loaded ({DISEASE_BACKEND} backend): {e}. Please ensure the model files and runtime are available.")
+
+
+def build_disease_response(prediction: np.ndarray) -> Dict[str, Any]:
+    """Turn one row of model output into the disease detection response"""
+    predicted_class_index = int(np.argmax(prediction))
+    confidence = float(prediction[predicted_class_index])
+    
+    # Get disease name
+    disease_name = disease_labels[predicted_class_index]
+    
+    # Get disease information
+    disease_info = disease_mapping.get(disease_name, {
+        "name": disease_name,
+        "cause": "Unknown disease",
+        "cure": "Please consult with an agricultural expert"
+    })
+    
+    # Determine if healthy or diseased
+    is_healthy = "healthy" in disease_name.lower()
+    
+    # Generate fertilizer recommendation based on disease
+    if is_healthy:
+        fertilizer_recommendation = {
+            "name": "Balanced NPK Fertilizer",
+            "procedure": "Apply balanced NPK fertilizer (20-20-20) at 2g per liter of water, applied every 2 weeks to maintain plant health."
+        }
+    else:
+        # Disease-specific fertilizer recommendations
+        if "bacterial" in disease_name.lower():
+            fertilizer_recommendation = {
+                "name": "Copper-based Bactericide + Balanced NPK",
+                "procedure": "Apply copper-based bactericide every 7-10 days. Use balanced NPK fertilizer (20-20-20) at 1.5g per liter of water, applied weekly."
+            }
+        elif "fungal" in disease_info.get("cause", "").lower() or "fungus" in disease_info.get("cause", "").lower():
+            fertilizer_recommendation = {
+                "name": "Fungicide + Potassium-rich Fertilizer",
+                "procedure": "Apply appropriate fungicide every 7-10 days. Use potassium-rich fertilizer (15-15-30) at 2g per liter of water, applied weekly."
+            }
+        elif "virus" in disease_name.lower():
+            fertilizer_recommendation = {
+                "name": "Systemic Insecticide + Balanced NPK",
+                "procedure": "Control vector insects with systemic insecticide. Apply balanced NPK fertilizer (20-20-20) at 1.5g per liter of water, applied every 10 days."
+            }
+        else:
+            fertilizer_recommendation = {
+                "name": "General Disease Control + Balanced NPK",
+                "procedure": "Apply appropriate disease control treatment. Use balanced NPK fertilizer (20-20-20) at 2g per liter of water, applied weekly until symptoms improve."
+            }
+    
+    return {
+        "disease_name": disease_name,
+        "confidence": confidence,
+        "is_healthy": is_healthy,
+        "disease_info": {
+            "cause": disease_info.get("cause", "Unknown cause"),
+            "cure": disease_info.get("cure", "Please consult with an agricultural expert")
+        },
+        "fertilizer_recommendation": fertilizer_recommendation,
+        "message": f"Plant disease detection completed with {confidence:.2%} confidence."
+    }
+
+
 @app.post("/plant_disease_detection")
 async def detect_plant_disease(file: UploadFile = File(...)):
     """
     Detect plant disease from uploaded image using trained ML model
     """
-    if not TENSORFLOW_AVAILABLE:
-        raise HTTPException(status_code=503, detail="TensorFlow not available. Please install TensorFlow to use plant disease detection.")
-    
-    if plant_disease_model is None:
-        raise HTTPException(status_code=503, detail="Plant disease model not loaded. Please ensure the model files are available.")
+    await check_disease_model_available()
     
     try:
         # Read image file
-        image_bytes = await file.read()
-        
-        # Preprocess image
-        processed_image = preprocess_image(image_bytes)
+        image_bytes = await read_upload_capped(file, DISEASE_MAX_IMAGE_BYTES)
         
-        # Make prediction
-        prediction = plant_disease_model.predict(processed_image)
-        predicted_class_index = np.argmax(prediction[0])
-        confidence = float(prediction[0][predicted_class_index])
+        # Cached result, or preprocess and predict (batched with other concurrent uploads)
+        try:
+            prediction = await classify_image_bytes(lambda: image_bytes)
+        except QueueFullError:
+            raise disease_busy_error()
         
-        # Get disease name
-        disease_name = disease_labels[predicted_class_index]
-        
-        # Get disease information
-        disease_info = disease_mapping.get(disease_name, {
-            "name": disease_name,
-            "cause": "Unknown disease",
-            "cure": "Please consult with an agricultural expert"
-        })
-        
-        # Determine if healthy or diseased
-        is_healthy = "healthy" in disease_name.lower()
-        
-        # Generate fertilizer recommendation based on disease
-        if is_healthy:
-            fertilizer_recommendation = {
-                "name": "Balanced NPK Fertilizer",
-                "procedure": "Apply balanced NPK fertilizer (20-20-20) at 2g per liter of water, applied every 2 weeks to maintain plant health."
-            }
-        else:
-            # Disease-specific fertilizer recommendations
-            if "bacterial" in disease_name.lower():
-                fertilizer_recommendation = {
-                    "name": "Copper-based Bactericide + Balanced NPK",
-                    "procedure": "Apply copper-based bactericide every 7-10 days. Use balanced NPK fertilizer (20-20-20) at 1.5g per liter of water, applied weekly."
-                }
-            elif "fungal" in disease_info.get("cause", "").lower() or "fungus" in disease_info.get("cause", "").lower():
-                fertilizer_recommendation = {
-                    "name": "Fungicide + Potassium-rich Fertilizer",
-                    "procedure": "Apply appropriate fungicide every 7-10 days. Use potassium-rich fertilizer (15-15-30) at 2g per liter of water, applied weekly."
-                }
-            elif "virus" in disease_name.lower():
-                fertilizer_recommendation = {
-                    "name": "Systemic Insecticide + Balanced NPK",
-                    "procedure": "Control vector insects with systemic insecticide. Apply balanced NPK fertilizer (20-20-20) at 1.5g per liter of water, applied every 10 days."
-                }
-            else:
-                fertilizer_recommendation = {
-                    "name": "General Disease Control + Balanced NPK",
-                    "procedure": "Apply appropriate disease control treatment. Use balanced NPK fertilizer (20-20-20) at 2g per liter of water, applied weekly until symptoms improve."
-                }
-        
-        return {
-            "disease_name": disease_name,
-            "confidence": confidence,
-            "is_healthy": is_healthy,
-            "disease_info": {
-                "cause": disease_info.get("cause", "Unknown cause"),
-                "cure": disease_info.get("cure", "Please consult with an agricultural expert")
-            },
-            "fertilizer_recommendation": fertilizer_recommendation,
-            "message": f"Plant disease detection completed with {confidence:.2%} confidence."
-        }
+        return build_disease_response(prediction)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 
+# --------- Multi-image / ZIP upload mode ----------
+DISEASE_BULK_MAX_IMAGES = int(os.getenv("DISEASE_BULK_MAX_IMAGES", "200"))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+
+def list_zip_images(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    images = []
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or name.startswith(".") or "__MACOSX" in info.filename:
+            continue
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            images.append(info)
+    return images
 
-mcp = FastApiMCP(
-    app,
-    name="Agri Controller",
-    description="MCP for BMI, Soil health, Crop Yield, Crop Recommendation, and Fertilizer Recommendation tools"
-)
-mcp.mount_http()
+
+def close_archive(archive: zipfile.ZipFile, spool) -> None:
+    archive.close()
+    spool.close()
+
+
+def read_zip_image(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    # Check the declared size first so a zip bomb never gets inflated
+    if info.file_size > DISEASE_MAX_IMAGE_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {DISEASE_MAX_IMAGE_BYTES} bytes")
+    return archive.read(info)
+
+
+async def classify_upload(index: int, filename: str, load_bytes, slots: asyncio.Semaphore) -> Dict[str, Any]:
+    """Cache lookup and decode on the worker pool, predict through the batcher, never raise"""
+    async with slots:
+        try:
+            prediction = await classify_image_bytes(load_bytes)
+            result = build_disease_response(prediction)
+        except QueueFullError:
+            result = {"error": "Plant disease detection is busy. Please retry this image.", "status_code": 503}
+        except HTTPException as e:
+            result = {"error": e.detail, "status_code": e.status_code}
+        except Exception as e:
+            result = {"error": f"Error processing image: {str(e)}", "status_code": 500}
+    return {"index": index, "filename": filename, **result}
+
+
+async def stream_disease_results(jobs, cleanup=None):
+    """Yield one NDJSON line per image as soon as it is classified, then a summary line"""
+    # Keep about one full batch in flight so the batcher can fill it
+    slots = asyncio.Semaphore(max(1, DISEASE_MAX_BATCH_SIZE))
+    tasks = [asyncio.create_task(classify_upload(index, filename, load_bytes, slots))
+             for index, (filename, load_bytes) in enumerate(jobs)]
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            failed += "error" in result
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"done": True, "count": len(tasks), "failed": failed}) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+        if cleanup is not None:
+            cleanup()
+
+
+@app.post("/plant_disease_detection/bulk")
+async def detect_plant_disease_bulk(
+    files: Optional[List[UploadFile]] = File(None, description="Several leaf images"),
+    archive: Optional[UploadFile] = File(None, description="A ZIP archive of leaf images")
+):
+    """
+    Detect plant disease for many images in one request.
+
+    Send either several "files" or one ZIP "archive". Images are decoded in
+    parallel and classified in batches; results are streamed back as NDJSON
+    (one JSON object per line, in completion order, each with its "index"
+    and "filename"), followed by a final {"done": true, ...} line.
+    """
+    await check_disease_model_available()
+
+    if archive is None and not files:
+        raise HTTPException(status_code=400, detail="Upload one or more 'files' or a ZIP 'archive'")
+
+    jobs = []
+    cleanup = None
+
+    if archive is not None:
+        # The upload is closed once this handler returns, so keep our own copy
+        # of the archive on disk for the streaming response to read from.
+        spool = tempfile.TemporaryFile()
+        await asyncio.to_thread(shutil.copyfileobj, archive.file, spool)
+        try:
+            zip_archive = zipfile.ZipFile(spool)
+        except zipfile.BadZipFile:
+            spool.close()
+            raise HTTPException(status_code=400, detail="Archive is not a valid ZIP file")
+        cleanup = functools.partial(close_archive, zip_archive, spool)
+
+    # Until the streaming response owns the archive, any error here has to close it
+    try:
+        if archive is not None:
+            for info in list_zip_images(zip_archive):
+                jobs.append((info.filename, lambda info=info: read_zip_image(zip_archive, info)))
+
+        for upload in files or []:
+            image_bytes = await read_upload_capped(upload, DISEASE_MAX_IMAGE_BYTES)
+            jobs.append((upload.filename, lambda image_bytes=image_bytes: image_bytes))
+
+        if len(jobs) > DISEASE_BULK_MAX_IMAGES:
+            raise HTTPException(status_code=413, detail=f"Too many images: {len(jobs)} (max {DISEASE_BULK_MAX_IMAGES})")
+    except BaseException:
+        if cleanup is not None:
+            cleanup()
+        raise
+
+    return StreamingResponse(stream_disease_results(jobs, cleanup), media_type="application/x-ndjson")
+
+
+
+with timed("startup", "mcp mount"):
+    mcp = FastApiMCP(
+        app,
+        name="Agri Controller",
+        description="MCP for BMI, Soil health, Crop Yield, Crop Recommendation, and Fertilizer Recommendation tools",
+        # Bulk scoring, ops and farmer store endpoints are for pipelines, not for the agent
+        exclude_tags=["batch", "ops", "farmers"]
+    )
+    mcp.mount_http()
 
 
 
@@ -410,9 +1021,6 @@ mcp.mount_http()
 
 # crew_mcp_agent.py
 import sys
-from crewai import Agent, Task, Crew, Process, LLM
-from crewai_tools import MCPServerAdapter
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -421,49 +1029,112 @@ import os
 os.environ["OPENAI_API_KEY"] = "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"
 
 server_params = {"url": "http://127.0.0.1:8000/mcp", "transport": "streamable-http"}
-llm = LLM(model="openrouter/openai/gpt-oss-20b:free")
+MCP_CONNECT_TIMEOUT = int(os.getenv("MCP_CONNECT_TIMEOUT", "60"))
+
+# crewai / langchain take seconds to import, so they are loaded on the first
+# /query, or in a background thread at startup when AGENT_WARMUP=1
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "0") == "1"
+agent_stack = {}
+agent_stack_lock = threading.Lock()
+
+
+def load_agent_stack() -> Dict[str, Any]:
+    """Import crewai and create the LLM once; safe to call from several threads"""
+    with agent_stack_lock:
+        if agent_stack:
+            return agent_stack
+        try:
+            with timed("import", "crewai"):
+                from crewai import Agent, Task, Crew, Process, LLM
+            with timed("import", "crewai_tools"):
+                from crewai_tools import MCPServerAdapter
+            with timed("startup", "agent llm"):
+                llm = LLM(model="openrouter/openai/gpt-oss-20b:free")
+        except Exception as e:
+            print(f"⚠️  Could not load the agent stack: {e}")
+            raise
+        agent_stack.update(Agent=Agent, Task=Task, Crew=Crew, Process=Process,
+                           MCPServerAdapter=MCPServerAdapter, llm=llm)
+        print("✅ Agent stack loaded")
+        return agent_stack
+
+
+def mcp_tool_fingerprint() -> str:
+    """Changes whenever the tools this app exposes over MCP change"""
+    definitions = sorted((tool.name, tool.description or "", json.dumps(tool.inputSchema, sort_keys=True))
+                         for tool in getattr(mcp, "tools", None) or [])
+    return hashlib.sha256(json.dumps(definitions).encode()).hexdigest()
+
+
+# One MCP session per worker, opened on the first /query and reused after that
+mcp_session = MCPSession(
+    lambda: load_agent_stack()["MCPServerAdapter"](server_params, connect_timeout=MCP_CONNECT_TIMEOUT),
+    fingerprint=mcp_tool_fingerprint
+)
+
+
+@app.get("/mcp_session/stats", tags=["ops"])
+def mcp_session_stats() -> Dict[str, Any]:
+    """
+    Connection state, reuse and reconnect counters of the /query MCP session
+    """
+    return mcp_session.stats()
+
+
+@app.on_event("shutdown")
+def close_mcp_session():
+    mcp_session.close()
+
 
 @app.get("/query")
-def main(user_query: str):
-    with MCPServerAdapter(server_params, connect_timeout=60) as mcp_tools:
-        selected_tools = list(mcp_tools)
-        ## for  debugging
-        print("\n--- AVAILABLE TOOLS ---")
-        for tool in selected_tools:
-            print(f"Tool: {tool.name} | Description: {tool.description}")
-        print("-----------------------\n")
-        ###
-        agent = Agent(
-            role="MCP Tooling Agent",
-           ## goal="do not make unneccessary api calls to llm and answer the queries based on tools you have",
-            goal="Use available MCP tools to answer queries",
-            backstory=f"The current farmer stats are {farmers.get(curr_farmer_id)}",
-            tools=selected_tools,
-            llm=llm,
-            verbose=True,
-        )
+def main(user_query: str, farmer_id: int = curr_farmer_id):
+    farmer = get_farmer(farmer_id)  # 404 for an unknown farmer, before any MCP or LLM work
+    stack = load_agent_stack()
+    Agent, Task, Crew, Process = stack["Agent"], stack["Task"], stack["Crew"], stack["Process"]
+    llm = stack["llm"]
+    try:
+        with mcp_session.lease() as connection:
+            agent = Agent(
+                role="MCP Tooling Agent",
+               ## goal="do not make unneccessary api calls to llm and answer the queries based on tools you have",
+                goal="Use available MCP tools to answer queries",
+                backstory=f"The current farmer stats are {farmer}",
+                tools=connection.tools,
+                llm=llm,
+                verbose=True,
+            )
 
-        task = Task(
-            description=user_query,  # 👈 feed user input here
-            # expected_output="Answer the query using MCP tools if needed. do not give formatted md, give me plain string",
-            expected_output="Plain string answer using MCP tools if needed",
-            agent=agent,
-            markdown=True,
-        )
+            task = Task(
+                description=user_query,  # 👈 feed user input here
+                # expected_output="Answer the query using MCP tools if needed. do not give formatted md, give me plain string",
+                expected_output="Plain string answer using MCP tools if needed",
+                agent=agent,
+                markdown=True,
+            )
 
-        crew = Crew(
-            agents=[agent],
-            tasks=[task],
-            process=Process.sequential,
-            verbose=True,
-        )
-        result = crew.kickoff()
-        print("\n--- RESULT ---\n", result)
+            crew = Crew(
+                agents=[agent],
+                tasks=[task],
+                process=Process.sequential,
+                verbose=True,
+            )
+            with metrics.external("llm_agent", "crew_kickoff"):
+                result = crew.kickoff()
+            print("\n--- RESULT ---\n", result)
+            # crewai reports failed tool calls to the LLM instead of raising; a
+            # fresh session next time rules out a dropped connection
+            if getattr(task, "tools_errors", 0):
+                mcp_session.invalidate(connection)
+    except MCPConnectError as e:
+        raise HTTPException(status_code=503, detail=f"MCP server unavailable: {e}", headers={"Retry-After": "5"})
 
-        # Ensure plain string only
-        return str(result.raw) if hasattr(result, "raw") else str(result)
+    # Ensure plain string only
+    return str(result.raw) if hasattr(result, "raw") else str(result)
 
 if __name__ == "__main__":
     # read user query from command line
     query = " ".join(sys.argv[1:]) or "List available MCP tools and return results."
-    main(query)
+    try:
+        main(query)
+    finally:
+        mcp_session.close()
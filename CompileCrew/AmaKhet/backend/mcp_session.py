@@ -0,0 +1,140 @@
+"""
+Long-lived MCP client session with a cached tool list
+
+Opening an MCPServerAdapter per /query repeated the MCP handshake and the
+tools/list call before the agent could start. MCPSession keeps one adapter
+per worker and leases it, with its tools, to every query. Concurrent queries
+share it (the MCP session multiplexes requests).
+
+The session is replaced when:
+  - the tool set changes: `fingerprint()` (the app's own MCP tool
+    definitions) differs from the one it was opened with
+  - a query reports a failure through `invalidate()`, e.g. a tool error or
+    a dropped connection; the next query reconnects
+
+A replaced session is closed once the queries still using it are done.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+
+class MCPConnectError(Exception):
+    """The MCP server could not be reached; nothing was cached"""
+
+
+class MCPConnection:
+    def __init__(self, adapter: Any, tools: List[Any], fingerprint: Optional[str]):
+        self.adapter = adapter
+        self.tools = tools
+        self.fingerprint = fingerprint
+        self.opened = time.time()
+        self.users = 0
+        self.retired = False
+
+
+class MCPSession:
+    def __init__(self, connect: Callable[[], Any], fingerprint: Optional[Callable[[], str]] = None):
+        """
+        connect: opens an adapter usable as a context manager whose __enter__ returns the tools
+                 (MCPServerAdapter(server_params, connect_timeout=...))
+        fingerprint: identifies the current tool set; a change triggers a reconnect
+        """
+        self._connect = connect
+        self._fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._current: Optional[MCPConnection] = None
+        self._counts = {"connects": 0, "connect_failures": 0, "reuses": 0, "tool_set_changes": 0, "invalidations": 0}
+
+    def _open_locked(self, fingerprint: Optional[str]) -> MCPConnection:
+        started = time.perf_counter()
+        try:
+            adapter = self._connect()
+            tools = list(adapter.__enter__())
+        except Exception as e:
+            self._counts["connect_failures"] += 1
+            raise MCPConnectError(str(e)) from e
+        self._counts["connects"] += 1
+        print(f"✅ MCP session opened with {len(tools)} tools in {(time.perf_counter() - started) * 1000:.0f} ms")
+        for tool in tools:
+            print(f"   Tool: {tool.name} | Description: {tool.description}")
+        return MCPConnection(adapter, tools, fingerprint)
+
+    def _retire_locked(self, connection: MCPConnection):
+        """Take a connection out of use; it is closed when its last user is done"""
+        connection.retired = True
+        if self._current is connection:
+            self._current = None
+        if connection.users == 0:
+            self._close(connection)
+
+    @staticmethod
+    def _close(connection: MCPConnection):
+        try:
+            connection.adapter.__exit__(None, None, None)
+        except Exception as e:
+            print(f"⚠️  Error closing MCP session: {e}")
+
+    def _acquire(self) -> MCPConnection:
+        fingerprint = self._fingerprint() if self._fingerprint else None
+        with self._lock:
+            current = self._current
+            if current is not None and current.fingerprint != fingerprint:
+                print("🔄 MCP tool set changed, reconnecting")
+                self._counts["tool_set_changes"] += 1
+                self._retire_locked(current)
+                current = None
+            if current is None:
+                # Connecting under the lock: concurrent first queries wait for one handshake
+                current = self._current = self._open_locked(fingerprint)
+            else:
+                self._counts["reuses"] += 1
+            current.users += 1
+            return current
+
+    def _release(self, connection: MCPConnection):
+        with self._lock:
+            connection.users -= 1
+            if connection.retired and connection.users == 0:
+                self._close(connection)
+
+    @contextmanager
+    def lease(self):
+        """
+        The connection (and its cached .tools) for one query. An exception
+        inside the block drops the session so the next query reconnects.
+        """
+        connection = self._acquire()
+        try:
+            yield connection
+        except Exception:
+            self.invalidate(connection)
+            raise
+        finally:
+            self._release(connection)
+
+    def invalidate(self, connection: Optional[MCPConnection] = None):
+        """Drop the current session (or the given one, if it is still current)"""
+        with self._lock:
+            current = self._current
+            if current is None or (connection is not None and connection is not current):
+                return
+            self._counts["invalidations"] += 1
+            self._retire_locked(current)
+
+    def close(self):
+        with self._lock:
+            if self._current is not None:
+                self._retire_locked(self._current)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            current = self._current
+            return {
+                "connected": current is not None,
+                "tools": len(current.tools) if current else 0,
+                "session_age_seconds": round(time.time() - current.opened, 1) if current else None,
+                "active_queries": current.users if current else 0,
+                **self._counts,
+            }
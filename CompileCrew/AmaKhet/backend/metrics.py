@@ -0,0 +1,247 @@
+"""
+Prometheus metrics for the backend apps, without a client library
+
+`instrument(app, "main")` adds a middleware that times every request by route
+template (not raw path, so /api/soil-analysis/{lat}/{lon} is one series) and
+serves everything at GET /metrics in the Prometheus text format. The code on
+the hot path records into a few shared histograms:
+
+    with metrics.stage("image_decode"): ...              amakhet_stage_duration_seconds{stage}
+    with metrics.inference("yield_model"): ...           amakhet_model_inference_seconds{model}
+    with metrics.external("earth_engine", "reduce"): ... amakhet_external_call_seconds{service,call,outcome}
+
+Queue depths and cache counters already exist in the pools' and caches'
+stats(); track_pool / track_cache read them only when /metrics is scraped.
+Recording is a bisect and a locked add (a few microseconds). Numbers are per
+process: with several uvicorn workers, scrape each worker.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (metric name, type, help, [(labels, value)]) produced at scrape time
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+_histograms: List["Histogram"] = []
+_collectors: List[Callable[[], Iterable[Family]]] = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> per-bucket counts (last one is +Inf), then the sum
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _histograms.append(self)
+
+    def observe(self, value: float, *labels: str):
+        """Record one value; labels are given in labelnames order"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {values[-1]!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_SECONDS = Histogram(
+    "amakhet_http_request_duration_seconds", "HTTP request latency by route template",
+    ["app", "method", "route", "status"])
+STAGE_SECONDS = Histogram(
+    "amakhet_stage_duration_seconds", "Time spent in one pipeline stage of a request", ["stage"])
+INFERENCE_SECONDS = Histogram(
+    "amakhet_model_inference_seconds", "Model predict call time", ["model"])
+EXTERNAL_SECONDS = Histogram(
+    "amakhet_external_call_seconds", "Time waiting on an external service", ["service", "call", "outcome"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0))
+
+
+def stage(name: str):
+    return STAGE_SECONDS.time(name)
+
+
+def inference(model: str):
+    return INFERENCE_SECONDS.time(model)
+
+
+@contextmanager
+def external(service: str, call: str):
+    """Time a call to an external service, labelled with whether it raised"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        EXTERNAL_SECONDS.observe(time.perf_counter() - started, service, call, outcome)
+
+
+# --------- Values read at scrape time ----------
+def register_collector(collect: Callable[[], Iterable[Family]]):
+    with _registry_lock:
+        _collectors.append(collect)
+
+
+def track_pool(name: str, pool: Any):
+    """Queue depth, running tasks and rejections of a BoundedExecutor / MicroBatcher-like object"""
+    def collect():
+        stats = pool.stats()
+        labels = {"pool": name}
+        families = []
+        if "queued" in stats or "queue_depth" in stats:
+            families.append(("amakhet_queue_depth", "gauge", "Tasks waiting for a worker or a batch",
+                             [(labels, stats.get("queued", stats.get("queue_depth", 0)))]))
+        if "running" in stats:
+            families.append(("amakhet_pool_running", "gauge", "Tasks currently running", [(labels, stats["running"])]))
+        if "rejected" in stats:
+            families.append(("amakhet_pool_rejected_total", "counter", "Tasks rejected because the queue was full",
+                             [(labels, stats["rejected"])]))
+        if "batches" in stats:
+            families.append(("amakhet_batches_total", "counter", "Batched predict calls", [(labels, stats["batches"])]))
+            families.append(("amakhet_batch_items_total", "counter", "Items predicted in batches", [(labels, stats["items"])]))
+        return families
+    register_collector(collect)
+
+
+def track_cache(name: str, stats_fn: Callable[[], Dict[str, Any]]):
+    """Hit / miss counters and hit ratio of any cache whose stats() reports hits and misses"""
+    def collect():
+        stats = stats_fn()
+        labels = {"cache": name}
+        hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+        return [
+            ("amakhet_cache_hits_total", "counter", "Cache lookups that hit", [(labels, hits)]),
+            ("amakhet_cache_misses_total", "counter", "Cache lookups that missed", [(labels, misses)]),
+            ("amakhet_cache_hit_ratio", "gauge", "Hits / lookups since start",
+             [(labels, hits / (hits + misses) if hits + misses else 0.0)]),
+        ]
+    register_collector(collect)
+
+
+def track_single_flight(name: str, flight: Any):
+    """Computations in flight and calls coalesced onto them, from a SingleFlight"""
+    def collect():
+        stats = flight.stats()
+        labels = {"group": name}
+        return [
+            ("amakhet_single_flight_in_flight", "gauge", "Distinct computations in flight", [(labels, stats["in_flight"])]),
+            ("amakhet_single_flight_coalesced_total", "counter", "Calls that joined a computation already in flight",
+             [(labels, stats["coalesced"])]),
+        ]
+    register_collector(collect)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for histogram in list(_histograms):
+        lines += histogram.render()
+
+    families: Dict[str, Tuple[str, str, List[Tuple[Dict[str, str], float]]]] = {}
+    for collect in list(_collectors):
+        try:
+            for name, kind, help_text, samples in collect():
+                families.setdefault(name, (kind, help_text, []))[2].extend(samples)
+        except Exception as e:
+            lines.append(f"# collector error: {_escape(e)}")
+    for name, (kind, help_text, samples) in families.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, value in samples:
+            lines.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --------- FastAPI integration ----------
+class MetricsMiddleware:
+    """Pure ASGI middleware: times each request until its last body chunk is sent"""
+
+    def __init__(self, app, app_name: str):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; unmatched paths share one series
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - started, self.app_name, scope["method"], path, str(status))
+
+
+def instrument(app: FastAPI, app_name: str):
+    """Time every request of the app and serve GET /metrics"""
+    app.add_middleware(MetricsMiddleware, app_name=app_name)
+
+    def prometheus_metrics():
+        return PlainTextResponse(render(), media_type=CONTENT_TYPE)
+
+    app.add_api_route("/metrics", prometheus_metrics, methods=["GET"], tags=["ops"],
+                      summary="Prometheus metrics")
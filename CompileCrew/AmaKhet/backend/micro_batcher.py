@@ -0,0 +1,133 @@
+"""
+Dynamic micro-batching for model inference
+
+Concurrent requests each submit one preprocessed input. The batcher collects
+inputs for up to `window_ms` (or until `max_batch_size` are waiting), runs a
+single batched predict call and hands every caller its own row of the output.
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bounded_executor import QueueFullError
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = 16,
+        window_ms: float = 5.0,
+        run_in_executor: Optional[Callable[..., Any]] = None,
+        max_queue: int = 0,
+    ):
+        """
+        predict_fn: blocking function taking a (N, ...) batch, returning (N, ...) outputs
+        max_batch_size: flush as soon as this many inputs are waiting
+        window_ms: how long to wait for more inputs after the first one arrives
+        run_in_executor: coroutine function (fn, *args) used to run predict_fn off
+            the event loop; defaults to the loop's default thread pool
+        max_queue: reject submissions with QueueFullError once this many inputs
+            are waiting (0 = unbounded)
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window_ms = max(0.0, float(window_ms))
+        self._run_in_executor = run_in_executor
+        self.max_queue = max(0, int(max_queue))
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Stats
+        self._batch_sizes = Counter()
+        self._items = 0
+        self._batches = 0
+        self._predict_seconds = 0.0
+
+    async def submit(self, item: np.ndarray) -> np.ndarray:
+        """Queue one input (shape (1, ...) or (...)) and wait for its output row"""
+        self._ensure_worker()
+        if self.max_queue and self._queue.qsize() >= self.max_queue:
+            raise QueueFullError(f"batch queue is full ({self.max_queue} waiting)")
+        if item.ndim and item.shape[0] == 1:
+            item = item[0]
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "window_ms": self.window_ms,
+            "max_queue": self.max_queue,
+            "batches": self._batches,
+            "items": self._items,
+            "mean_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+            "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            "mean_predict_ms": round(1000 * self._predict_seconds / self._batches, 2) if self._batches else 0.0,
+            "queue_depth": self.queue_depth,
+        }
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            # Queue and worker belong to the loop that serves the requests
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Callers that gave up (client disconnect, timeout) don't need a slot
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                # Inside the try: mismatched shapes fail this batch's callers, not the worker
+                inputs = np.stack([item for item, _ in batch])
+                if self._run_in_executor is not None:
+                    outputs = await self._run_in_executor(self.predict_fn, inputs)
+                else:
+                    outputs = await asyncio.get_running_loop().run_in_executor(None, self.predict_fn, inputs)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self._predict_seconds += time.perf_counter() - started
+
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            for index, (_, future) in enumerate(batch):
+                if not future.done():
+                    future.set_result(outputs[index])
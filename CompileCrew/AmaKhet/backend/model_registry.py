@@ -0,0 +1,226 @@
+"""
+Lazy registry for the models served by main.py
+
+Nothing is loaded at import time. Each artifact is loaded the first time an
+endpoint asks for it (or at startup when listed in MODEL_PRELOAD), and:
+  - names that point at the same file (encoder / crop_encoder) share one object
+  - joblib files are opened with mmap_mode="r", so large numpy arrays stay in
+    the page cache and are shared by every worker process instead of being
+    copied into each one (only works for uncompressed joblib dumps)
+  - load time, RSS growth and array bytes are recorded per artifact for /models
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import joblib
+import numpy as np
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process (Linux), or None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _is_memmapped(array: np.ndarray) -> bool:
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base if isinstance(array.base, np.ndarray) else None
+    return False
+
+
+def array_bytes(obj: Any, max_depth: int = 10) -> Dict[str, int]:
+    """Bytes held in numpy arrays reachable from obj, split into memory-mapped and in-heap"""
+    totals = {"mmap": 0, "heap": 0}
+    seen = set()
+
+    def walk(value, depth):
+        if depth > max_depth or id(value) in seen:
+            return
+        seen.add(id(value))
+        if isinstance(value, np.ndarray):
+            totals["mmap" if _is_memmapped(value) else "heap"] += value.nbytes
+        elif isinstance(value, dict):
+            for item in value.values():
+                walk(item, depth + 1)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                walk(item, depth + 1)
+        elif hasattr(value, "__dict__"):
+            walk(vars(value), depth + 1)
+        elif hasattr(value, "__getstate__") and not isinstance(value, (str, bytes, int, float)):
+            # Cython objects such as sklearn's Tree expose their arrays this way
+            try:
+                state = value.__getstate__()
+            except Exception:
+                return
+            if isinstance(state, dict):
+                walk(state, depth + 1)
+
+    walk(obj, 0)
+    return totals
+
+
+class ModelRegistry:
+    def __init__(self, models_dir: str = "models", files: Optional[Dict[str, str]] = None, mmap_mode: Optional[str] = "r",
+                 on_load: Optional[Callable[[str, float, Optional[str]], None]] = None):
+        """
+        models_dir: folder holding the joblib files
+        files: model name -> joblib file name inside models_dir
+        mmap_mode: passed to joblib.load (None loads arrays into memory)
+        on_load: called as on_load(name, load_ms, error) after every load attempt
+        """
+        self.models_dir = models_dir
+        self.mmap_mode = mmap_mode
+        self.on_load = on_load
+        self._files = dict(files or {})
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._objects: Dict[str, Any] = {}     # load key -> object
+        self._errors: Dict[str, Exception] = {}
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register an artifact that is not a joblib file (e.g. the disease model)"""
+        self._loaders[name] = loader
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._files) + [name for name in self._loaders if name not in self._files]
+
+    def _key(self, name: str) -> str:
+        """Names sharing a file share a key, so the file is only loaded once"""
+        if name in self._loaders:
+            return f"loader:{name}"
+        if name in self._files:
+            return os.path.realpath(os.path.join(self.models_dir, self._files[name]))
+        raise KeyError(f"Unknown model '{name}'")
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it on first use. Load failures are re-raised until reset()."""
+        key = self._key(name)
+        if key in self._objects:
+            return self._objects[key]
+        with self._lock:
+            if key in self._objects:
+                return self._objects[key]
+            if key in self._errors:
+                raise self._errors[key]
+            return self._load(name, key)
+
+    def _load(self, name: str, key: str) -> Any:
+        rss_before = rss_bytes()
+        started = time.perf_counter()
+        try:
+            if name in self._loaders:
+                obj = self._loaders[name]()
+            else:
+                obj = joblib.load(key, mmap_mode=self.mmap_mode)
+        except Exception as e:
+            self._errors[key] = e
+            print(f"⚠️  Error loading {name}: {e}")
+            if self.on_load:
+                self.on_load(name, (time.perf_counter() - started) * 1000, str(e))
+            raise
+        load_ms = (time.perf_counter() - started) * 1000
+        rss_after = rss_bytes()
+
+        arrays = array_bytes(obj)
+        self._info[key] = {
+            "load_ms": round(load_ms, 1),
+            "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "array_bytes_mmap": arrays["mmap"],
+            "array_bytes_heap": arrays["heap"],
+            "file_bytes": os.path.getsize(key) if os.path.exists(key) else None,
+            "loaded_at": time.time(),
+        }
+        self._objects[key] = obj
+        print(f"✅ Loaded {name} in {load_ms:.0f} ms")
+        if self.on_load:
+            self.on_load(name, load_ms, None)
+        return obj
+
+    def is_loaded(self, name: str) -> bool:
+        return self._key(name) in self._objects
+
+    def fingerprint(self, names: Iterable[str]) -> tuple:
+        """(path, mtime, size) of the files behind the given names; changes when a model file is replaced"""
+        result = []
+        for name in names:
+            key = self._key(name)
+            if key.startswith("loader:"):
+                continue
+            try:
+                stat = os.stat(key)
+                result.append((key, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                result.append((key, None, None))
+        return tuple(sorted(set(result)))
+
+    def error(self, name: str) -> Optional[Exception]:
+        return self._errors.get(self._key(name))
+
+    def preload(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Load the given models now; returns name -> error message (None on success)"""
+        results = {}
+        for name in names:
+            try:
+                self.get(name)
+                results[name] = None
+            except Exception as e:
+                results[name] = str(e)
+        return results
+
+    def reset(self, name: Optional[str] = None):
+        """Forget a loaded model or cached error (all of them when name is None)"""
+        with self._lock:
+            keys = [self._key(name)] if name else list(set(self._objects) | set(self._errors))
+            for key in keys:
+                self._objects.pop(key, None)
+                self._errors.pop(key, None)
+                self._info.pop(key, None)
+
+    def status(self) -> Dict[str, Any]:
+        """Which models are loaded and what each costs; shared files are listed once under `shared_with`"""
+        models = {}
+        for name in self.names:
+            key = self._key(name)
+            entry = {
+                "loaded": key in self._objects,
+                "source": self._files.get(name, "custom loader"),
+                "error": str(self._errors[key]) if key in self._errors else None,
+            }
+            shared_with = [other for other in self.names if other != name and self._key(other) == key]
+            if shared_with:
+                entry["shared_with"] = shared_with
+            entry.update(self._info.get(key, {}))
+            models[name] = entry
+        return {
+            "models_dir": self.models_dir,
+            "mmap_mode": self.mmap_mode,
+            "loaded": sum(1 for name in self.names if models[name]["loaded"]),
+            "process_rss_bytes": rss_bytes(),
+            "models": models,
+        }
+
+
+def parse_preload(value: str, names: List[str]) -> List[str]:
+    """MODEL_PRELOAD value: "all", "none"/empty, or a comma-separated list of names"""
+    value = (value or "").strip()
+    if value.lower() == "all":
+        return list(names)
+    if value.lower() in ("", "none"):
+        return []
+    requested = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in names]
+    if unknown:
+        print(f"⚠️  MODEL_PRELOAD: unknown model(s) {', '.join(unknown)} ignored")
+    return [name for name in requested if name in names]
@@ -0,0 +1,116 @@
+"""
+In-memory TTL + LRU cache for tabular model predictions
+
+Dashboards send the same district / crop / soil readings over and over, so the
+single-row endpoints look the raw prediction up here before encoding and
+predicting. Keys are the request inputs with numbers rounded to
+`round_digits`; the formatted response is still built from the caller's own
+inputs, so rounding never leaks one request's values into another's message.
+
+Entries expire after `ttl_seconds`, the least recently used entry is evicted
+beyond `max_entries`, and the whole cache is dropped when the fingerprint of
+the model files changes (checked at most every `check_interval` seconds).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+
+class PredictionCache:
+    def __init__(self, name: str, max_entries: int = 10000, ttl_seconds: float = 3600, round_digits: Optional[int] = 3,
+                 fingerprint: Optional[Callable[[], Hashable]] = None,
+                 on_invalidate: Optional[Callable[[], None]] = None, check_interval: float = 5.0):
+        """
+        max_entries: 0 disables the cache
+        fingerprint: returns something that changes when the model files change
+        on_invalidate: called after the cache was dropped because of a model change
+        """
+        self.name = name
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.round_digits = round_digits
+        self.fingerprint = fingerprint
+        self.on_invalidate = on_invalidate
+        self.check_interval = check_interval
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = fingerprint() if fingerprint else None
+        self._checked_at = time.monotonic()
+        self._counts = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def make_key(self, inputs: Mapping[str, Any]) -> Tuple:
+        """Order-independent key; ints and floats are rounded to the same float"""
+        items = []
+        for field, value in sorted(inputs.items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = float(value) if self.round_digits is None else round(float(value), self.round_digits)
+            items.append((field, value))
+        return tuple(items)
+
+    def _check_fingerprint(self):
+        if self.fingerprint is None or time.monotonic() - self._checked_at < self.check_interval:
+            return
+        self._checked_at = time.monotonic()
+        current = self.fingerprint()
+        if current != self._fingerprint:
+            with self._lock:
+                self._entries.clear()
+                self._counts["invalidations"] += 1
+            self._fingerprint = current
+            print(f"⚠️  Model files changed, {self.name} prediction cache cleared")
+            if self.on_invalidate:
+                self.on_invalidate()
+
+    def get_or_compute(self, inputs: Mapping[str, Any], compute: Callable[[], Any]) -> Any:
+        """Cached value for these inputs, or compute() and store it. Exceptions are not cached."""
+        if not self.enabled:
+            return compute()
+        self._check_fingerprint()
+        key = self.make_key(inputs)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counts["hits"] += 1
+                    return value
+                del self._entries[key]
+                self._counts["expirations"] += 1
+            self._counts["misses"] += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = (now + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counts["evictions"] += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def reset_fingerprint(self):
+        """Take the current fingerprint as the baseline, e.g. after loaders were swapped on purpose"""
+        self._fingerprint = self.fingerprint() if self.fingerprint else None
+        self._checked_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counts["hits"] + self._counts["misses"]
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "round_digits": self.round_digits,
+            "hit_rate": round(self._counts["hits"] / lookups, 4) if lookups else None,
+            **self._counts,
+        }
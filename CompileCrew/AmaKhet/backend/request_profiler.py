@@ -0,0 +1,330 @@
+"""
+Opt-in sampling profiler for single requests
+
+Slow requests that only happen with real inputs can be captured in production:
+
+  - an admin sends the request with `X-Profile: <PROFILE_ADMIN_TOKEN>` (or
+    `?profile=<token>`), or
+  - a fraction `PROFILE_SAMPLE_RATE` of all requests is picked at random.
+
+While such a request runs, a background thread samples the Python stacks of
+every thread every `PROFILE_INTERVAL_MS` (handlers run on the event loop, the
+threadpool and the decode / Earth Engine pools). Samples of threads that are
+just idle (waiting on a lock, queue or selector) are dropped. The profile is
+written to `PROFILE_DIR` as JSON with the request's method, route, path and
+query parameters, status and duration. Stacks are in collapsed format
+("outer;inner count"), which speedscope and flamegraph.pl read directly. The
+request body is saved next to it as `<id>.body` when it is at most
+`PROFILE_MAX_BODY_BYTES`.
+
+Only one request is profiled at a time; the response carries `X-Profile-Id`
+when it was captured. GET /profiles lists the captures (admin token required).
+"""
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, Header, HTTPException, Query
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY = "profile"
+MAX_STACK_DEPTH = 128
+
+# Innermost frames of a thread that is waiting rather than working
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"), ("selectors.py", "select"), ("selectors.py", "poll"),
+    # concurrent.futures workers block in SimpleQueue.get (C code) between tasks
+    ("thread.py", "_worker"),
+}
+
+
+class StackSampler:
+    """Counts the collapsed stacks of all other threads, every interval, until stopped"""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self.interval_s):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+def top_functions(stacks: Counter, limit: int = 20) -> List[Dict[str, Any]]:
+    """Functions by samples where they were the innermost frame (self time)"""
+    own: Counter = Counter()
+    for stack, count in stacks.items():
+        own[stack.rsplit(";", 1)[-1]] += count
+    return [{"function": function, "samples": count} for function, count in own.most_common(limit)]
+
+
+class RequestProfiler:
+    def __init__(self, directory: str, admin_token: str = "", sample_rate: float = 0.0,
+                 interval_ms: float = 5.0, max_profiles: int = 200, max_body_bytes: int = 1024 * 1024):
+        """
+        admin_token: enables the X-Profile header / ?profile= trigger and the listing ("" disables both)
+        sample_rate: fraction of requests profiled at random (0 disables sampling)
+        max_profiles: oldest captures are deleted beyond this many
+        """
+        self.directory = directory
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.interval_s = max(interval_ms, 0.5) / 1000
+        self.max_profiles = max_profiles
+        self.max_body_bytes = max_body_bytes
+        self._busy = threading.Lock()
+        self._counts = {"captured": 0, "skipped_busy": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.admin_token) or self.sample_rate > 0
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        return bool(self.admin_token) and token is not None and hmac.compare_digest(token, self.admin_token)
+
+    def requested_token(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                return value.decode("latin-1")
+        for name, value in parse_qsl(scope.get("query_string", b"").decode("latin-1")):
+            if name == PROFILE_QUERY:
+                return value
+        return None
+
+    def should_profile(self, scope) -> Optional[str]:
+        """Why this request is profiled ("admin" or "sampled"), or None"""
+        if self.is_admin(self.requested_token(scope)):
+            return "admin"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def begin(self) -> bool:
+        """Claim the sampler; False while another request is being profiled"""
+        if self._busy.acquire(blocking=False):
+            return True
+        self._counts["skipped_busy"] += 1
+        return False
+
+    def end(self):
+        self._busy.release()
+
+    def save(self, record: Dict[str, Any], body: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        if body and len(body) <= self.max_body_bytes:
+            record["body_file"] = f"{record['id']}.body"
+            with open(os.path.join(self.directory, record["body_file"]), "wb") as f:
+                f.write(body)
+        path = os.path.join(self.directory, f"{record['id']}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(record, f)
+        os.replace(path + ".tmp", path)
+        self._counts["captured"] += 1
+        self.prune()
+
+    def prune(self):
+        profiles = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        for name in profiles[:max(0, len(profiles) - self.max_profiles)]:
+            profile_id = name[:-len(".json")]
+            for path in (name, f"{profile_id}.body"):
+                try:
+                    os.remove(os.path.join(self.directory, path))
+                except FileNotFoundError:
+                    pass
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest captures first, without their stacks"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted((name for name in os.listdir(self.directory) if name.endswith(".json")), reverse=True)
+        listing = []
+        for name in names[:limit]:
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            record.pop("stacks", None)
+            record.pop("top_functions", None)
+            listing.append(record)
+        return listing
+
+    def load(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if os.path.basename(profile_id) != profile_id:
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "admin_trigger": bool(self.admin_token),
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval_s * 1000,
+            "directory": self.directory,
+            **self._counts,
+        }
+
+
+def profiler_from_env() -> RequestProfiler:
+    return RequestProfiler(
+        os.getenv("PROFILE_DIR", "profiles"),
+        admin_token=os.getenv("PROFILE_ADMIN_TOKEN", ""),
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        interval_ms=float(os.getenv("PROFILE_INTERVAL_MS", "5")),
+        max_profiles=int(os.getenv("PROFILE_MAX_FILES", "200")),
+        max_body_bytes=int(os.getenv("PROFILE_MAX_BODY_BYTES", str(1024 * 1024))),
+    )
+
+
+# --------- FastAPI integration ----------
+class ProfilingMiddleware:
+    """Pure ASGI middleware: runs picked requests under a StackSampler and saves the profile"""
+
+    def __init__(self, app, profiler: RequestProfiler, app_name: str, skip_prefix: str):
+        """skip_prefix: paths never profiled (the listing itself carries the admin header)"""
+        self.app = app
+        self.profiler = profiler
+        self.app_name = app_name
+        self.skip_prefix = skip_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled or scope["path"].startswith(self.skip_prefix):
+            return await self.app(scope, receive, send)
+        reason = self.profiler.should_profile(scope)
+        if reason is None or not self.profiler.begin():
+            return await self.app(scope, receive, send)
+
+        try:
+            profile_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{self.app_name}-{uuid.uuid4().hex[:8]}"
+            body = bytearray()
+            body_bytes = 0
+            status = 500
+
+            async def recording_receive():
+                nonlocal body_bytes
+                message = await receive()
+                if message["type"] == "http.request":
+                    chunk = message.get("body", b"")
+                    body_bytes += len(chunk)
+                    if len(body) <= self.profiler.max_body_bytes:
+                        body.extend(chunk)
+                return message
+
+            async def send_with_id(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    message = {**message, "headers": list(message.get("headers", [])) +
+                               [(b"x-profile-id", profile_id.encode())]}
+                await send(message)
+
+            sampler = StackSampler(self.profiler.interval_s)
+            started = time.perf_counter()
+            sampler.start()
+            try:
+                await self.app(scope, recording_receive, send_with_id)
+            finally:
+                sampler.stop()
+                duration_ms = (time.perf_counter() - started) * 1000
+                route = scope.get("route")
+                content_type = next((value.decode("latin-1") for name, value in scope.get("headers", [])
+                                     if name == b"content-type"), None)
+                record = {
+                    "id": profile_id,
+                    "app": self.app_name,
+                    "reason": reason,
+                    "captured_at": datetime.now().isoformat(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "path_params": {key: str(value) for key, value in scope.get("path_params", {}).items()},
+                    # The admin token is not stored with the capture
+                    "query": [[name, value] for name, value in parse_qsl(scope.get("query_string", b"").decode("latin-1"))
+                              if name != PROFILE_QUERY],
+                    "content_type": content_type,
+                    "body_bytes": body_bytes,
+                    "status": status,
+                    "duration_ms": round(duration_ms, 2),
+                    "interval_ms": self.profiler.interval_s * 1000,
+                    "samples": sampler.samples,
+                    "top_functions": top_functions(sampler.stacks),
+                    "stacks": dict(sampler.stacks.most_common()),
+                }
+                try:
+                    self.profiler.save(record, bytes(body) if body_bytes <= self.profiler.max_body_bytes else b"")
+                except OSError as e:
+                    print(f"⚠️  Could not save profile {profile_id}: {e}")
+        finally:
+            self.profiler.end()
+
+
+def instrument(app: FastAPI, app_name: str, profiler: RequestProfiler, prefix: str = ""):
+    """Profile picked requests of the app and serve the listing under prefix + /profiles"""
+    app.add_middleware(ProfilingMiddleware, profiler=profiler, app_name=app_name, skip_prefix=prefix + "/profiles")
+
+    def require_admin(token: Optional[str]):
+        if not profiler.is_admin(token):
+            raise HTTPException(status_code=403, detail="Profiles need the PROFILE_ADMIN_TOKEN in the X-Profile header")
+
+    @app.get(prefix + "/profiles", tags=["ops"])
+    def list_profiles(
+        limit: int = Query(50, ge=1, le=1000),
+        x_profile: Optional[str] = Header(None)
+    ) -> Dict[str, Any]:
+        """
+        Captured request profiles, newest first (without their stacks)
+        """
+        require_admin(x_profile)
+        return {"profiler": profiler.stats(), "profiles": profiler.list(limit)}
+
+    @app.get(prefix + "/profiles/{profile_id}", tags=["ops"])
+    def get_profile(profile_id: str, x_profile: Optional[str] = Header(None)) -> Dict[str, Any]:
+        """
+        One captured profile with its collapsed stacks
+        """
+        require_admin(x_profile)
+        record = profiler.load(profile_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+        return record
@@ -0,0 +1,42 @@
+"""
+Single-flight coalescing for async endpoints
+
+Concurrent calls with the same key share one in-flight computation: the first
+caller starts it, later callers await the same task instead of repeating the
+work. Once it finishes the key is forgotten, so the next call computes again
+(pair it with a cache for longer reuse). The shared task is shielded, so one
+client disconnecting does not cancel the work the others are waiting for.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._counts = {"started": 0, "coalesced": 0}
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn() for this key, or join the call already running for it"""
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is loop:
+            self._counts["coalesced"] += 1
+            return await asyncio.shield(task)
+
+        task = loop.create_task(fn())
+        self._inflight[key] = task
+        self._counts["started"] += 1
+
+        def forget(finished: asyncio.Task):
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            if not finished.cancelled():
+                finished.exception()  # mark as retrieved when every caller has gone away
+
+        task.add_done_callback(forget)
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._inflight), **self._counts}
@@ -1,11 +1,25 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
-import ee
+from typing import Optional, Dict, Any, List, Tuple
 import json
+import os
 from datetime import datetime, timedelta
 
+# EARTH_ENGINE_FAKE=1 runs against the deterministic local stand-in (fake_ee.py)
+if os.getenv("EARTH_ENGINE_FAKE", "0") == "1":
+    import fake_ee as ee
+else:
+    import ee
+
+import metrics
+import request_profiler
+from bounded_executor import BoundedExecutor, QueueFullError
+from single_flight import SingleFlight
+from soil_cache import SoilCache, geohash
+from soil_raster_store import DEFAULT_DIRECTORY, SoilRasterStore
+from soil_timeseries import SoilTimeSeries
+
 # Initialize FastAPI app
 app = FastAPI(title="AmaKhet Soil Analysis API", version="1.0.0")
 
@@ -17,6 +31,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request latency per route and GET /metrics (Prometheus text format)
+metrics.instrument(app, "soil")
+# Opt-in profiling of single requests (X-Profile header or PROFILE_SAMPLE_RATE)
+request_profiler.instrument(app, "soil", request_profiler.profiler_from_env(), prefix="/api")
 
 # Initialize Google Earth Engine
 try:
@@ -24,6 +42,32 @@ try:
 except Exception as e:
     print(f"Warning: Earth Engine not initialized: {e}")
 
+# Local cache of layer values keyed by geohash cell, buffer and date bucket
+# (SOIL_CACHE_PATH="" disables it)
+soil_cache = SoilCache(
+    os.getenv("SOIL_CACHE_PATH", "cache/soil_cache.sqlite3"),
+    precision=int(os.getenv("SOIL_CACHE_GEOHASH_PRECISION", "8")),
+    bucket_days=int(os.getenv("SOIL_CACHE_DATE_BUCKET_DAYS", "7")),
+    dynamic_ttl=float(os.getenv("SOIL_CACHE_DYNAMIC_TTL", str(24 * 3600))),
+)
+
+# Per-farm NDVI / SMAP aggregates per period; window values are assembled from
+# them and only new periods are fetched. Off by default: its NDVI approximates
+# the window's median composite, so setting SOIL_SERIES_PATH is an opt-in
+soil_series = SoilTimeSeries(
+    os.getenv("SOIL_SERIES_PATH", ""),
+    precision=soil_cache.precision,
+    period_days=int(os.getenv("SOIL_SERIES_PERIOD_DAYS", "7")),
+    settle_days=int(os.getenv("SOIL_SERIES_SETTLE_DAYS", "7")),
+    refresh_seconds=float(os.getenv("SOIL_SERIES_REFRESH_SECONDS", str(6 * 3600))),
+)
+
+# Static soil layers ingested locally with `soil_raster_store.py ingest`; when
+# present they replace the Earth Engine call for pH / SOC / WC33
+soil_raster_store = SoilRasterStore.open(os.getenv("SOIL_RASTER_DIR", DEFAULT_DIRECTORY))
+if soil_raster_store is not None:
+    print(f"✅ Loaded local soil rasters from {soil_raster_store.directory}")
+
 # Request model
 class SoilAnalysisRequest(BaseModel):
     latitude: float
@@ -39,119 +83,455 @@ class SoilAnalysisResponse(BaseModel):
     message: str
     timestamp: str
 
+# Batch request / response models
+class SoilPoint(BaseModel):
+    latitude: float
+    longitude: float
+    buffer_meters: int = 50
+
+class BatchSoilAnalysisRequest(BaseModel):
+    points: List[SoilPoint]
+    start_date: str
+    end_date: str
+
+class BatchSoilAnalysisResponse(BaseModel):
+    success: bool
+    results: List[Dict[str, Any]]
+    message: str
+    timestamp: str
+
+# Bands reduced per scale (metres). Bands that share a scale are stacked into
+# one multi-band image, and all groups come back in a single getInfo() call.
+SCALE_GROUPS = {
+    10: ["NDVI"],
+    10000: ["SM_surface", "SM_rootzone"],
+    250: ["pH_top30cm", "SOC_gkg_top30cm", "SOC_pct_top30cm", "WC33_vpct_top30cm"],
+}
+# Cache layer name per scale group; "static" entries never expire
+SCALE_LAYERS = {10: "ndvi", 10000: "smap", 250: "static"}
+# Scale groups served by the per-farm time series when it is enabled
+SERIES_SCALES = [10, 10000]
+
+
+def sentinel2_ndvi(aoi, start: str, end: str) -> Tuple[Any, Any]:
+    """
+    Cloud-masked Sentinel-2 collection and the NDVI of its median composite
+    """
+    def s2_cloudmask(img):
+        scl = img.select('SCL')
+        keep = scl.remap([3, 8, 9, 10], [0, 0, 0, 0], 1)
+        return img.updateMask(keep)
+
+    s2 = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+          .filterBounds(aoi).filterDate(start, end).map(s2_cloudmask))
+    return s2, s2.median().normalizedDifference(['B8', 'B4']).rename('NDVI')
+
+
+def smap_moisture(start: str, end: str) -> Tuple[Any, Any]:
+    """
+    SMAP L4 collection and its mean SM_surface / SM_rootzone image
+    """
+    smap = (ee.ImageCollection('NASA/SMAP/SPL4SMGP/007')
+            .filterDate(start, end).select(['sm_surface', 'sm_rootzone']))
+    sm_surface = smap.select('sm_surface').mean().rename('SM_surface')
+    sm_rootzone = smap.select('sm_rootzone').mean().rename('SM_rootzone')
+    return smap, sm_surface.addBands(sm_rootzone)
+
+
+def build_soil_layers(aoi, start: str, end: str) -> Dict[int, Any]:
+    """
+    One multi-band ee.Image per scale in SCALE_GROUPS
+    """
+    _, ndvi = sentinel2_ndvi(aoi, start, end)
+    _, moisture = smap_moisture(start, end)
+    return {
+        10: ndvi,
+        10000: moisture,
+        250: build_static_soil_image(),
+    }
+
+
+def build_period_reductions(aoi, periods: List[Tuple[str, str]]):
+    """
+    NDVI / SMAP aggregates and scene counts of every period, as one ee.Dictionary
+    keyed by period start. Periods without scenes report empty values.
+    """
+    def reduce(image, scale, count):
+        reduced = image.reduceRegion(reducer=ee.Reducer.mean(), geometry=aoi, scale=scale, maxPixels=1e9)
+        return ee.Algorithms.If(count.gt(0), reduced, ee.Dictionary({}))
+
+    reductions = {}
+    for period_start, period_end in periods:
+        s2, ndvi = sentinel2_ndvi(aoi, period_start, period_end)
+        smap, moisture = smap_moisture(period_start, period_end)
+        ndvi_images, smap_images = s2.size(), smap.size()
+        reductions[period_start] = ee.Dictionary({
+            "ndvi": reduce(ndvi, 10, ndvi_images),
+            "smap": reduce(moisture, 10000, smap_images),
+            "ndvi_images": ndvi_images,
+            "smap_images": smap_images,
+        })
+    return ee.Dictionary(reductions)
+
+
+def period_values(reduced: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten one period of build_period_reductions into time series fields"""
+    ndvi = reduced.get("ndvi") or {}
+    smap = reduced.get("smap") or {}
+    return {
+        "ndvi": ndvi.get("NDVI"),
+        "ndvi_images": reduced.get("ndvi_images", 0),
+        "sm_surface": smap.get("SM_surface"),
+        "sm_rootzone": smap.get("SM_rootzone"),
+        "smap_images": reduced.get("smap_images", 0),
+    }
+
+
+def build_static_soil_image():
+    """
+    The 250 m OpenLandMap bands (top 30 cm means); also what soil_raster_store ingests
+    """
+    ph_img = ee.Image('OpenLandMap/SOL/SOL_PH-H2O_USDA-4C1A2A_M/v02').select(['b0','b10','b30']).multiply(0.1)
+    ph_top30 = ph_img.reduce(ee.Reducer.mean()).rename('pH_top30cm')
+
+    soc_img = ee.Image('OpenLandMap/SOL/SOL_ORGANIC-CARBON_USDA-6A1C_M/v02').select(['b0','b10','b30']).multiply(5.0)
+    soc_gkg_top30 = soc_img.reduce(ee.Reducer.mean()).rename('SOC_gkg_top30cm')
+    soc_pct_top30 = soc_gkg_top30.divide(10.0).rename('SOC_pct_top30cm')
+
+    wc33_img = ee.Image('OpenLandMap/SOL/SOL_WATERCONTENT-33KPA_USDA-4B1C_M/v01').select(['b0','b10','b30'])
+    wc33_top30 = wc33_img.reduce(ee.Reducer.mean()).rename('WC33_vpct_top30cm')
+
+    return ph_top30.addBands([soc_gkg_top30, soc_pct_top30, wc33_top30])
+
+
+def reduce_soil_layers(aoi, layers: Dict[int, Any],
+                       periods: List[Tuple[str, str]] = ()) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Mean of every band over the AOI. Each scale group is one reduceRegion
+    (the mean reducer is applied per band, with each band's own mask), and
+    the groups are combined into one ee.Dictionary so there is one round trip.
+    Time series periods, if any, are fetched in the same round trip.
+    Returns (band values, aggregates per period start).
+    """
+    reductions = {
+        str(scale): image.reduceRegion(reducer=ee.Reducer.mean(), geometry=aoi, scale=scale, maxPixels=1e9)
+        for scale, image in layers.items()
+    }
+    if periods:
+        reductions["periods"] = build_period_reductions(aoi, periods)
+    with metrics.external("earth_engine", "reduce_soil_layers"):
+        result = ee.Dictionary(reductions).getInfo()
+    fetched_periods = result.pop("periods", None) or {}
+    values = {}
+    for group in result.values():
+        values.update(group or {})
+    return values, fetched_periods
+
+
+def evaluate_soil_health(values: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn the reduced band values into the soil health response
+    """
+    ndvi_val = values.get('NDVI', 0)
+    sm_surface_val = values.get('SM_surface', 0)
+    sm_rootzone_val = values.get('SM_rootzone', 0)
+    ph_val = values.get('pH_top30cm', 0)
+    soc_pct_val = values.get('SOC_pct_top30cm', 0)
+    wc33_val = values.get('WC33_vpct_top30cm', 0)
+
+    # Determine soil health status
+    health_status = "healthy"
+    health_percentage = 90
+    stress_areas = 10
+
+    # Analyze pH (optimal range: 6.0-7.5)
+    if ph_val < 5.5 or ph_val > 8.0:
+        health_status = "warning"
+        health_percentage = 70
+        stress_areas = 25
+    elif ph_val < 6.0 or ph_val > 7.5:
+        health_status = "warning"
+        health_percentage = 80
+        stress_areas = 20
+
+    # Analyze organic carbon (optimal: >2%)
+    if soc_pct_val < 1.0:
+        health_status = "warning"
+        health_percentage = min(health_percentage, 75)
+        stress_areas = max(stress_areas, 30)
+
+    # Analyze water holding capacity
+    if wc33_val < 30:
+        health_status = "warning"
+        health_percentage = min(health_percentage, 80)
+        stress_areas = max(stress_areas, 25)
+
+    # Generate recommendations based on analysis
+    recommendations = []
+    if ph_val < 6.0:
+        recommendations.append("Consider adding lime to raise soil pH")
+    elif ph_val > 7.5:
+        recommendations.append("Consider adding sulfur to lower soil pH")
+
+    if soc_pct_val < 2.0:
+        recommendations.append("Add organic matter to improve soil fertility")
+
+    if wc33_val < 30:
+        recommendations.append("Improve soil structure to enhance water retention")
+
+    if not recommendations:
+        recommendations.append("Continue current soil management practices")
+        recommendations.append("Monitor soil health regularly")
+
+    return {
+        "status": health_status,
+        "ndvi": ndvi_val,
+        "healthPercentage": health_percentage,
+        "stressAreas": stress_areas,
+        "soilData": {
+            "ph": ph_val,
+            "organicCarbon": soc_pct_val,
+            "waterHoldingCapacity": wc33_val,
+            "surfaceMoisture": sm_surface_val,
+            "rootzoneMoisture": sm_rootzone_val
+        },
+        "recommendations": recommendations,
+        "message": f"Your soil analysis shows {health_status} conditions. pH: {ph_val:.1f}, Organic Carbon: {soc_pct_val:.1f}%, Water Holding Capacity: {wc33_val:.1f}%"
+    }
+
+
+def local_soil_values(lat: float, lon: float, buffer_m: int, window: Tuple[str, str],
+                      scales: Optional[List[int]] = None) -> Tuple[Dict[str, Any], Dict[int, str]]:
+    """
+    Band values available without Earth Engine (local rasters, then the
+    cache), and the cache key of every scale group that still has to be reduced
+    """
+    values = {}
+    scales = list(SCALE_LAYERS) if scales is None else list(scales)
+
+    # Static layers straight from the local rasters when the point is covered
+    local_static = soil_raster_store.mean(lat, lon, buffer_m) if soil_raster_store is not None and 250 in scales else None
+    if local_static is not None:
+        values.update(local_static)
+        scales.remove(250)
+
+    keys = {scale: soil_cache.key(SCALE_LAYERS[scale], lat, lon, buffer_m, window) for scale in scales}
+    cached = soil_cache.get_many(keys.values())
+    for key in keys.values():
+        values.update(cached.get(key, {}))
+    return values, {scale: key for scale, key in keys.items() if key not in cached}
+
+
+def store_group(key: str, scale: int, reduced: Dict[str, Any]) -> Dict[str, Any]:
+    """Pick one scale group's bands out of a reduction and cache them (only when all are there)"""
+    group_values = {band: reduced.get(band) for band in SCALE_GROUPS[scale] if band in reduced}
+    # A band Earth Engine left out would otherwise be cached as missing, for good in the static layer
+    if len(group_values) == len(SCALE_GROUPS[scale]):
+        soil_cache.put(key, SCALE_LAYERS[scale], group_values)
+    return group_values
+
+
 def analyze_soil_health(lat: float, lon: float, buffer_m: int, start: str, end: str) -> Dict[str, Any]:
     """
     Analyze soil health using Google Earth Engine data
     """
     try:
-        # Create area of interest
-        aoi = ee.Geometry.Point([lon, lat]).buffer(buffer_m).bounds()
-        
-        # Sentinel-2 NDVI calculation
-        def s2_cloudmask(img):
-            scl = img.select('SCL')
-            keep = scl.remap([3, 8, 9, 10], [0, 0, 0, 0], 1)
-            return img.updateMask(keep)
-        
-        s2 = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-              .filterBounds(aoi).filterDate(start, end).map(s2_cloudmask))
-        
-        ndvi = s2.median().normalizedDifference(['B8', 'B4']).rename('NDVI')
-        
-        # SMAP soil moisture
-        smap = (ee.ImageCollection('NASA/SMAP/SPL4SMGP/007')
-                .filterDate(start, end).select(['sm_surface', 'sm_rootzone']))
-        sm_surface = smap.select('sm_surface').mean().rename('SM_surface')
-        sm_rootzone = smap.select('sm_rootzone').mean().rename('SM_rootzone')
-        
-        # Static soil properties
-        ph_img = ee.Image('OpenLandMap/SOL/SOL_PH-H2O_USDA-4C1A2A_M/v02').select(['b0','b10','b30']).multiply(0.1)
-        ph_top30 = ph_img.reduce(ee.Reducer.mean()).rename('pH_top30cm')
-        
-        soc_img = ee.Image('OpenLandMap/SOL/SOL_ORGANIC-CARBON_USDA-6A1C_M/v02').select(['b0','b10','b30']).multiply(5.0)
-        soc_gkg_top30 = soc_img.reduce(ee.Reducer.mean()).rename('SOC_gkg_top30cm')
-        soc_pct_top30 = soc_gkg_top30.divide(10.0).rename('SOC_pct_top30cm')
-        
-        wc33_img = ee.Image('OpenLandMap/SOL/SOL_WATERCONTENT-33KPA_USDA-4B1C_M/v01').select(['b0','b10','b30'])
-        wc33_top30 = wc33_img.reduce(ee.Reducer.mean()).rename('WC33_vpct_top30cm')
-        
-        # Calculate zonal statistics
-        def mean_over(img, scale):
-            return img.reduceRegion(
-                reducer=ee.Reducer.mean(), geometry=aoi, scale=scale, maxPixels=1e9)
-        
-        # Get all values
-        ndvi_val = mean_over(ndvi, 10).getInfo().get('NDVI', 0)
-        sm_surface_val = mean_over(sm_surface, 10000).getInfo().get('SM_surface', 0)
-        sm_rootzone_val = mean_over(sm_rootzone, 10000).getInfo().get('SM_rootzone', 0)
-        ph_val = mean_over(ph_top30, 250).getInfo().get('pH_top30cm', 0)
-        soc_gkg_val = mean_over(soc_gkg_top30, 250).getInfo().get('SOC_gkg_top30cm', 0)
-        soc_pct_val = mean_over(soc_pct_top30, 250).getInfo().get('SOC_pct_top30cm', 0)
-        wc33_val = mean_over(wc33_top30, 250).getInfo().get('WC33_vpct_top30cm', 0)
-        
-        # Determine soil health status
-        health_status = "healthy"
-        health_percentage = 90
-        stress_areas = 10
-        
-        # Analyze pH (optimal range: 6.0-7.5)
-        if ph_val < 5.5 or ph_val > 8.0:
-            health_status = "warning"
-            health_percentage = 70
-            stress_areas = 25
-        elif ph_val < 6.0 or ph_val > 7.5:
-            health_status = "warning"
-            health_percentage = 80
-            stress_areas = 20
-        
-        # Analyze organic carbon (optimal: >2%)
-        if soc_pct_val < 1.0:
-            health_status = "warning"
-            health_percentage = min(health_percentage, 75)
-            stress_areas = max(stress_areas, 30)
-        
-        # Analyze water holding capacity
-        if wc33_val < 30:
-            health_status = "warning"
-            health_percentage = min(health_percentage, 80)
-            stress_areas = max(stress_areas, 25)
-        
-        # Generate recommendations based on analysis
-        recommendations = []
-        if ph_val < 6.0:
-            recommendations.append("Consider adding lime to raise soil pH")
-        elif ph_val > 7.5:
-            recommendations.append("Consider adding sulfur to lower soil pH")
-        
-        if soc_pct_val < 2.0:
-            recommendations.append("Add organic matter to improve soil fertility")
-        
-        if wc33_val < 30:
-            recommendations.append("Improve soil structure to enhance water retention")
-        
-        if not recommendations:
-            recommendations.append("Continue current soil management practices")
-            recommendations.append("Monitor soil health regularly")
-        
-        return {
-            "status": health_status,
-            "ndvi": ndvi_val,
-            "healthPercentage": health_percentage,
-            "stressAreas": stress_areas,
-            "soilData": {
-                "ph": ph_val,
-                "organicCarbon": soc_pct_val,
-                "waterHoldingCapacity": wc33_val,
-                "surfaceMoisture": sm_surface_val,
-                "rootzoneMoisture": sm_rootzone_val
-            },
-            "recommendations": recommendations,
-            "message": f"Your soil analysis shows {health_status} conditions. pH: {ph_val:.1f}, Organic Carbon: {soc_pct_val:.1f}%, Water Holding Capacity: {wc33_val:.1f}%"
-        }
-        
+        # Earth Engine reduces the requested window; the cache key uses its bucket, so a
+        # cached value may come from another window in the same bucket (bucket-level staleness)
+        window = soil_cache.window(start, end)
+        # NDVI / SMAP come from the farm's time series when it is enabled
+        scales = [scale for scale in SCALE_LAYERS if not (soil_series.enabled and scale in SERIES_SCALES)]
+        with metrics.stage("soil_local_lookup"):
+            values, missing = local_soil_values(lat, lon, buffer_m, window, scales)
+        farm = soil_series.farm_id(lat, lon, buffer_m)
+        stale = soil_series.stale_periods(farm, start, end) if soil_series.enabled else []
+
+        if missing or stale:
+            # Create area of interest
+            aoi = ee.Geometry.Point([lon, lat]).buffer(buffer_m).bounds()
+
+            # All missing groups and new periods in one Earth Engine request
+            layers = build_soil_layers(aoi, start, end)
+            reduced, fetched = reduce_soil_layers(aoi, {scale: layers[scale] for scale in missing}, stale)
+            for scale, key in missing.items():
+                values.update(store_group(key, scale, reduced))
+            soil_series.put_periods(farm, {period: period_values(fetched.get(period[0], {})) for period in stale})
+
+        if soil_series.enabled:
+            values.update(soil_series.window_values(farm, start, end))
+
+        return evaluate_soil_health(values)
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Soil analysis failed: {str(e)}")
 
+def update_soil_series(lat: float, lon: float, buffer_m: int, start: str, end: str) -> List[Dict[str, Any]]:
+    """
+    The farm's NDVI / SMAP periods for the window, fetching only the new ones
+    (all of them in one Earth Engine round trip)
+    """
+    farm = soil_series.farm_id(lat, lon, buffer_m)
+    stale = soil_series.stale_periods(farm, start, end)
+    if stale:
+        try:
+            aoi = ee.Geometry.Point([lon, lat]).buffer(buffer_m).bounds()
+            with metrics.external("earth_engine", "soil_series"):
+                fetched = build_period_reductions(aoi, stale).getInfo()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Soil time series update failed: {str(e)}")
+        soil_series.put_periods(farm, {period: period_values(fetched.get(period[0], {})) for period in stale})
+    return soil_series.series(farm, start, end)
+
+# --------- Batch analysis ----------
+# Points are reduced server-side with reduceRegions, one FeatureCollection per
+# chunk and scale group; each chunk's groups come back in one getInfo()
+SOIL_BATCH_CHUNK_SIZE = int(os.getenv("SOIL_BATCH_CHUNK_SIZE", "500"))
+SOIL_BATCH_MAX_POINTS = int(os.getenv("SOIL_BATCH_MAX_POINTS", "5000"))
+
+
+def reduce_soil_regions(points: List[Tuple[int, float, float, int]], scales_by_point: Dict[int, List[int]],
+                        start: str, end: str, periods_by_point: Optional[Dict[int, List[Tuple[str, str]]]] = None
+                        ) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, Dict[str, Dict[str, Any]]]]:
+    """
+    Mean band values per point index for the scale groups each point is missing,
+    and the time series periods each point has to refresh (same round trip).
+    points: (index, lat, lon, buffer_m)
+    Returns (band values, aggregates per period start) by point index.
+    """
+    periods_by_point = periods_by_point or {}
+    aois = {index: ee.Geometry.Point([lon, lat]).buffer(buffer_m).bounds() for index, lat, lon, buffer_m in points}
+    features = {index: ee.Feature(aoi, {"point_index": index}) for index, aoi in aois.items()}
+    region = ee.FeatureCollection(list(features.values())).geometry()
+    layers = build_soil_layers(region, start, end)
+
+    reductions = {}
+    for scale, image in layers.items():
+        wanted = [features[index] for index, *_ in points if scale in scales_by_point.get(index, [])]
+        if not wanted:
+            continue
+        bands = SCALE_GROUPS[scale]
+        # A single-band image would report its mean under "mean"; keep the band name
+        reducer = ee.Reducer.mean() if len(bands) > 1 else ee.Reducer.mean().setOutputs(bands)
+        reductions[str(scale)] = (image.reduceRegions(collection=ee.FeatureCollection(wanted), reducer=reducer, scale=scale)
+                                  .select(["point_index"] + bands, retainGeometry=False))
+
+    # Period aggregates are per farm, reduced over each point's own AOI as in analyze_soil_health
+    for index, *_ in points:
+        if periods_by_point.get(index):
+            reductions[f"periods:{index}"] = build_period_reductions(aois[index], periods_by_point[index])
+
+    values: Dict[int, Dict[str, Any]] = {}
+    fetched_periods: Dict[int, Dict[str, Dict[str, Any]]] = {}
+    if not reductions:
+        return values, fetched_periods
+    with metrics.external("earth_engine", "reduce_soil_regions"):
+        result = ee.Dictionary(reductions).getInfo()
+    for name in [name for name in result if name.startswith("periods:")]:
+        fetched_periods[int(name.split(":", 1)[1])] = result.pop(name) or {}
+    for collection in result.values():
+        for feature in collection.get("features", []):
+            properties = dict(feature.get("properties", {}))
+            index = int(properties.pop("point_index"))
+            values.setdefault(index, {}).update(properties)
+    return values, fetched_periods
+
+
+def analyze_soil_health_batch(points: List[SoilPoint], start: str, end: str) -> List[Dict[str, Any]]:
+    """
+    Soil health for many points: local rasters, the cache and the farms' time
+    series first, then one Earth Engine round trip per chunk of points for
+    everything still missing. NDVI / SMAP are the same statistics as in
+    analyze_soil_health (from the series when it is enabled).
+    """
+    # Computed on the requested window, cached under its bucket (see analyze_soil_health)
+    window = soil_cache.window(start, end)
+    scales = [scale for scale in SCALE_LAYERS if not (soil_series.enabled and scale in SERIES_SCALES)]
+    known: Dict[int, Dict[str, Any]] = {}
+    missing: Dict[int, Dict[int, str]] = {}
+    farms: Dict[int, str] = {}
+    stale: Dict[int, List[Tuple[str, str]]] = {}
+    with metrics.stage("soil_local_lookup_batch"):
+        for index, point in enumerate(points):
+            known[index], missing[index] = local_soil_values(point.latitude, point.longitude, point.buffer_meters,
+                                                             window, scales)
+            if soil_series.enabled:
+                farms[index] = soil_series.farm_id(point.latitude, point.longitude, point.buffer_meters)
+                stale[index] = soil_series.stale_periods(farms[index], start, end)
+
+    todo = [(index, point.latitude, point.longitude, point.buffer_meters)
+            for index, point in enumerate(points) if missing[index] or stale.get(index)]
+    errors: Dict[int, str] = {}
+    for offset in range(0, len(todo), max(1, SOIL_BATCH_CHUNK_SIZE)):
+        chunk = todo[offset:offset + SOIL_BATCH_CHUNK_SIZE]
+        try:
+            reduced, fetched = reduce_soil_regions(chunk, {index: list(missing[index]) for index, *_ in chunk}, start, end,
+                                                   {index: stale[index] for index, *_ in chunk if stale.get(index)})
+        except Exception as e:
+            for index, *_ in chunk:
+                errors[index] = f"Soil analysis failed: {str(e)}"
+            continue
+        for index, *_ in chunk:
+            for scale, key in missing[index].items():
+                known[index].update(store_group(key, scale, reduced.get(index, {})))
+            if stale.get(index):
+                periods = fetched.get(index, {})
+                soil_series.put_periods(farms[index], {period: period_values(periods.get(period[0], {}))
+                                                       for period in stale[index]})
+
+    if soil_series.enabled:
+        for index in known:
+            if index not in errors:
+                known[index].update(soil_series.window_values(farms[index], start, end))
+
+    results = []
+    for index, point in enumerate(points):
+        result = {"index": index, "latitude": point.latitude, "longitude": point.longitude,
+                  "buffer_meters": point.buffer_meters}
+        if index in errors:
+            result.update({"success": False, "error": errors[index]})
+        else:
+            try:
+                result.update({"success": True, **evaluate_soil_health(known[index])})
+            except Exception as e:
+                result.update({"success": False, "error": f"Soil analysis failed: {str(e)}"})
+        results.append(result)
+    return results
+
+
+# --------- Non-blocking execution ----------
+# getInfo() blocks for seconds, so Earth Engine work runs on a bounded pool
+# instead of the event loop (503 when it is saturated), and concurrent requests
+# for the same geohash cell, buffer and window bucket share one computation.
+SOIL_EE_WORKERS = int(os.getenv("SOIL_EE_WORKERS", "4"))
+SOIL_EE_QUEUE_SIZE = int(os.getenv("SOIL_EE_QUEUE_SIZE", "32"))
+
+soil_ee_pool = BoundedExecutor("soil-ee", max_workers=SOIL_EE_WORKERS, max_queue=SOIL_EE_QUEUE_SIZE)
+soil_single_flight = SingleFlight("soil-analysis")
+
+metrics.track_pool("soil-ee", soil_ee_pool)
+metrics.track_cache("soil", soil_cache.stats)
+metrics.track_single_flight("soil-analysis", soil_single_flight)
+
+
+def soil_busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Soil analysis is busy. Please retry shortly.",
+        headers={"Retry-After": "2"}
+    )
+
+
+async def run_soil_analysis(lat: float, lon: float, buffer_m: int, start: str, end: str) -> Dict[str, Any]:
+    """analyze_soil_health on the Earth Engine pool, coalesced with identical requests in flight"""
+    key = (geohash(lat, lon, soil_cache.precision), buffer_m, soil_cache.window(start, end))
+    try:
+        return await soil_single_flight.run(
+            key, lambda: soil_ee_pool.run(analyze_soil_health, lat, lon, buffer_m, start, end)
+        )
+    except QueueFullError:
+        raise soil_busy_error()
+
+
 @app.get("/")
 async def root():
     return {"message": "AmaKhet Soil Analysis API"}
@@ -160,6 +540,62 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/api/soil-rasters")
+async def soil_raster_info():
+    """
+    Region, bands and age of the local static soil rasters (null when not ingested)
+    """
+    return soil_raster_store.describe() if soil_raster_store is not None else None
+
+@app.get("/api/soil-analysis/stats")
+async def soil_analysis_stats():
+    """
+    Earth Engine pool usage and how many requests were coalesced
+    """
+    return {"ee_pool": soil_ee_pool.stats(), "single_flight": soil_single_flight.stats()}
+
+@app.get("/api/soil-series/{lat}/{lon}")
+async def get_soil_series(lat: float, lon: float, buffer_meters: int = 50, days: int = 365):
+    """
+    Per-period NDVI and soil moisture of a farm for charts, oldest first
+    """
+    if not soil_series.enabled:
+        raise HTTPException(status_code=404, detail="Soil time series is disabled (SOIL_SERIES_PATH is empty)")
+    if not 1 <= days <= 3650:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 3650")
+    end_date = datetime.now()
+    start, end = soil_cache.window((end_date - timedelta(days=days)).strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+    key = ("series", soil_series.farm_id(lat, lon, buffer_meters), start, end)
+    try:
+        periods = await soil_single_flight.run(
+            key, lambda: soil_ee_pool.run(update_soil_series, lat, lon, buffer_meters, start, end)
+        )
+    except QueueFullError:
+        raise soil_busy_error()
+    return {
+        "success": True,
+        "farm": soil_series.farm_id(lat, lon, buffer_meters),
+        "start_date": start,
+        "end_date": end,
+        "period_days": soil_series.period_days,
+        "periods": periods,
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/soil-series/stats")
+async def soil_series_stats():
+    """
+    Farms and periods stored in the time series, and how many periods were reused
+    """
+    return soil_series.stats()
+
+@app.get("/api/soil-cache/stats")
+async def soil_cache_stats():
+    """
+    Entries per layer and hit/miss counters of the local soil cache
+    """
+    return soil_cache.stats()
+
 @app.post("/api/soil-analysis", response_model=SoilAnalysisResponse)
 async def get_soil_analysis(request: SoilAnalysisRequest):
     """
@@ -174,7 +610,7 @@ async def get_soil_analysis(request: SoilAnalysisRequest):
             raise HTTPException(status_code=400, detail="End date must be after start date")
         
         # Perform soil analysis
-        analysis_result = analyze_soil_health(
+        analysis_result = await run_soil_analysis(
             request.latitude,
             request.longitude,
             request.buffer_meters,
@@ -189,11 +625,40 @@ async def get_soil_analysis(request: SoilAnalysisRequest):
             timestamp=datetime.now().isoformat()
         )
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid date format: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@app.post("/api/soil-analysis/batch", response_model=BatchSoilAnalysisResponse)
+async def get_soil_analysis_batch(request: BatchSoilAnalysisRequest):
+    """
+    Get soil health analysis for many locations in one request
+    """
+    try:
+        start_date = datetime.strptime(request.start_date, "%Y-%m-%d")
+        end_date = datetime.strptime(request.end_date, "%Y-%m-%d")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date format: {str(e)}")
+    if end_date <= start_date:
+        raise HTTPException(status_code=400, detail="End date must be after start date")
+    if len(request.points) > SOIL_BATCH_MAX_POINTS:
+        raise HTTPException(status_code=413, detail=f"Too many points: {len(request.points)} (max {SOIL_BATCH_MAX_POINTS})")
+
+    try:
+        results = await soil_ee_pool.run(analyze_soil_health_batch, request.points, request.start_date, request.end_date)
+    except QueueFullError:
+        raise soil_busy_error()
+    failed = sum(1 for result in results if not result["success"])
+    return BatchSoilAnalysisResponse(
+        success=failed == 0,
+        results=results,
+        message=f"Soil analysis completed for {len(results) - failed} of {len(results)} locations",
+        timestamp=datetime.now().isoformat()
+    )
+
 @app.get("/api/soil-analysis/{lat}/{lon}")
 async def get_soil_analysis_simple(lat: float, lon: float):
     """
@@ -204,7 +669,7 @@ async def get_soil_analysis_simple(lat: float, lon: float):
         end_date = datetime.now()
         start_date = end_date - timedelta(days=90)
         
-        analysis_result = analyze_soil_health(
+        analysis_result = await run_soil_analysis(
             lat, lon, 50,
             start_date.strftime("%Y-%m-%d"),
             end_date.strftime("%Y-%m-%d")
@@ -217,6 +682,8 @@ async def get_soil_analysis_simple(lat: float, lon: float):
             timestamp=datetime.now().isoformat()
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
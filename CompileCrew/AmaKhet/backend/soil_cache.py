@@ -0,0 +1,156 @@
+"""
+Persistent SQLite cache for soil analysis layer values
+
+Keys are (geohash cell, buffer, layer group, date window):
+  - static   OpenLandMap pH / SOC / WC33. Never change, so no date and no TTL
+  - ndvi     Sentinel-2 NDVI for a date window
+  - smap     SMAP surface / rootzone moisture for a date window
+
+Date windows are snapped outward to `bucket_days` boundaries (counted from
+1970-01-01) for the key only; Earth Engine still reduces the requested window.
+"The last 90 days" asked on consecutive days maps to the same entry for a
+whole bucket, so a hit may hold values of a window up to a bucket earlier. Any point inside a geohash cell shares the cell's entry; at the
+default precision 8 a cell is about 38 m x 19 m, well inside the 50 m buffer.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Tuple
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+STATIC_LAYERS = {"static"}
+
+
+def geohash(lat: float, lon: float, precision: int = 8) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def snap_window(start: str, end: str, bucket_days: int) -> Tuple[str, str]:
+    """Widen [start, end) to whole buckets of bucket_days; dates are YYYY-MM-DD"""
+    if bucket_days <= 1:
+        return start, end
+    epoch = date(1970, 1, 1)
+    start_day = (datetime.strptime(start, "%Y-%m-%d").date() - epoch).days
+    end_day = (datetime.strptime(end, "%Y-%m-%d").date() - epoch).days
+    snapped_start = start_day // bucket_days * bucket_days
+    snapped_end = -(-end_day // bucket_days) * bucket_days
+    if snapped_end <= snapped_start:
+        snapped_end = snapped_start + bucket_days
+    return (epoch + timedelta(days=snapped_start)).isoformat(), (epoch + timedelta(days=snapped_end)).isoformat()
+
+
+class SoilCache:
+    def __init__(self, path: str, precision: int = 8, bucket_days: int = 7, dynamic_ttl: float = 24 * 3600):
+        """
+        path: SQLite file ("" disables the cache)
+        dynamic_ttl: seconds an ndvi / smap entry stays valid (static entries never expire)
+        """
+        self.path = path
+        self.precision = precision
+        self.bucket_days = bucket_days
+        self.dynamic_ttl = dynamic_ttl
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "writes": 0, "expired": 0}
+        self._conn = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS soil_layers ("
+                " key TEXT PRIMARY KEY, layer TEXT NOT NULL, cell TEXT NOT NULL,"
+                " value_json TEXT NOT NULL, created REAL NOT NULL, expires REAL)"
+            )
+            self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def window(self, start: str, end: str) -> Tuple[str, str]:
+        return snap_window(start, end, self.bucket_days)
+
+    def key(self, layer: str, lat: float, lon: float, buffer_m: int, window: Tuple[str, str]) -> str:
+        cell = geohash(lat, lon, self.precision)
+        if layer in STATIC_LAYERS:
+            return f"{layer}:{cell}:{buffer_m}"
+        return f"{layer}:{cell}:{buffer_m}:{window[0]}:{window[1]}"
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Stored band values for the keys that are cached and not expired"""
+        keys = list(keys)
+        if not self.enabled or not keys:
+            return {}
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value_json, expires FROM soil_layers WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchall()
+            found = {}
+            for key, value_json, expires in rows:
+                if expires is not None and expires <= now:
+                    self._counts["expired"] += 1
+                    continue
+                found[key] = json.loads(value_json)
+            self._counts["hits"] += len(found)
+            self._counts["misses"] += len(keys) - len(found)
+        return found
+
+    def put(self, key: str, layer: str, values: Dict[str, Any]):
+        if not self.enabled:
+            return
+        now = time.time()
+        expires = None if layer in STATIC_LAYERS else now + self.dynamic_ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO soil_layers (key, layer, cell, value_json, created, expires) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, layer, key.split(":")[1], json.dumps(values), now, expires)
+            )
+            self._conn.commit()
+            self._counts["writes"] += 1
+
+    def purge_expired(self) -> int:
+        if not self.enabled:
+            return 0
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM soil_layers WHERE expires IS NOT NULL AND expires <= ?", (time.time(),)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        entries: Dict[str, int] = {}
+        if self.enabled:
+            with self._lock:
+                entries = dict(self._conn.execute("SELECT layer, COUNT(*) FROM soil_layers GROUP BY layer").fetchall())
+        lookups = self._counts["hits"] + self._counts["misses"]
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "geohash_precision": self.precision,
+            "date_bucket_days": self.bucket_days,
+            "dynamic_ttl_seconds": self.dynamic_ttl,
+            "entries": entries,
+            "hit_rate": round(self._counts["hits"] / lookups, 4) if lookups else None,
+            **self._counts,
+        }
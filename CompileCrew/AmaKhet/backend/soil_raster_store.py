@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Local raster store for the static OpenLandMap soil layers
+
+The pH, SOC and WC33 layers never change, so they can be downloaded once for
+our operating region and read locally instead of asking Earth Engine for every
+point. `ingest` pulls the same derived bands analyze_soil_health uses
+(pH_top30cm, SOC_gkg_top30cm, SOC_pct_top30cm, WC33_vpct_top30cm) on the
+layers' native 1/480° grid with ee.data.computePixels, tile by tile, into one
+float32 .npy file per band (NaN where the layer is masked) plus meta.json.
+
+Reads open the .npy files with mmap_mode="r", so only the few pixels around a
+point are paged in, and every worker process shares them through the page
+cache. A point + buffer mean weights each pixel by the fraction of it inside
+the buffer box, like Earth Engine's reduceRegion, and skips masked pixels.
+
+Usage:
+    # Odisha, written to data/soil_rasters
+    python soil_raster_store.py ingest --bbox 81.3,17.8,87.5,22.6
+    python soil_raster_store.py query --lat 20.29 --lon 85.82 --buffer 50
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_DIRECTORY = "data/soil_rasters"
+NATIVE_PIXEL_DEGREES = 1.0 / 480  # OpenLandMap 250 m grid
+MASKED = -9999.0
+METERS_PER_DEGREE = 111320.0
+
+
+class SoilRasterStore:
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.directory = directory
+        self.west = self.meta["west"]
+        self.north = self.meta["north"]
+        self.pixel = self.meta["pixel_degrees"]
+        self.width = self.meta["width"]
+        self.height = self.meta["height"]
+        self.bands: Dict[str, np.ndarray] = {
+            band: np.load(os.path.join(directory, f"{band}.npy"), mmap_mode="r")
+            for band in self.meta["bands"]
+        }
+
+    @classmethod
+    def open(cls, directory: str) -> Optional["SoilRasterStore"]:
+        """The store in directory, or None when nothing has been ingested there"""
+        if not os.path.exists(os.path.join(directory, "meta.json")):
+            return None
+        try:
+            return cls(directory)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Could not open soil raster store in {directory}: {e}")
+            return None
+
+    def _pixel_window(self, lat: float, lon: float, buffer_m: int) -> Optional[Tuple[float, float, float, float]]:
+        """Fractional (row0, row1, col0, col1) of the buffer box, or None if it leaves the store"""
+        dlat = buffer_m / METERS_PER_DEGREE
+        dlon = buffer_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        col0 = (lon - dlon - self.west) / self.pixel
+        col1 = (lon + dlon - self.west) / self.pixel
+        row0 = (self.north - (lat + dlat)) / self.pixel
+        row1 = (self.north - (lat - dlat)) / self.pixel
+        if col0 < 0 or row0 < 0 or col1 > self.width or row1 > self.height:
+            return None
+        return row0, row1, col0, col1
+
+    def covers(self, lat: float, lon: float, buffer_m: int) -> bool:
+        return self._pixel_window(lat, lon, buffer_m) is not None
+
+    @staticmethod
+    def _coverage(start: float, stop: float) -> Tuple[int, np.ndarray]:
+        """First pixel index and the covered fraction of each pixel in [start, stop)"""
+        first, last = int(math.floor(start)), max(int(math.ceil(stop)), int(math.floor(start)) + 1)
+        edges = np.arange(first, last, dtype=np.float64)
+        weights = np.minimum(edges + 1, stop) - np.maximum(edges, start)
+        return first, np.clip(weights, 0, None)
+
+    def mean(self, lat: float, lon: float, buffer_m: int) -> Optional[Dict[str, Optional[float]]]:
+        """Area-weighted mean of every band over the buffer box, or None if it is outside the store"""
+        window = self._pixel_window(lat, lon, buffer_m)
+        if window is None:
+            return None
+        row0, row1, col0, col1 = window
+        first_row, row_weights = self._coverage(row0, row1)
+        first_col, col_weights = self._coverage(col0, col1)
+        weights = np.outer(row_weights, col_weights)
+        rows = slice(first_row, first_row + len(row_weights))
+        cols = slice(first_col, first_col + len(col_weights))
+
+        values = {}
+        for band, array in self.bands.items():
+            block = np.asarray(array[rows, cols], dtype=np.float64)
+            valid = ~np.isnan(block)
+            total = weights[valid].sum()
+            values[band] = float((block[valid] * weights[valid]).sum() / total) if total > 0 else None
+        return values
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "bands": list(self.bands),
+            "bbox": [self.west, self.north - self.height * self.pixel, self.west + self.width * self.pixel, self.north],
+            "shape": [self.height, self.width],
+            "pixel_degrees": self.pixel,
+            "source": self.meta.get("source"),
+            "ingested_at": self.meta.get("ingested_at"),
+        }
+
+
+# --------- Ingestion from Earth Engine ----------
+def grid_for_bbox(bbox: List[float], pixel: float) -> Tuple[float, float, int, int]:
+    """Snap (west, south, east, north) outward to the pixel grid; returns west, north, width, height"""
+    west, south, east, north = bbox
+    west = math.floor(west / pixel) * pixel
+    north = math.ceil(north / pixel) * pixel
+    width = int(math.ceil((east - west) / pixel))
+    height = int(math.ceil((north - south) / pixel))
+    return west, north, width, height
+
+
+def ingest(bbox: List[float], directory: str, tile: int = 1024, pixel: float = NATIVE_PIXEL_DEGREES):
+    """Download the static soil bands for bbox into directory (needs an initialized Earth Engine)"""
+    from soil_analysis_api import build_static_soil_image, ee
+
+    image = build_static_soil_image()
+    bands = image.bandNames().getInfo()
+    unmasked = image.unmask(MASKED)
+    west, north, width, height = grid_for_bbox(bbox, pixel)
+    os.makedirs(directory, exist_ok=True)
+    arrays = {
+        band: np.lib.format.open_memmap(os.path.join(directory, f"{band}.npy.tmp"), mode="w+",
+                                        dtype=np.float32, shape=(height, width))
+        for band in bands
+    }
+
+    started = time.perf_counter()
+    tiles = [(row, col) for row in range(0, height, tile) for col in range(0, width, tile)]
+    for number, (row, col) in enumerate(tiles, 1):
+        tile_height, tile_width = min(tile, height - row), min(tile, width - col)
+        pixels = ee.data.computePixels({
+            "expression": unmasked,
+            "fileFormat": "NUMPY_NDARRAY",
+            "grid": {
+                "dimensions": {"width": tile_width, "height": tile_height},
+                "affineTransform": {
+                    "scaleX": pixel, "shearX": 0, "translateX": west + col * pixel,
+                    "shearY": 0, "scaleY": -pixel, "translateY": north - row * pixel,
+                },
+                "crsCode": "EPSG:4326",
+            },
+        })
+        for band in bands:
+            values = np.asarray(pixels[band], dtype=np.float32)
+            values[values == MASKED] = np.nan
+            arrays[band][row:row + tile_height, col:col + tile_width] = values
+        print(f"  tile {number}/{len(tiles)} ({tile_height}x{tile_width})")
+
+    for array in arrays.values():
+        array.flush()
+    arrays.clear()
+    for band in bands:
+        os.replace(os.path.join(directory, f"{band}.npy.tmp"), os.path.join(directory, f"{band}.npy"))
+    meta = {
+        "bands": bands,
+        "west": west,
+        "north": north,
+        "width": width,
+        "height": height,
+        "pixel_degrees": pixel,
+        "source": "OpenLandMap SOL pH / organic carbon / water content 33 kPa, top 30 cm mean",
+        "ingested_at": time.time(),
+    }
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"✅ Ingested {len(bands)} bands, {height}x{width} pixels in {time.perf_counter() - started:.0f}s into {directory}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local raster store for the static soil layers")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = sub.add_parser("ingest", help="Download the static layers for a region from Earth Engine")
+    ingest_parser.add_argument("--bbox", required=True, help="west,south,east,north in degrees")
+    ingest_parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="Output directory")
+    ingest_parser.add_argument("--tile", type=int, default=1024, help="Tile size in pixels per computePixels call")
+
+    query_parser = sub.add_parser("query", help="Point + buffer means from the local store")
+    query_parser.add_argument("--dir", default=DEFAULT_DIRECTORY)
+    query_parser.add_argument("--lat", type=float, required=True)
+    query_parser.add_argument("--lon", type=float, required=True)
+    query_parser.add_argument("--buffer", type=int, default=50, help="Buffer in metres")
+
+    args = parser.parse_args(argv)
+    if args.command == "ingest":
+        bbox = [float(value) for value in args.bbox.split(",")]
+        if len(bbox) != 4:
+            sys.exit("❌ --bbox needs west,south,east,north")
+        ingest(bbox, args.dir, args.tile)
+        return 0
+
+    store = SoilRasterStore.open(args.dir)
+    if store is None:
+        sys.exit(f"❌ No soil raster store in {args.dir}; run ingest first")
+    values = store.mean(args.lat, args.lon, args.buffer)
+    if values is None:
+        sys.exit("❌ Point is outside the ingested region")
+    print(json.dumps(values, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Per-farm NDVI / soil moisture time series
+
+A soil analysis over "the last 90 days" used to reduce the whole window in
+Earth Engine on every request, although all but the newest few days had been
+computed the day before. Here each farm (geohash cell + buffer) keeps one row
+per fixed period of `period_days` (aligned to 1970-01-01, like the soil cache
+buckets):
+
+  - ndvi         NDVI of the period's cloud-masked Sentinel-2 median composite
+  - ndvi_images  how many Sentinel-2 scenes went into it
+  - sm_surface / sm_rootzone   mean SMAP L4 moisture over the period
+  - smap_images  how many SMAP granules went into it
+
+Only periods that are missing, or recent enough that Earth Engine may still be
+adding scenes (`settle_days` after the period ends) and were fetched more than
+`refresh_seconds` ago, have to be fetched again. Window values are assembled
+locally as the scene-count weighted mean of the periods overlapping the window.
+For SMAP that is exactly the window mean; for NDVI it approximates the median
+composite of the whole window, without the cost of recomputing it.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from soil_cache import geohash
+
+EPOCH = date(1970, 1, 1)
+SERIES_FIELDS = ["ndvi", "ndvi_images", "sm_surface", "sm_rootzone", "smap_images"]
+
+
+def period_windows(start: str, end: str, period_days: int) -> List[Tuple[str, str]]:
+    """(start, end) of every period overlapping [start, end); dates are YYYY-MM-DD"""
+    start_day = (datetime.strptime(start, "%Y-%m-%d").date() - EPOCH).days
+    end_day = (datetime.strptime(end, "%Y-%m-%d").date() - EPOCH).days
+    first = start_day // period_days * period_days
+    periods = []
+    for day in range(first, max(end_day, start_day + 1), period_days):
+        periods.append(((EPOCH + timedelta(days=day)).isoformat(),
+                        (EPOCH + timedelta(days=day + period_days)).isoformat()))
+    return periods
+
+
+def weighted_mean(rows: Iterable[Dict[str, Any]], field: str, weight: str) -> Optional[float]:
+    total = weighted = 0.0
+    for row in rows:
+        if row.get(field) is None or not row.get(weight):
+            continue
+        total += row[weight]
+        weighted += row[field] * row[weight]
+    return weighted / total if total else None
+
+
+class SoilTimeSeries:
+    def __init__(self, path: str, precision: int = 8, period_days: int = 7,
+                 settle_days: int = 7, refresh_seconds: float = 6 * 3600):
+        """
+        path: SQLite file ("" disables the series; analyses reduce whole windows again)
+        settle_days: how long after a period ends it is still refreshed
+        refresh_seconds: minimum age before an unsettled period is fetched again
+        """
+        self.path = path
+        self.precision = precision
+        self.period_days = max(1, period_days)
+        self.settle_days = settle_days
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._counts = {"periods_fetched": 0, "periods_reused": 0, "updates": 0}
+        self._conn = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS farm_periods ("
+                " farm TEXT NOT NULL, period_start TEXT NOT NULL, period_end TEXT NOT NULL,"
+                " ndvi REAL, ndvi_images INTEGER, sm_surface REAL, sm_rootzone REAL, smap_images INTEGER,"
+                " fetched REAL NOT NULL, PRIMARY KEY (farm, period_start))"
+            )
+            self._conn.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    def farm_id(self, lat: float, lon: float, buffer_m: int) -> str:
+        return f"{geohash(lat, lon, self.precision)}:{buffer_m}"
+
+    def periods(self, start: str, end: str) -> List[Tuple[str, str]]:
+        """Periods overlapping the window, leaving out those that have not started yet"""
+        today = date.today().isoformat()
+        return [period for period in period_windows(start, end, self.period_days) if period[0] <= today]
+
+    def _rows(self, farm: str, start: str, end: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT period_start, period_end, " + ", ".join(SERIES_FIELDS) + ", fetched FROM farm_periods"
+                " WHERE farm = ? AND period_end > ? AND period_start < ? ORDER BY period_start",
+                (farm, start, end)
+            )
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def stale_periods(self, farm: str, start: str, end: str) -> List[Tuple[str, str]]:
+        """Periods of the window that have to be (re)fetched from Earth Engine"""
+        periods = self.periods(start, end)
+        if not self.enabled:
+            return periods
+        stored = {row["period_start"]: row for row in self._rows(farm, start, end)}
+        now = time.time()
+        stale = []
+        for period_start, period_end in periods:
+            row = stored.get(period_start)
+            if row is not None:
+                settled_at = datetime.strptime(period_end, "%Y-%m-%d").timestamp() + self.settle_days * 86400
+                if row["fetched"] >= settled_at or now - row["fetched"] < self.refresh_seconds:
+                    continue
+            stale.append((period_start, period_end))
+        with self._lock:
+            self._counts["periods_fetched"] += len(stale)
+            self._counts["periods_reused"] += len(periods) - len(stale)
+            self._counts["updates"] += 1
+        return stale
+
+    def put_periods(self, farm: str, periods: Dict[Tuple[str, str], Dict[str, Any]]):
+        """Store the aggregates of freshly fetched periods"""
+        if not self.enabled or not periods:
+            return
+        now = time.time()
+        rows = [
+            (farm, period_start, period_end, *[values.get(field) for field in SERIES_FIELDS], now)
+            for (period_start, period_end), values in periods.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO farm_periods (farm, period_start, period_end, " + ", ".join(SERIES_FIELDS) +
+                ", fetched) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def series(self, farm: str, start: str, end: str) -> List[Dict[str, Any]]:
+        """Stored periods of the window, oldest first"""
+        if not self.enabled:
+            return []
+        return [{key: value for key, value in row.items() if key != "fetched"} for row in self._rows(farm, start, end)]
+
+    def window_values(self, farm: str, start: str, end: str) -> Dict[str, Any]:
+        """NDVI / SM_surface / SM_rootzone for the window, from the stored periods"""
+        rows = self.series(farm, start, end)
+        values = {
+            "NDVI": weighted_mean(rows, "ndvi", "ndvi_images"),
+            "SM_surface": weighted_mean(rows, "sm_surface", "smap_images"),
+            "SM_rootzone": weighted_mean(rows, "sm_rootzone", "smap_images"),
+        }
+        return {band: value for band, value in values.items() if value is not None}
+
+    def stats(self) -> Dict[str, Any]:
+        farms = periods = 0
+        if self.enabled:
+            with self._lock:
+                farms, periods = self._conn.execute(
+                    "SELECT COUNT(DISTINCT farm), COUNT(*) FROM farm_periods"
+                ).fetchone()
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "period_days": self.period_days,
+            "settle_days": self.settle_days,
+            "refresh_seconds": self.refresh_seconds,
+            "farms": farms,
+            "periods": periods,
+            **self._counts,
+        }
@@ -0,0 +1,73 @@
+"""
+Startup timing for main.py
+
+Import this module first; it marks time zero. Wrap heavy imports and other
+startup steps in `timed(...)` and read the breakdown back with `report()`
+(served at GET /startup), e.g.
+
+    with startup_profile.timed("import", "fastapi"):
+        from fastapi import FastAPI
+
+Steps that happen later (the agent stack loaded on the first /query, models
+loaded on first use) are recorded the same way, with their offset from start.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+STARTED = time.perf_counter()
+STARTED_AT = time.time()
+
+_steps: List[Dict[str, Any]] = []
+_marks: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def record(kind: str, name: str, ms: float, error: Optional[str] = None, **extra):
+    step = {
+        "kind": kind,
+        "name": name,
+        "ms": round(ms, 1),
+        "at_ms": round((time.perf_counter() - STARTED) * 1000, 1),
+    }
+    if error:
+        step["error"] = error
+    step.update(extra)
+    with _lock:
+        _steps.append(step)
+
+
+@contextmanager
+def timed(kind: str, name: str):
+    """Time a block and record it; exceptions are recorded and re-raised"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        record(kind, name, (time.perf_counter() - started) * 1000, error=f"{type(e).__name__}: {e}")
+        raise
+    record(kind, name, (time.perf_counter() - started) * 1000)
+
+
+def mark(name: str):
+    """Remember when a milestone (e.g. "app_started", "ready") was first reached"""
+    with _lock:
+        _marks.setdefault(name, round((time.perf_counter() - STARTED) * 1000, 1))
+
+
+def report(extra_steps: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """All recorded steps, slowest first per kind, plus milestone offsets in ms"""
+    with _lock:
+        steps = list(_steps) + list(extra_steps or [])
+        marks = dict(_marks)
+    by_kind: Dict[str, List[Dict[str, Any]]] = {}
+    for step in steps:
+        by_kind.setdefault(step["kind"], []).append(step)
+    return {
+        "started_at": STARTED_AT,
+        "uptime_s": round(time.perf_counter() - STARTED, 1),
+        "milestones_ms": marks,
+        "totals_ms": {kind: round(sum(step["ms"] for step in items), 1) for kind, items in by_kind.items()},
+        "steps": {kind: sorted(items, key=lambda step: step["ms"], reverse=True) for kind, items in by_kind.items()},
+    }
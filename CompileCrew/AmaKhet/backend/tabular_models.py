@@ -0,0 +1,296 @@
+"""
+Vectorized scoring for the tabular (joblib) models used by main.py
+
+The single-row endpoints encode and predict one farm per request. The helpers
+here take many rows at once, run one encode + predict per chunk and report
+failures per row, so they can back both the batch endpoints and offline jobs.
+"""
+from typing import Any, Callable, Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 1024
+
+# Model/encoder name -> file under models/
+MODEL_FILES = {
+    "encoder": "encoder_yield.joblib",
+    "yield_model": "crop_yield_model.joblib",
+    "crop_recommendation_model": "crop_recommendation_model.joblib",
+    "fertilizer_model": "fertilizer_model.joblib",
+    "soil_encoder": "soil_encoder.joblib",
+    "crop_encoder": "encoder_yield.joblib",  # same encoder used in crop yield
+}
+
+
+# --------- Result formatting (shared with the single-row endpoints) ----------
+def format_crop_yield(row: Mapping[str, Any], prediction: Any) -> Dict[str, str]:
+    prediction = float(prediction)
+    return {
+        "Predicted Production": f"{prediction:.2f}",
+        "message": f"Predicted production for {row['Jcrops']} in {row['Jdistrict']}, {row['Jstate']} ({row['Jseason']}) on {row['Jarea']} hectares is {prediction:.2f}."
+    }
+
+
+def format_crop_recommendation(row: Mapping[str, Any], prediction: Any) -> Dict[str, str]:
+    predicted_crop = str(prediction)
+    return {
+        "Predicted Crop": predicted_crop,
+        "message": f"Based on the given parameters, the recommended crop is {predicted_crop}."
+    }
+
+
+def format_fertilizer_recommendation(row: Mapping[str, Any], prediction: Any) -> Dict[str, str]:
+    predicted_fertilizer = str(prediction)
+    return {
+        "Predicted Fertilizer": predicted_fertilizer,
+        "message": f"Based on the given parameters, the recommended fertilizer is {predicted_fertilizer}."
+    }
+
+
+# --------- Model specs ----------
+class TabularModelSpec:
+    """Describes how to validate, featurize, predict and format one model"""
+
+    def __init__(
+        self,
+        name: str,
+        categorical: Sequence[str],
+        numeric: Sequence[str],
+        featurize: Callable[[Mapping[str, Any], List[List[str]], np.ndarray], np.ndarray],
+        model_key: str,
+        formatter: Callable[[Mapping[str, Any], Any], Dict[str, str]],
+        requires: Sequence[str],
+        encoders: Sequence[Tuple[str, Sequence[int]]] = (),
+        positive: Sequence[str] = (),
+    ):
+        self.name = name
+        self.categorical = list(categorical)
+        self.numeric = list(numeric)
+        self.featurize = featurize
+        self.model_key = model_key
+        self.formatter = formatter
+        self.requires = list(requires)
+        # (encoder key, categorical column indices it encodes)
+        self.encoders = [(key, list(columns)) for key, columns in encoders]
+        self.positive = set(positive)
+
+    @property
+    def columns(self) -> List[str]:
+        return self.categorical + self.numeric
+
+    def predict(self, models: Mapping[str, Any], categorical: List[List[str]], numeric: np.ndarray) -> np.ndarray:
+        features = self.featurize(models, categorical, numeric)
+        return models[self.model_key].predict(features)
+
+
+def _yield_features(models, categorical, numeric):
+    # Encode state, district, season, crop and append the area column
+    encoded = models["encoder"].transform(categorical)
+    return np.hstack([encoded, numeric])
+
+
+def _crop_features(models, categorical, numeric):
+    return numeric
+
+
+def _fertilizer_features(models, categorical, numeric):
+    soil_encoded = models["soil_encoder"].transform([[row[0]] for row in categorical])
+    crop_encoded = models["crop_encoder"].transform([[row[1]] for row in categorical])
+    return np.hstack([soil_encoded, crop_encoded, numeric])
+
+
+CROP_YIELD = TabularModelSpec(
+    name="crop_yield",
+    categorical=["Jstate", "Jdistrict", "Jseason", "Jcrops"],
+    numeric=["Jarea"],
+    featurize=_yield_features,
+    model_key="yield_model",
+    formatter=format_crop_yield,
+    requires=["encoder", "yield_model"],
+    encoders=[("encoder", [0, 1, 2, 3])],
+    positive=["Jarea"],
+)
+
+CROP_RECOMMENDATION = TabularModelSpec(
+    name="crop_recommendation",
+    categorical=[],
+    numeric=["n_params", "p_params", "k_params", "t_params", "h_params", "ph_params", "r_params"],
+    featurize=_crop_features,
+    model_key="crop_recommendation_model",
+    formatter=format_crop_recommendation,
+    requires=["crop_recommendation_model"],
+)
+
+FERTILIZER_RECOMMENDATION = TabularModelSpec(
+    name="fertilizer_recommendation",
+    categorical=["soil_type", "crop_type"],
+    numeric=["temp", "humidity", "moisture", "nitrogen", "potassium", "phosphorous"],
+    featurize=_fertilizer_features,
+    model_key="fertilizer_model",
+    formatter=format_fertilizer_recommendation,
+    requires=["fertilizer_model", "soil_encoder", "crop_encoder"],
+    encoders=[("soil_encoder", [0]), ("crop_encoder", [1])],
+)
+
+SPECS = {spec.name: spec for spec in (CROP_YIELD, CROP_RECOMMENDATION, FERTILIZER_RECOMMENDATION)}
+
+
+# --------- Row validation ----------
+def parse_row(spec: TabularModelSpec, row: Mapping[str, Any]) -> Tuple[List[str], List[float]]:
+    """Validate one input row, raising ValueError with a readable reason"""
+    if not isinstance(row, Mapping):
+        raise ValueError("row must be an object of field values")
+
+    categorical = []
+    for name in spec.categorical:
+        value = row.get(name)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            raise ValueError(f"missing field '{name}'")
+        categorical.append(str(value))
+
+    numeric = []
+    for name in spec.numeric:
+        value = row.get(name)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            raise ValueError(f"missing field '{name}'")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"field '{name}' must be a number, got {value!r}")
+        if not np.isfinite(number):
+            raise ValueError(f"field '{name}' must be a finite number")
+        if name in spec.positive and number <= 0:
+            raise ValueError(f"field '{name}' must be greater than 0")
+        numeric.append(number)
+
+    return categorical, numeric
+
+
+# --------- Batch scoring ----------
+def _unknown_categories(spec, models, categorical):
+    """
+    Find rows whose categories the fitted encoders have never seen, using the
+    encoders' categories_ so the check is one vectorized pass per column.
+    Returns an error message (or None) per row.
+    """
+    errors = [None] * len(categorical)
+    if not categorical:
+        return errors
+    values = np.asarray(categorical, dtype=object)
+
+    for key, columns in spec.encoders:
+        encoder = models[key]
+        known = getattr(encoder, "categories_", None)
+        if getattr(encoder, "handle_unknown", "error") != "error" or known is None or len(known) != len(columns):
+            continue
+        for column, categories in zip(columns, known):
+            if categories.dtype.kind not in ("U", "O"):
+                continue
+            unknown = ~np.isin(values[:, column], categories)
+            for row in np.flatnonzero(unknown):
+                if errors[row] is None:
+                    errors[row] = f"unknown {spec.categorical[column]} '{values[row, column]}'"
+    return errors
+
+
+def _predict_isolating(spec, models, categorical, numeric):
+    """
+    Predict a chunk in one call. If the chunk fails (e.g. an unseen category
+    in the encoder), split it in halves so only the offending rows are
+    reported and the rest still get scored in bulk.
+    """
+    try:
+        predictions = spec.predict(models, categorical, numeric)
+        return [(True, value) for value in predictions]
+    except Exception as e:
+        if len(numeric) <= 1:
+            return [(False, str(e))] * len(numeric)
+        middle = len(numeric) // 2
+        return (_predict_isolating(spec, models, categorical[:middle], numeric[:middle])
+                + _predict_isolating(spec, models, categorical[middle:], numeric[middle:]))
+
+
+def predict_rows(
+    spec: TabularModelSpec,
+    models: Mapping[str, Any],
+    rows: Sequence[Mapping[str, Any]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[Tuple[bool, Any]]:
+    """
+    Predict many rows with one encode + predict per chunk.
+
+    Returns one (ok, value) pair per input row, in order: the raw model
+    prediction when ok is True, otherwise the error message.
+    """
+    chunk_size = max(1, int(chunk_size))
+    outcomes: List[Tuple[bool, Any]] = []
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        chunk_outcomes: List[Tuple[bool, Any]] = [None] * len(chunk)
+        valid_offsets, categorical, numeric = [], [], []
+
+        for offset, row in enumerate(chunk):
+            try:
+                row_categorical, row_numeric = parse_row(spec, row)
+            except ValueError as e:
+                chunk_outcomes[offset] = (False, str(e))
+                continue
+            valid_offsets.append(offset)
+            categorical.append(row_categorical)
+            numeric.append(row_numeric)
+
+        if spec.encoders and valid_offsets:
+            unknown = _unknown_categories(spec, models, categorical)
+            if any(unknown):
+                for offset, error in zip(valid_offsets, unknown):
+                    if error:
+                        chunk_outcomes[offset] = (False, error)
+                keep = [i for i, error in enumerate(unknown) if not error]
+                valid_offsets = [valid_offsets[i] for i in keep]
+                categorical = [categorical[i] for i in keep]
+                numeric = [numeric[i] for i in keep]
+
+        if valid_offsets:
+            numeric_array = np.asarray(numeric, dtype=float).reshape(len(valid_offsets), len(spec.numeric))
+            predicted = _predict_isolating(spec, models, categorical, numeric_array)
+            for offset, outcome in zip(valid_offsets, predicted):
+                chunk_outcomes[offset] = outcome
+
+        outcomes.extend(chunk_outcomes)
+
+    return outcomes
+
+
+def score_rows(
+    spec: TabularModelSpec,
+    models: Mapping[str, Any],
+    rows: Sequence[Mapping[str, Any]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> List[Dict[str, Any]]:
+    """
+    Score many rows and format each result like the single-row endpoint.
+
+    Failed rows carry an "error" message instead of the prediction fields.
+    """
+    results: List[Dict[str, Any]] = []
+    for index, (ok, value) in enumerate(predict_rows(spec, models, rows, chunk_size)):
+        if ok:
+            result = {"index": index, "success": True}
+            result.update(spec.formatter(rows[index], value))
+        else:
+            result = {"index": index, "success": False, "error": value}
+        results.append(result)
+    return results
+
+
+def summarize(spec: TabularModelSpec, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Wrap batch results in the response envelope used by the batch endpoints"""
+    succeeded = sum(1 for result in results if result["success"])
+    return {
+        "model": spec.name,
+        "count": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+    }
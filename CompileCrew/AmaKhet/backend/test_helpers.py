@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Checks for the pure helpers behind the backend's caches and batch scoring
+Runs without a server, models or Earth Engine: python test_helpers.py (or pytest)
+"""
+import math
+from types import SimpleNamespace
+
+import numpy as np
+
+import tabular_models
+from farmer_store import EARTH_RADIUS_KM, bbox_around, haversine_km, split_antimeridian
+from prediction_cache import PredictionCache
+from soil_cache import snap_window
+
+
+def test_predict_isolating():
+    """A failing chunk is split until only the bad rows report errors"""
+    calls = []
+
+    def predict(models, categorical, numeric):
+        calls.append(len(numeric))
+        if any(row[0] < 0 for row in numeric):
+            raise ValueError("negative input")
+        return [row[0] * 2 for row in numeric]
+
+    spec = SimpleNamespace(predict=predict)
+    numeric = [[1.0], [2.0], [-3.0], [4.0], [5.0], [-6.0], [7.0]]
+    outcomes = tabular_models._predict_isolating(spec, {}, [[]] * len(numeric), numeric)
+    assert [ok for ok, _ in outcomes] == [True, True, False, True, True, False, True]
+    assert [value for ok, value in outcomes if ok] == [2.0, 4.0, 8.0, 10.0, 14.0]
+    assert outcomes[2] == (False, "negative input")
+    assert calls[0] == len(numeric)  # the whole chunk was tried in one call first
+    print("✅ _predict_isolating isolates the failing rows")
+
+
+def test_snap_window():
+    """Windows widen to whole buckets counted from 1970-01-01"""
+    # Buckets start every 7 days from 1970-01-01, e.g. on 2023-12-28 and 2024-04-04
+    assert snap_window("2024-01-03", "2024-03-29", 7) == ("2023-12-28", "2024-04-04")
+    # Already aligned windows are unchanged, and bucket_days <= 1 disables snapping
+    assert snap_window("2023-12-28", "2024-04-04", 7) == ("2023-12-28", "2024-04-04")
+    assert snap_window("2024-01-03", "2024-03-29", 1) == ("2024-01-03", "2024-03-29")
+    # An empty window still covers one bucket
+    assert snap_window("2024-01-03", "2024-01-03", 7) == ("2023-12-28", "2024-01-04")
+    # Consecutive days inside a bucket share the same snapped window
+    assert snap_window("2024-01-01", "2024-03-30", 7) == snap_window("2024-01-02", "2024-03-31", 7)
+    print("✅ snap_window widens to whole buckets")
+
+
+def test_bbox_around():
+    """The box contains the circle, wraps across ±180° and spans the globe at the poles"""
+    lat, lon, radius = 17.92, 73.71, 50.0
+    min_lat, min_lon, max_lat, max_lon = bbox_around(lat, lon, radius)
+    assert min_lat < lat < max_lat and min_lon < lon < max_lon
+    # Points on the circle lie inside the box
+    bearings = np.radians(np.arange(0, 360, 5))
+    angle = radius / EARTH_RADIUS_KM
+    lats = np.degrees(np.arcsin(np.sin(math.radians(lat)) * np.cos(angle)
+                                + np.cos(math.radians(lat)) * np.sin(angle) * np.cos(bearings)))
+    lons = lon + np.degrees(np.arctan2(np.sin(bearings) * np.sin(angle) * np.cos(math.radians(lat)),
+                                       np.cos(angle) - np.sin(math.radians(lat)) * np.sin(np.radians(lats))))
+    assert np.allclose(haversine_km(lat, lon, lats, lons), radius)
+    assert ((lats >= min_lat - 1e-9) & (lats <= max_lat + 1e-9)).all()
+    assert ((lons >= min_lon - 1e-9) & (lons <= max_lon + 1e-9)).all()
+
+    # Near the antimeridian the box wraps: min_lon > max_lon
+    min_lat, min_lon, max_lat, max_lon = bbox_around(10.0, -179.9, 200.0)
+    assert min_lon > max_lon and min_lon > 170.0 and max_lon < -175.0
+
+    # A circle reaching a pole, or wider than half the globe, covers every longitude
+    assert bbox_around(89.5, 0.0, 100.0)[1::2] == (-180.0, 180.0)
+    assert bbox_around(0.0, 0.0, math.pi * EARTH_RADIUS_KM) == (-90.0, -180.0, 90.0, 180.0)
+    print("✅ bbox_around contains the circle and wraps across ±180°")
+
+
+def test_split_antimeridian():
+    """A box crossing ±180° becomes its two halves; any other box is unchanged"""
+    assert split_antimeridian((0.0, 10.0, 5.0, 20.0)) == [(0.0, 10.0, 5.0, 20.0)]
+    assert split_antimeridian((-20.0, 160.0, 20.0, -170.0)) == [(-20.0, 160.0, 20.0, 180.0),
+                                                                 (-20.0, -180.0, 20.0, -170.0)]
+    print("✅ split_antimeridian splits boxes across ±180°")
+
+
+def test_prediction_cache_invalidation():
+    """A changed fingerprint drops the cache and calls on_invalidate; reset_fingerprint does not"""
+    files = {"version": 1}
+    invalidations = []
+    cache = PredictionCache("test", fingerprint=lambda: files["version"],
+                            on_invalidate=lambda: invalidations.append(True), check_interval=0)
+    computed = []
+
+    def compute():
+        computed.append(True)
+        return len(computed)
+
+    assert cache.get_or_compute({"n": 1.0001}, compute) == 1
+    # Inputs are rounded, so this is a hit
+    assert cache.get_or_compute({"n": 1.0002}, compute) == 1
+    files["version"] = 2
+    assert cache.get_or_compute({"n": 1.0001}, compute) == 2
+    assert invalidations == [True] and cache.stats()["invalidations"] == 1
+
+    files["version"] = 3
+    cache.reset_fingerprint()
+    assert cache.get_or_compute({"n": 1.0001}, compute) == 2
+    assert invalidations == [True]
+    print("✅ PredictionCache is dropped when the model fingerprint changes")
+
+
+if __name__ == "__main__":
+    tests = [test_predict_isolating, test_snap_window, test_bbox_around, test_split_antimeridian,
+             test_prediction_cache_invalidation]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__} failed: {e}")
+    print(f"\n📊 {len(tests) - failed}/{len(tests)} checks passed")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,74 @@
+"""
+Request body size limits enforced while the upload is still streaming
+
+Starlette parses multipart uploads before the endpoint runs, so a size check
+inside the endpoint only happens after the whole file has been received.
+MaxBodySizeMiddleware counts bytes as they arrive and stops the request with
+413 as soon as a route's limit is exceeded.
+"""
+from typing import Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+UPLOAD_READ_CHUNK = 1024 * 1024
+
+
+class BodyTooLargeError(HTTPException):
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Upload too large (limit is {limit} bytes)")
+
+
+class MaxBodySizeMiddleware:
+    def __init__(self, app, limits: Dict[str, int]):
+        """limits: path prefix -> maximum request body size in bytes (longest prefix wins)"""
+        self.app = app
+        self.limits = sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def limit_for(self, path: str) -> Optional[int]:
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        limit = self.limit_for(scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        # Fast rejection when the client declares the length up front
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit:
+                response = JSONResponse({"detail": BodyTooLargeError(limit).detail}, status_code=413)
+                return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing; FastAPI turns it into the 413 response
+                    raise BodyTooLargeError(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def read_upload_capped(file: UploadFile, max_bytes: int) -> bytes:
+    """Read an UploadFile in chunks, failing with 413 as soon as it exceeds max_bytes"""
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(UPLOAD_READ_CHUNK)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise BodyTooLargeError(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)